@@ -5,6 +5,7 @@ FREQUENCY_HZ = 8 * TIME_MULTIPLIER    # Frequência da onda (Hz)
 SOUND_SPEED = 343 * TIME_MULTIPLIER   # Velocidade do som no ar (m/s)
 LAMBDA0 = SOUND_SPEED / FREQUENCY_HZ # Comprimento de onda
 N = 10                   # Número de emissores
+VISUALIZATION_MODE = "rings"  # "rings" (frentes de onda), "field" (campo instantâneo) ou "intensity" (média)
 
 
 # Lista de emissores: cada um com id, frequência, posição x e y
@@ -2,6 +2,7 @@ import os
 import json
 import numpy as np
 from Emitter import Emitter, EmitterArray
+from Field import FieldSynthesizer
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from Configs import LAMBDA0 as lambda0, SOUND_SPEED as c, FREQUENCY_HZ as f_hz, EMITTERS, FOCAL_POINTS
@@ -119,15 +120,14 @@ def demo8(emitter_array, N):
     ax.set_ylim(-10, 60)
     ax.set_aspect('equal')
 
-    # Adiciona os círculos de todos os emissores ao gráfico
-    for circle in emitter_array.circles:
-        ax.add_patch(circle)
+    # Adiciona os anéis de todos os emissores ao gráfico (uma única coleção)
+    rings = emitter_array.RingCollection(ax)
 
     # Adiciona marcador para o ponto focal
     focus_dot, = ax.plot(fx, fy, 'ro', markersize=6)
 
     def init():
-        return emitter_array.circles + [focus_dot]
+        return [rings, focus_dot]
 
     def calculate_focus_point(frame):
         t_total = frame / FPS
@@ -145,7 +145,7 @@ def demo8(emitter_array, N):
         idx = int(t_total // 2)  # 2 segundos por grupo
 
         if idx < len(focal_points) and idx != current_focus_idx[0]:
-            # Se for um novo foco, cria um novo grupo de emissores sem apagar os anteriores
+            # Se for um novo foco, refocaliza os mesmos emissores (reutiliza os círculos já no gráfico)
             current_focus_idx[0] = idx
             fx, fy = focal_points[idx]
             color = colors[idx % len(colors)]
@@ -153,17 +153,10 @@ def demo8(emitter_array, N):
             ax.set_title(f"Foco: ({fx}, {fy}) | Ângulo: {np.degrees(np.arctan2(fy, fx)):.2f}°")
             focus_dot.set_data([fx], [fy])
 
-            for i in range(N):
-                from Emitter import Emitter
-                new_emitter = Emitter(xs[i], ys[i], c, f_hz, 0, color=color)
-                new_phase = new_emitter.CalculatePhaseFromFocus(fx, fy)
-                new_emitter.SetPhase(new_phase)
-                emitter_array.AddEmitter(new_emitter)
-                for circle in new_emitter.circles:
-                    ax.add_patch(circle)
+            emitter_array.SetFocus(fx, fy, color=color)
 
         emitter_array.Increment(1 / FPS)
-        return emitter_array.circles + [focus_dot]
+        return [rings, focus_dot]
 
     anim = FuncAnimation(fig, update, init_func=init, interval=1000 / FPS, blit=True, cache_frame_data=False)
     plt.animation_ref = anim
@@ -204,3 +197,33 @@ def demo9():
         json.dump(results, f, indent=4)
 
     print("Arquivo 'results/emitter_focus_config.json' gerado com sucesso.")
+
+
+# DEMO 10 - Síntese no domínio da frequência (conjuntos do demo5)
+def demo10(emitter_array, N):
+    FPS = 30
+    duration = 5.0
+    demo5(emitter_array, N)
+
+    # Uma avaliação do campo por frequência; os frames são apenas recombinações
+    field = FieldSynthesizer(x_limits=(-50, 50), y_limits=(-10, 50), resolution=200)
+    field.AddEmitterArray(emitter_array)
+
+    fig, (ax_t, ax_i) = plt.subplots(1, 2, figsize=(14, 6))
+    vmax = np.max(np.abs(field.Snapshot(0)))
+    image = ax_t.imshow(field.Snapshot(0), extent=field.Extent(), origin="lower",
+                        cmap="RdBu", vmin=-vmax, vmax=vmax)
+    ax_t.set_title("Campo instantâneo")
+    ax_i.imshow(field.Intensity(), extent=field.Extent(), origin="lower", cmap="inferno")
+    ax_i.set_title("Intensidade média")
+
+    times = np.arange(0, duration, 1 / FPS)
+    frames = field.Frames(times)
+
+    def update(frame):
+        image.set_data(next(frames))
+        return [image]
+
+    anim = FuncAnimation(fig, update, frames=len(times), interval=1000 / FPS, blit=True, repeat=False)
+    plt.animation_ref = anim
+    plt.show()
@@ -1,17 +1,103 @@
 import numpy as np
-import matplotlib.pyplot as plt
 from Configs import LAMBDA0
+import Kernels
 
 class EmitterArray:
     def __init__(self):
         self.emitters = []
+        self._batch = None       # arrays do kernel em lote (ver _Batch)
+        self._revision = -1      # valor de Emitter.revision com que _batch foi construído
+        self._collection = None  # anéis de todos os emissores numa única coleção (ver RingCollection)
     
     def AddEmitter(self, emitter):
         self.emitters.append(emitter)
-    
+        self._batch = None
+
+    def _Batch(self):
+        """
+        Arrays do kernel em lote para os emissores visualizados: anel -> emissor (owner), índice do anel,
+        parâmetros por emissor e buffers de saída. São reconstruídos apenas quando os emissores mudam
+        (AddEmitter, SetFocus/SetPhase, SetColor ou criação de círculos); nos outros frames são reutilizados.
+        """
+        if self._batch is not None and self._revision == Emitter.revision:
+            return self._batch
+        drawn = [emitter for emitter in self.emitters if emitter._circles is not None or self._collection is not None]
+        counts = [emitter.N + 1 for emitter in drawn]  # N anéis + 1 posição para as frentes da fase anterior
+        owner = np.repeat(np.arange(len(drawn)), counts)
+        batch = {
+            "drawn": drawn,
+            "owner": owner,
+            "ring_index": np.concatenate([np.arange(n) for n in counts] + [np.zeros(0)]).astype(float),
+            "radii": np.zeros(len(owner)),
+            "visible": np.zeros(len(owner), dtype=bool),
+            "diameters": np.zeros(len(owner)),
+        }
+        for name in ("t", "t0", "T", "lambda0", "phi", "c", "phi_prev", "t0_prev", "t_switch", "N"):
+            batch[name] = np.array([getattr(emitter, name) for emitter in drawn], dtype=float)
+        if self._collection is not None:
+            from matplotlib.colors import to_rgba_array
+            colors = to_rgba_array([emitter.color for emitter in drawn]) if drawn else np.zeros((0, 4))
+            batch["rgba"] = colors[owner]
+            batch["alpha"] = np.array([emitter.alpha for emitter in drawn], dtype=float)[owner]
+            self._collection.set_offsets(np.array([emitter.r for emitter in drawn], dtype=float).reshape(-1, 2)[owner])
+            self._collection.set_angles(np.zeros(len(owner)))
+        self._batch = batch
+        self._revision = Emitter.revision
+        return batch
+
     def Increment(self, dt):
+        """
+        Avança todos os emissores em dt. Os raios e a visibilidade dos anéis de todos os emissores
+        visualizados são calculados de uma só vez pelo kernel em lote (Kernels.RingState), sobre arrays
+        reutilizados de frame para frame (ver _Batch). Com RingCollection, os anéis são atualizados
+        com operações vetoriais; os círculos individuais (circles) são atualizados um a um.
+        """
         for emitter in self.emitters:
-            emitter.Increment(dt)
+            emitter.t += dt
+        batch = self._Batch()
+        drawn = batch["drawn"]
+        if not drawn:
+            return
+
+        t = batch["t"]
+        for e_idx, emitter in enumerate(drawn):
+            t[e_idx] = emitter.t
+        radii, visible = batch["radii"], batch["visible"]
+        Kernels.RingState(t, batch["t0"], batch["T"], batch["lambda0"], batch["phi"], batch["c"], batch["phi_prev"],
+                          batch["t0_prev"], batch["t_switch"], batch["N"], batch["owner"], batch["ring_index"],
+                          radii, visible)
+
+        if self._collection is not None:
+            np.multiply(radii, 2, out=batch["diameters"])
+            self._collection.set_widths(batch["diameters"])
+            self._collection.set_heights(batch["diameters"])
+            np.multiply(visible, batch["alpha"], out=batch["rgba"][:, 3])
+            self._collection.set_edgecolor(batch["rgba"])
+            return
+
+        k = 0
+        for emitter in drawn:
+            for i, circle in enumerate(emitter._circles):
+                circle.set_height(2 * radii[k + i])
+                circle.set_width(2 * radii[k + i])
+                circle.set_alpha(emitter.alpha if visible[k + i] else 0)
+            k += emitter.N + 1
+
+    def RingCollection(self, ax):
+        """
+        Desenha os anéis de todos os emissores em `ax` como uma única EllipseCollection (em coordenadas
+        dos dados), que Increment atualiza sem percorrer os anéis um a um. Alternativa mais rápida aos
+        círculos individuais de GetCircles para animações com muitos emissores.
+        """
+        if self._collection is None:
+            from matplotlib.collections import EllipseCollection
+            self._collection = EllipseCollection(np.zeros(0), np.zeros(0), np.zeros(0), units="xy",
+                                                 offsets=np.zeros((0, 2)), offset_transform=ax.transData,
+                                                 facecolors="none", linewidths=2)
+            self._batch = None
+            ax.add_collection(self._collection)
+            self.Increment(0)
+        return self._collection
     
     def GetCircles(self):
         circles = []
@@ -19,6 +105,19 @@ class EmitterArray:
             circles.extend(emitter.circles)
         return circles
     
+    def SetFocus(self, x_focus, y_focus, color=None):
+        """
+        Refocaliza todos os emissores em (x_focus, y_focus) no próprio lugar.
+        Recalcula φ e t0 de cada emissor e reutiliza os círculos já existentes,
+        pelo que a memória se mantém constante independentemente do número de focos visitados.
+        O tempo continua a correr: as frentes já emitidas continuam a expandir-se e as novas
+        saem com a nova fase (ver Emitter.SetPhase).
+        """
+        for emitter in self.emitters:
+            emitter.SetPhase(emitter.CalculatePhaseFromFocus(x_focus, y_focus))
+            if color is not None:
+                emitter.SetColor(color)
+
     def RemoveOffset(self):
         if not self.emitters:
             return
@@ -31,40 +130,84 @@ class EmitterArray:
     def circles(self):
         return self.GetCircles()
     
-    def Visualize(self, title="Visualization"):
+    def Visualize(self, title="Visualization", mode="rings", resolution=200, spectrum=None):
         """
         Visualiza a simulação dos emissores usando animação.
-        Cada emissor é representado por vários círculos (ondas) que se expandem conforme o tempo.
+         - mode="rings": cada emissor é representado por vários círculos (ondas) que se expandem conforme o tempo.
+         - mode="field": campo instantâneo (com interferência) numa única imagem por frame.
+         - mode="intensity": intensidade média no tempo (imagem estática).
+         - resolution, spectrum: grelha de pixels e espectro por emissor dos modos raster (ver Field.FieldSynthesizer).
+        Nos modos raster o campo é o regime estacionário (sem o arranque em t0 de cada emissor) e o custo
+        de cada frame depende do número de frequências distintas, não do número de emissores.
         """
+        import matplotlib.pyplot as plt  # importação tardia: o núcleo físico não depende do matplotlib
+        if mode != "rings":
+            return self._VisualizeRaster(title, mode, resolution, spectrum)
         fig, ax = plt.subplots()
         ax.set_title(title)
         ax.set_xlim(-50, 50)
         ax.set_ylim(-10, 50)
         ax.set_aspect('equal')
         
-        # Adiciona todos os círculos ao gráfico
-        for emitter in self.emitters:
-            for circle in emitter.circles:
-                ax.add_patch(circle)
+        # Todos os anéis numa única coleção, atualizada em bloco a cada frame
+        rings = self.RingCollection(ax)
         
         from matplotlib.animation import FuncAnimation
         FPS = 30
 
         def init():
-            # Retorna todos os círculos de uma única vez (lista flat)
-            return self.GetCircles()
+            return [rings]
 
         def update(frame):
             self.Increment(1 / FPS)
-            return self.GetCircles()
+            return [rings]
 
         anim = FuncAnimation(fig, update, init_func=init, interval=1000 / FPS, blit=True)
         # Guarda a animação para evitar que seja coletada pelo garbage collector
         self.anim = anim  
         plt.show()
 
+    def _VisualizeRaster(self, title, mode, resolution, spectrum):
+        """
+        Modos "field" e "intensity" de Visualize: os mapas complexos de cada frequência são calculados
+        uma vez; cada frame é uma multiplicação-soma complexa por frequência (FieldSynthesizer.Snapshot).
+        O tempo avança com Increment, como no modo "rings", para que os dois modos fiquem sincronizados.
+        """
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+        from Field import FieldSynthesizer
+        field = FieldSynthesizer(x_limits=(-50, 50), y_limits=(-10, 50), resolution=resolution)
+        field.AddEmitterArray(self, spectrum)
+        fig, ax = plt.subplots()
+        ax.set_title(title)
+        ax.set_aspect('equal')
+        positions = np.array([emitter.r for emitter in self.emitters]).reshape(-1, 2)
+        if mode == "intensity":
+            ax.imshow(field.Intensity(), extent=field.Extent(), origin="lower", cmap="inferno")
+            ax.plot(positions[:, 0], positions[:, 1], "w.", markersize=4)
+            plt.show()
+            return
+
+        FPS = 30
+        t = self.emitters[0].t if self.emitters else 0.0
+        snapshot = field.Snapshot(t)
+        vmax = max(np.max(np.abs(snapshot)), 1e-12)
+        image = ax.imshow(snapshot, extent=field.Extent(), origin="lower", cmap="RdBu", vmin=-vmax, vmax=vmax)
+        ax.plot(positions[:, 0], positions[:, 1], "k.", markersize=4)
+
+        def update(frame):
+            self.Increment(1 / FPS)
+            image.set_data(field.Snapshot(self.emitters[0].t if self.emitters else 0.0))
+            return [image]
+
+        anim = FuncAnimation(fig, update, interval=1000 / FPS, blit=True)
+        self.anim = anim
+        plt.show()
+
 
 class Emitter:
+    revision = 0  # incrementado sempre que a fase, a cor ou os círculos de um emissor mudam (ver EmitterArray._Batch)
+
     def __init__(self, x, y, c, f, phase, rMax=100, color="tab:blue", alpha=0.6):
         """
         Inicializa um emissor com:
@@ -86,6 +229,9 @@ class Emitter:
         self.rMax = rMax
         self.alpha = alpha
         self.color = color
+        self._circles = None  # criados apenas quando há visualização (ver propriedade circles)
+        self.t = 0
+        self.phi = None
         self.SetUp()  # Configura os parâmetros da onda e cria os círculos
         self.SetPhase(phase)  # Define a fase inicial
     
@@ -95,29 +241,53 @@ class Emitter:
         A distância percorrida pela onda é dada por: r = i * λ₀ + Wrap( (λ₀*φ/(2π)) + c*t, λ₀)
         onde a velocidade efetiva pode ser ajustada multiplicando c por um TIME_MULTIPLIER
         (já incorporado via ajuste dos parâmetros físicos em Configs.py).
+        Depois de uma refocalização, as frentes emitidas com a fase anterior (ver SetPhase) continuam
+        a expandir-se no círculo seguinte (i + 1) até ao instante da mudança, com a mesma fórmula e φ_prev.
         """
         self.t += dt
-        if self.t < self.t0:
+        if self._circles is None:
             return
         
-        for i, circle in enumerate(self.circles):
-            r = i * self.lambda0 + self.Wrap(self.lambda0 * self.phi / (2 * np.pi) + self.c * self.t, self.lambda0)
+        for k, circle in enumerate(self.circles):
+            new = k < self.N and k < ((self.t - self.t0) / self.T)
+            i, phi = (k, self.phi) if new else (k - 1, self.phi_prev)
+            r = max(i * self.lambda0 + self.Wrap(self.lambda0 * phi / (2 * np.pi) + self.c * self.t, self.lambda0), 0)
+            visible = new or (0 <= i < (self.t - self.t0_prev) / self.T and r >= self.c * (self.t - self.t_switch))
             circle.set_height(2 * r)
             circle.set_width(2 * r)
-            circle.set_alpha(self.alpha if i < ((self.t - self.t0) / self.T) else 0)
+            circle.set_alpha(self.alpha if visible else 0)
     
     def SetPhase(self, phi):
         """
-        Define a fase inicial do emissor e ajusta o tempo inicial (t0) para sincronização.
-        Fórmula: t0 = T * (1 - φ/(2π))
+        Define a fase do emissor e ajusta o instante (t0) em que começa a emitir com ela, para sincronização.
+        Fórmula: t0 = t + T - Wrap(t + T·φ/(2π), T), o primeiro instante depois do tempo atual t do emissor
+        em que a fase φ tem uma frente de raio 0 (com t = 0: t0 = T * (1 - φ/(2π))).
+        O tempo não é reiniciado: as frentes emitidas antes (fase phi_prev, emissão iniciada em t0_prev)
+        continuam a expandir-se, e entre t_switch (instante da mudança) e t0 não há emissão.
         """
-        self.phi = self.Wrap(phi, 2 * np.pi)
-        self.t0 = self.T * (1 - self.phi / (2 * np.pi))
-        self.t = 0
+        phi = self.Wrap(phi, 2 * np.pi)
+        if self.phi is None:
+            # Sem emissão anterior: t0_prev infinito, nenhuma frente da fase anterior
+            self.phi_prev, self.t0_prev = phi, np.inf
+        else:
+            self.phi_prev, self.t0_prev = self.phi, self.t0
+        self.t_switch = self.t
+        self.phi = phi
+        self.t0 = self.t + self.T - self.Wrap(self.t + self.T * self.phi / (2 * np.pi), self.T)
+        Emitter.revision += 1
     
+    def SetColor(self, color):
+        """
+        Altera a cor do emissor, reaproveitando os círculos existentes.
+        """
+        self.color = color
+        for circle in self._circles or []:
+            circle.set_edgecolor(color)
+        Emitter.revision += 1
+
     def SetUp(self):
         """
-        Configura os parâmetros do emissor e cria os círculos que representam as ondas.
+        Configura os parâmetros do emissor.
         Fórmulas:
           - λ₀ = c / f  (comprimento de onda)
           - T = 1 / f   (período)
@@ -125,9 +295,23 @@ class Emitter:
         self.lambda0 = self.c / self.f
         self.T = 1. / self.f
         self.N = int(np.ceil(self.rMax / self.lambda0))
-        self.circles = [plt.Circle(xy=tuple(self.r), fill=False, lw=2,
-                                   radius=0, alpha=self.alpha, color=self.color)
-                        for i in range(self.N)]
+        self._circles = None
+        Emitter.revision += 1
+
+    @property
+    def circles(self):
+        """
+        Círculos que representam as ondas; o matplotlib só é importado e os círculos
+        só são criados no primeiro acesso (quando uma visualização é ligada).
+        """
+        if self._circles is None:
+            import matplotlib.pyplot as plt
+            # N anéis + 1 círculo para as frentes da fase anterior depois de uma refocalização
+            self._circles = [plt.Circle(xy=tuple(self.r), fill=False, lw=2,
+                                        radius=0, alpha=self.alpha, color=self.color)
+                             for i in range(self.N + 1)]
+            Emitter.revision += 1
+        return self._circles
     
     def Wrap(self, x, x_max):
         """
@@ -0,0 +1,106 @@
+import numpy as np
+
+
+def PulseSpectrum(f0, bandwidth, n_bins=16, chirp_rate=0.0):
+    """
+    Representa um pulso gaussiano (opcionalmente com chirp linear) como espectro discreto.
+    Devolve uma lista de (f, amplitude, fase) centrada em f0.
+    Fórmulas:
+      - Envolvente: A(f) = exp(-((f - f0) / (bandwidth/2))²)
+      - Chirp linear de taxa β (Hz/s): fase(f) = -π (f - f0)² / β
+    """
+    freqs = np.linspace(f0 - bandwidth, f0 + bandwidth, n_bins)
+    freqs = freqs[freqs > 0]
+    amps = np.exp(-((freqs - f0) / (bandwidth / 2)) ** 2)
+    amps = amps / np.sum(amps)
+    if chirp_rate != 0:
+        phases = -np.pi * (freqs - f0) ** 2 / chirp_rate
+    else:
+        phases = np.zeros_like(freqs)
+    return list(zip(freqs, amps, phases))
+
+
+class FieldSynthesizer:
+    def __init__(self, x_limits=(-50, 50), y_limits=(-10, 50), resolution=200):
+        """
+        Síntese do campo no domínio da frequência numa grelha fixa de pixels.
+        Cada frequência é avaliada uma única vez como mapa complexo U_f(x, y); os instantâneos
+        e a intensidade média são obtidos por recombinação:
+          - p(x, y, t) = Re{ Σ_f U_f(x, y) · e^{-i 2π f t} }
+          - <p²>(x, y) = ½ Σ_f |U_f(x, y)|²   (frequências distintas não interferem em média)
+        """
+        self.x_limits = x_limits
+        self.y_limits = y_limits
+        aspect = (y_limits[1] - y_limits[0]) / (x_limits[1] - x_limits[0])
+        self.nx = resolution
+        self.ny = max(int(round(resolution * aspect)), 1)
+        self.x = np.linspace(x_limits[0], x_limits[1], self.nx)
+        self.y = np.linspace(y_limits[0], y_limits[1], self.ny)
+        self.X, self.Y = np.meshgrid(self.x, self.y)
+        self.r_min = (x_limits[1] - x_limits[0]) / self.nx
+        self.components = {}  # frequência -> mapa complexo U_f
+        self._freqs = None
+        self._stack = None
+
+    def AddEmitter(self, emitter, spectrum=None):
+        """
+        Soma a contribuição de um emissor a cada bin de frequência.
+         - spectrum: lista de (f, amplitude, fase); por omissão, um único bin na frequência do emissor.
+        A fase φ do emissor é convertida num atraso τ = φ / (2π f_e), pelo que o foco se mantém
+        para qualquer bin do espectro:
+          U_f += A / √r · e^{i (k_f r - 2π f τ + fase)},  k_f = 2π f / c
+        """
+        if spectrum is None:
+            spectrum = [(emitter.f, 1.0, 0.0)]
+        tau = emitter.phi / (2 * np.pi * emitter.f)
+        r = np.sqrt((self.X - emitter.r[0]) ** 2 + (self.Y - emitter.r[1]) ** 2)
+        np.maximum(r, self.r_min, out=r)
+        spreading = 1 / np.sqrt(r)
+        for f, amp, phase in spectrum:
+            k = 2 * np.pi * f / emitter.c
+            term = (amp * spreading) * np.exp(1j * (k * r - 2 * np.pi * f * tau + phase))
+            if f in self.components:
+                self.components[f] += term
+            else:
+                self.components[f] = term
+        self._stack = None
+
+    def AddEmitterArray(self, emitter_array, spectrum=None):
+        """
+        Adiciona todos os emissores de um EmitterArray (agrupados automaticamente por frequência).
+        """
+        for emitter in emitter_array.emitters:
+            self.AddEmitter(emitter, spectrum)
+
+    def _Stack(self):
+        if self._stack is None:
+            self._freqs = np.array(list(self.components.keys()))
+            self._stack = np.stack([self.components[f] for f in self._freqs])
+        return self._freqs, self._stack
+
+    def Snapshot(self, t):
+        """
+        Campo instantâneo no tempo t: uma multiplicação-soma complexa por bin de frequência.
+        """
+        freqs, stack = self._Stack()
+        weights = np.exp(-2j * np.pi * freqs * t)
+        return np.tensordot(weights, stack, axes=1).real
+
+    def Intensity(self):
+        """
+        Intensidade média no tempo (<p²>).
+        """
+        _, stack = self._Stack()
+        return 0.5 * np.sum(np.abs(stack) ** 2, axis=0)
+
+    def Frames(self, times):
+        """
+        Gera os instantâneos para uma sequência de tempos (uma única avaliação do campo por bin).
+        """
+        freqs, stack = self._Stack()
+        for t in times:
+            weights = np.exp(-2j * np.pi * freqs * t)
+            yield np.tensordot(weights, stack, axes=1).real
+
+    def Extent(self):
+        return [self.x_limits[0], self.x_limits[1], self.y_limits[0], self.y_limits[1]]
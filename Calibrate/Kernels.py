@@ -0,0 +1,96 @@
+"""
+Kernel em lote para a atualização das frentes de onda de todos os emissores (Emitter.Increment).
+
+Se o Numba estiver instalado, o kernel é compilado (ciclo paralelo, sem arrays temporários);
+caso contrário usa-se a implementação NumPy de referência. DISABLE_JIT=1 força a versão NumPy.
+Para verificar a equivalência com Emitter.Increment: python Kernels.py
+"""
+import os
+import importlib.util
+import numpy as np
+
+# O Numba só é importado (em KernelsJit.py) na primeira chamada ao kernel compilado
+USE_JIT = os.environ.get("DISABLE_JIT", "0") != "1" and importlib.util.find_spec("numba") is not None
+
+_jit = None
+
+
+def _JitKernels():
+    """
+    Módulo com o kernel compilado, importado (e compilado) na primeira utilização.
+    """
+    global _jit
+    if _jit is None:
+        import KernelsJit
+        _jit = KernelsJit
+    return _jit
+
+
+def _WrapNumpy(x, x_max):
+    return np.where(x >= 0, x - np.floor(x / x_max) * x_max, x_max - (-x - np.floor(-x / x_max) * x_max))
+
+
+def RingStateNumpy(t, t0, T, lambda0, phi, c, phi_prev, t0_prev, t_switch, n_rings, owner, ring_index, radii_out,
+                   visible_out):
+    """
+    Referência NumPy. Cada emissor tem n_rings + 1 posições; na posição k (índice s) do emissor owner[k]:
+      - frente i = s emitida com a fase atual, se s < n_rings e s < (t - t0)/T:
+        r = i * λ₀ + Wrap(λ₀φ/(2π) + c·t, λ₀), visível;
+      - senão, frente i = s - 1 emitida com a fase anterior (entre t0_prev e a refocalização em t_switch):
+        r = i * λ₀ + Wrap(λ₀φ_prev/(2π) + c·t, λ₀),
+        visível se i >= 0, i < (t - t0_prev)/T e r >= c·(t - t_switch).
+    As frentes anteriores ficam uma posição à frente para não disputarem a posição da frente nova mais antiga.
+    """
+    new = (ring_index < n_rings[owner]) & (ring_index < ((t - t0) / T)[owner])
+    index = np.where(new, ring_index, ring_index - 1)
+    wrapped = np.where(new, _WrapNumpy(lambda0 * phi / (2 * np.pi) + c * t, lambda0)[owner],
+                       _WrapNumpy(lambda0 * phi_prev / (2 * np.pi) + c * t, lambda0)[owner])
+    np.maximum(index * lambda0[owner] + wrapped, 0, out=radii_out)
+    previous = (index >= 0) & (index < ((t - t0_prev) / T)[owner]) & (radii_out >= (c * (t - t_switch))[owner])
+    np.logical_or(new, previous, out=visible_out)
+
+
+def RingState(t, t0, T, lambda0, phi, c, phi_prev, t0_prev, t_switch, n_rings, owner, ring_index, radii_out,
+              visible_out):
+    """
+    Atualiza radii_out/visible_out no próprio lugar (Numba se disponível, senão NumPy).
+    """
+    if not USE_JIT:
+        RingStateNumpy(t, t0, T, lambda0, phi, c, phi_prev, t0_prev, t_switch, n_rings, owner, ring_index, radii_out,
+                       visible_out)
+    else:
+        _JitKernels().RingStateJit(t, t0, T, lambda0, phi, c, phi_prev, t0_prev, t_switch, n_rings, owner, ring_index,
+                                   radii_out, visible_out)
+
+
+def CheckEquivalence(n_emitters=20, steps=50, dt=1 / 30, seed=0):
+    """
+    Compara o kernel em lote com Emitter.Increment emissor a emissor (com uma refocalização a meio).
+    """
+    from Emitter import Emitter, EmitterArray
+    from Configs import SOUND_SPEED, FREQUENCY_HZ
+    rng = np.random.default_rng(seed)
+    reference, batched = EmitterArray(), EmitterArray()
+    for _ in range(n_emitters):
+        x, y = rng.uniform(-20, 20, 2)
+        f = FREQUENCY_HZ * rng.uniform(0.5, 1.5)
+        phase = rng.uniform(0, 4 * np.pi)
+        reference.AddEmitter(Emitter(x, y, SOUND_SPEED, f, phase))
+        batched.AddEmitter(Emitter(x, y, SOUND_SPEED, f, phase))
+    reference.circles, batched.circles  # cria os círculos em ambos
+    for step in range(steps):
+        if step == steps // 2:  # refocalização a meio: frentes das duas fases ao mesmo tempo
+            reference.SetFocus(3, 12)
+            batched.SetFocus(3, 12)
+        for emitter in reference.emitters:
+            emitter.Increment(dt)
+        batched.Increment(dt)
+        for e_ref, e_fast in zip(reference.emitters, batched.emitters):
+            for c_ref, c_fast in zip(e_ref.circles, e_fast.circles):
+                assert np.isclose(c_ref.get_width(), c_fast.get_width()), "raios diferentes"
+                assert c_ref.get_alpha() == c_fast.get_alpha(), "visibilidade diferente"
+    print(f"Kernel equivalente ({'Numba' if USE_JIT else 'NumPy'}), {n_emitters} emissores, {steps} passos.")
+
+
+if __name__ == "__main__":
+    CheckEquivalence()
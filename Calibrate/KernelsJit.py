@@ -0,0 +1,28 @@
+"""
+Versão compilada (Numba) do kernel de Kernels.py. Este módulo só é importado por Kernels.py
+na primeira chamada com JIT ativo, para que importar os emissores não carregue o Numba.
+"""
+import numba
+import numpy as np
+
+
+@numba.njit(parallel=True, cache=True)
+def RingStateJit(t, t0, T, lambda0, phi, c, phi_prev, t0_prev, t_switch, n_rings, owner, ring_index, radii_out,
+                 visible_out):
+    for k in numba.prange(owner.shape[0]):
+        e = owner[k]
+        lam = lambda0[e]
+        new = ring_index[k] < n_rings[e] and ring_index[k] < (t[e] - t0[e]) / T[e]
+        if new:
+            i = ring_index[k]
+            x = lam * phi[e] / (2 * np.pi) + c[e] * t[e]
+        else:
+            i = ring_index[k] - 1
+            x = lam * phi_prev[e] / (2 * np.pi) + c[e] * t[e]
+        if x >= 0:
+            wrapped = x - np.floor(x / lam) * lam
+        else:
+            wrapped = lam - (-x - np.floor(-x / lam) * lam)
+        radii_out[k] = max(i * lam + wrapped, 0.0)
+        visible_out[k] = new or (i >= 0 and i < (t[e] - t0_prev[e]) / T[e] and
+                                 radii_out[k] >= c[e] * (t[e] - t_switch[e]))
@@ -3,7 +3,7 @@
 import matplotlib.pyplot as plt
 from Emitter import EmitterArray
 import Demos
-from Configs import N
+from Configs import N, VISUALIZATION_MODE
 
 # Configurações gerais do matplotlib para melhorar a visualização
 graph_size = 8
@@ -22,15 +22,17 @@ demo_functions = [
     Demos.demo6,
     Demos.demo7,
     Demos.demo8,
+    Demos.demo10,
 ]
 
 def run_demos():
-    for i, demo_func in enumerate(demo_functions):
-        print(f"Executando Demo {i + 1}")
+    for demo_func in demo_functions:
+        number = demo_func.__name__[len("demo"):]  # o demo9 não faz parte da lista
+        print(f"Executando Demo {number}")
         ea = EmitterArray()
         # Usamos N emissores para cada demo
         demo_func(ea, N)
-        ea.Visualize(title=f"Demo {i + 1}")
+        ea.Visualize(title=f"Demo {number}", mode=VISUALIZATION_MODE)
 
 if __name__ == "__main__":
     Demos.demo9()
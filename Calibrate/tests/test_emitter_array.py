@@ -0,0 +1,86 @@
+"""
+EmitterArray.Increment: arrays do kernel reutilizados entre frames, anéis em coleção iguais aos círculos
+individuais e frentes que continuam a expandir-se depois de uma refocalização.
+"""
+import numpy as np
+import pytest
+from Emitter import Emitter, EmitterArray
+from Configs import SOUND_SPEED, FREQUENCY_HZ
+
+plt = pytest.importorskip("matplotlib.pyplot")
+
+
+def _arrays(n_emitters=6, seed=0):
+    rng = np.random.default_rng(seed)
+    pair = EmitterArray(), EmitterArray()
+    for _ in range(n_emitters):
+        x, y = rng.uniform(-20, 20, 2)
+        f = FREQUENCY_HZ * rng.uniform(0.5, 1.5)
+        phase = rng.uniform(0, 4 * np.pi)
+        for array in pair:
+            array.AddEmitter(Emitter(x, y, SOUND_SPEED, f, phase))
+    return pair
+
+
+def test_batch_reused_until_emitters_change():
+    array, _ = _arrays()
+    array.circles
+    array.Increment(1 / 30)
+    batch = array._batch
+    for _ in range(5):
+        array.Increment(1 / 30)
+        assert array._batch is batch
+    array.SetFocus(0, 10)
+    array.Increment(1 / 30)
+    assert array._batch is not batch
+
+
+def test_ring_collection_matches_circles():
+    patches, collection = _arrays()
+    patches.circles
+    fig, ax = plt.subplots()
+    rings = collection.RingCollection(ax)
+    for step in range(40):
+        if step == 20:
+            patches.SetFocus(5, 15)
+            collection.SetFocus(5, 15)
+        patches.Increment(1 / 30)
+        collection.Increment(1 / 30)
+        circles = patches.GetCircles()
+        widths = np.array([circle.get_width() for circle in circles])
+        alphas = np.array([circle.get_alpha() for circle in circles])
+        # Círculos com raio 0 (emissores que ainda não começaram a emitir) não aparecem em nenhum dos modos
+        drawn = widths > 0
+        np.testing.assert_allclose(rings.get_widths(), widths)
+        np.testing.assert_allclose(rings.get_edgecolor()[drawn, 3], alphas[drawn])
+    plt.close(fig)
+
+
+def test_refocus_keeps_existing_rings_expanding():
+    array = EmitterArray()
+    emitter = Emitter(0, 0, SOUND_SPEED, 10 * FREQUENCY_HZ, 0.0)  # anéis suficientes dentro de rMax
+    array.AddEmitter(emitter)
+    circles = emitter.circles
+    dt = emitter.T / 7
+    for _ in range(40):
+        array.Increment(dt)
+
+    def outer_radius():
+        return max(circle.get_width() / 2 for circle in circles if circle.get_alpha() > 0)
+
+    before, t = outer_radius(), emitter.t
+    count = sum(circle.get_alpha() > 0 for circle in circles)
+    array.SetFocus(10, 20)
+    assert emitter.t == t
+    assert emitter.t0 > t  # a nova fase só começa a ser emitida depois da mudança
+    for step in range(1, 15):
+        array.Increment(dt)
+        assert outer_radius() == pytest.approx(before + step * SOUND_SPEED * dt)
+        # Nenhuma frente desaparece durante a transição entre as duas fases
+        visible = sum(circle.get_alpha() > 0 for circle in circles)
+        assert visible >= count
+        count = visible
+    # Passado t0, há frentes novas junto ao emissor e as antigas continuam visíveis
+    radii = sorted(circle.get_width() / 2 for circle in circles if circle.get_alpha() > 0)
+    assert radii[0] < emitter.lambda0
+    assert np.all(np.diff(radii) > 0)
@@ -0,0 +1,49 @@
+"""
+FieldSynthesizer: a intensidade média é máxima (coerente) no foco de um demo e cada instantâneo
+é a soma direta das contribuições de cada emissor.
+"""
+import numpy as np
+import pytest
+from Emitter import EmitterArray
+from Field import FieldSynthesizer
+
+pytest.importorskip("matplotlib")
+import Demos  # importa o matplotlib
+
+FOCUS = (0.0, 20.0)  # foco do demo3
+
+
+def _spreading(field, emitter):
+    r = np.maximum(np.hypot(field.X - emitter.r[0], field.Y - emitter.r[1]), field.r_min)
+    return r, 1 / np.sqrt(r)
+
+
+def test_intensity_peaks_at_demo_focus():
+    emitter_array = EmitterArray()
+    Demos.demo3(emitter_array, 10)
+    # resolution=201: passo de 0.5 m, com o foco num nó da grelha
+    field = FieldSynthesizer(resolution=201)
+    field.AddEmitterArray(emitter_array)
+    intensity = field.Intensity()
+    coherent = 0.5 * sum(_spreading(field, emitter)[1] for emitter in emitter_array.emitters) ** 2
+    iy, ix = np.argwhere(np.isclose(field.Y, FOCUS[1]) & np.isclose(field.X, FOCUS[0]))[0]
+    # No foco todas as contribuições estão em fase; em qualquer outro ponto a soma é menor
+    np.testing.assert_allclose(intensity[iy, ix], coherent[iy, ix])
+    ratio = intensity / coherent
+    assert np.unravel_index(np.argmax(ratio), ratio.shape) == (iy, ix)
+    assert np.sort(ratio.ravel())[-2] < 1 - 1e-6
+
+
+@pytest.mark.parametrize("t", [0.0, 0.37, 1.1])
+def test_snapshot_matches_direct_sum(t):
+    emitter_array = EmitterArray()
+    Demos.demo5(emitter_array, 6)
+    field = FieldSynthesizer(resolution=80)
+    field.AddEmitterArray(emitter_array)
+    expected = np.zeros_like(field.X)
+    for emitter in emitter_array.emitters:
+        r, spreading = _spreading(field, emitter)
+        k = 2 * np.pi * emitter.f / emitter.c
+        expected += spreading * np.cos(k * r - emitter.phi - 2 * np.pi * emitter.f * t)
+    np.testing.assert_allclose(field.Snapshot(t), expected, atol=1e-10)
+    np.testing.assert_allclose(next(field.Frames([t])), expected, atol=1e-10)
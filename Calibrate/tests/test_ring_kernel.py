@@ -0,0 +1,45 @@
+"""
+Equivalência do kernel das frentes de onda (Kernels.RingState) com a referência NumPy e com Emitter.Increment.
+"""
+import numpy as np
+import pytest
+import Kernels
+from Configs import SOUND_SPEED, FREQUENCY_HZ
+
+
+def _ring_inputs(n_emitters=30, seed=0):
+    rng = np.random.default_rng(seed)
+    f = FREQUENCY_HZ * rng.uniform(0.5, 1.5, n_emitters)
+    lambda0 = SOUND_SPEED / f
+    T = 1 / f
+    phi = rng.uniform(0, 2 * np.pi, n_emitters)
+    t0 = T * (1 - phi / (2 * np.pi))
+    t = rng.uniform(0, 2 * T.max(), n_emitters)  # alguns emissores ainda inativos (t < t0)
+    # Metade dos emissores foi refocalizada: frentes da fase anterior ainda visíveis
+    phi_prev = rng.uniform(0, 2 * np.pi, n_emitters)
+    t_switch = np.where(np.arange(n_emitters) % 2 == 0, t - rng.uniform(0, T), 0.0)
+    t0_prev = np.where(t_switch > 0, t_switch - 3 * T, np.inf)
+    t0 = np.where(t_switch > 0, t_switch + T - np.mod(t_switch + T * phi / (2 * np.pi), T), t0)
+    n_rings = rng.integers(1, 12, n_emitters).astype(float)
+    owner = np.repeat(np.arange(n_emitters), n_rings.astype(int) + 1)
+    ring_index = np.concatenate([np.arange(n + 1) for n in n_rings.astype(int)]).astype(float)
+    c = np.full(n_emitters, float(SOUND_SPEED))
+    return t, t0, T, lambda0, phi, c, phi_prev, t0_prev, t_switch, n_rings, owner, ring_index
+
+
+def test_ring_state_jit_matches_numpy():
+    pytest.importorskip("numba")
+    inputs = _ring_inputs()
+    owner = inputs[-2]
+    radii_ref, visible_ref = np.full(len(owner), -1.0), np.zeros(len(owner), dtype=bool)
+    radii_jit, visible_jit = radii_ref.copy(), visible_ref.copy()
+    Kernels.RingStateNumpy(*inputs, radii_ref, visible_ref)
+    assert visible_ref.any() and not visible_ref.all()
+    Kernels._JitKernels().RingStateJit(*inputs, radii_jit, visible_jit)
+    np.testing.assert_allclose(radii_jit, radii_ref)
+    np.testing.assert_array_equal(visible_jit, visible_ref)
+
+
+def test_batched_increment_matches_emitters():
+    pytest.importorskip("matplotlib")
+    Kernels.CheckEquivalence(n_emitters=8, steps=20)
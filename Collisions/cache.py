@@ -0,0 +1,286 @@
+# cache.py
+"""
+Cache em disco, endereçada por conteúdo, dos resultados de simulações e de estatísticas.
+
+A chave de cada entrada é um hash SHA-1 estável dos parâmetros que determinam o resultado
+(pontos da superfície, configuração dos sensores, constantes físicas, semente, ...) e da versão
+do código (hash das fontes dos módulos envolvidos). Cada entrada é um ficheiro pickle com um
+ficheiro de metadados ao lado; a data de modificação regista o último acesso (LRU) e, quando a
+cache excede o tamanho máximo, as entradas menos usadas são removidas.
+
+Execuções sem semente (dispersão não determinística) não são guardadas.
+
+Inspeção e limpeza:
+  python cache.py list
+  python cache.py prune --max-mb 100
+  python cache.py clear
+"""
+import os
+import json
+import time
+import pickle
+import hashlib
+import argparse
+from configs import CACHE_DIR, CACHE_MAX_MB
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Fontes de que depende cada tipo de resultado (a sua alteração invalida as entradas)
+CODE_MODULES = {
+    "simulation": ["simulation.py", "ray.py", "surface.py", "sensor.py", "context.py", "kernels.py", "kernels_jit.py",
+                   "spatial_hash.py", "pipeline.py", "motion.py", "shard.py", "configs.py",
+                   os.path.join("..", "Calibrate", "Emitter.py"), os.path.join("..", "Calibrate", "Configs.py"),
+                   os.path.join("..", "Calibrate", "Kernels.py"), os.path.join("..", "Calibrate", "KernelsJit.py")],
+    "stats": ["stats.py", "inverse.py", "detection_store.py", "configs.py"],
+}
+
+_code_versions = {}
+_sizes = {}  # tamanho total conhecido de cada diretório de cache neste processo (ver ResultCache.size)
+
+
+def code_version(kind):
+    """
+    Hash das fontes dos módulos de que depende o tipo de resultado `kind`.
+    """
+    if kind not in _code_versions:
+        digest = hashlib.sha1()
+        for name in CODE_MODULES.get(kind, []):
+            try:
+                with open(os.path.join(BASE_DIR, name), "rb") as f:
+                    digest.update(f.read())
+            except OSError:
+                digest.update(name.encode("utf-8"))
+        _code_versions[kind] = digest.hexdigest()
+    return _code_versions[kind]
+
+
+def _to_native(x):
+    if hasattr(x, 'tolist'):
+        return x.tolist()
+    if isinstance(x, (set, frozenset)):
+        return sorted(x)
+    return str(x)
+
+
+def cache_key(kind, params):
+    """
+    Chave estável: SHA-1 do tipo, da versão do código e dos parâmetros em JSON canónico
+    (arrays NumPy e tuplos são normalizados para listas).
+    """
+    canonical = json.dumps({"kind": kind, "code": code_version(kind), "params": params},
+                           sort_keys=True, default=_to_native)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def file_digest(path):
+    """
+    Hash do conteúdo de um ficheiro (para chaves de resultados derivados de ficheiros).
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory=CACHE_DIR, max_mb=CACHE_MAX_MB):
+        """
+        Cache de resultados em `directory`, limitada a `max_mb` megabytes (LRU).
+        É segura entre processos: cada entrada é escrita num ficheiro temporário e renomeada.
+        """
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, key):
+        folder = os.path.join(self.directory, key[:2])
+        return os.path.join(folder, key + ".pkl"), os.path.join(folder, key + ".json")
+
+    def _entry_bytes(self, key):
+        size = 0
+        for path in self._paths(key):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def size(self):
+        """
+        Tamanho total da cache em bytes. O diretório é percorrido uma única vez por processo; a partir daí
+        o total é mantido por put/remove/prune (entradas escritas por outros processos só são contadas
+        no próximo prune, que volta a percorrer o diretório).
+        """
+        directory = os.path.abspath(self.directory)
+        if directory not in _sizes:
+            _sizes[directory] = sum(entry["bytes"] for entry in self.entries())
+        return _sizes[directory]
+
+    def _add_size(self, delta):
+        _sizes[os.path.abspath(self.directory)] = self.size() + delta
+
+    def get(self, key):
+        """
+        Devolve o valor guardado ou None; um acerto atualiza o instante de último acesso.
+        """
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(data_path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        now = time.time()
+        for path in (data_path, meta_path):
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+        self.hits += 1
+        return value
+
+    def put(self, key, value, kind="", label=""):
+        """
+        Guarda um valor (pickle) e os seus metadados; remove entradas antigas se o limite for excedido.
+        """
+        data_path, meta_path = self._paths(key)
+        self.size()
+        previous = self._entry_bytes(key)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        tmp = f"{data_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, data_path)
+        meta = {"key": key, "kind": kind, "label": label, "created": time.time(),
+                "size": os.path.getsize(data_path)}
+        tmp = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+        self._add_size(self._entry_bytes(key) - previous)
+        if 0 < self.max_bytes < self.size():
+            self.prune()
+
+    def get_or_compute(self, kind, params, compute, label=""):
+        """
+        Devolve o resultado em cache para (kind, params) ou calcula-o com compute() e guarda-o.
+        """
+        key = cache_key(kind, params)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            try:
+                self.put(key, value, kind, label)
+            except Exception as e:
+                print(f"Error writing cache entry {key}: {e}")
+        return value
+
+    def entries(self):
+        """
+        Lista das entradas (metadados + tamanho em disco + último acesso), da mais antiga para a mais recente.
+        """
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for folder in os.listdir(self.directory):
+            path = os.path.join(self.directory, folder)
+            if not os.path.isdir(path):
+                continue
+            for name in os.listdir(path):
+                if not name.endswith(".pkl"):
+                    continue
+                data_path = os.path.join(path, name)
+                meta_path = data_path[:-4] + ".json"
+                try:
+                    stat = os.stat(data_path)
+                    meta = {}
+                    if os.path.exists(meta_path):
+                        with open(meta_path, "r", encoding="utf-8") as f:
+                            meta = json.load(f)
+                        size = stat.st_size + os.path.getsize(meta_path)
+                    else:
+                        size = stat.st_size
+                except (OSError, ValueError):
+                    continue
+                entries.append({**meta, "key": name[:-4], "bytes": size, "last_access": stat.st_mtime})
+        entries.sort(key=lambda entry: entry["last_access"])
+        return entries
+
+    def remove(self, key):
+        size = self._entry_bytes(key)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._add_size(-size)
+
+    def prune(self, max_bytes=None, kind=None, older_than=None):
+        """
+        Remove entradas: todas as de `kind` / sem acesso há mais de `older_than` segundos (se indicados)
+        e depois as menos usadas até o total ficar abaixo de `max_bytes` (por omissão, o limite da cache;
+        um limite <= 0 na cache significa sem limite). Devolve o número de entradas removidas.
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes if self.max_bytes > 0 else float("inf")
+        entries = self.entries()
+        _sizes[os.path.abspath(self.directory)] = sum(entry["bytes"] for entry in entries)
+        removed = 0
+        now = time.time()
+        kept = []
+        for entry in entries:
+            if (kind is not None and entry.get("kind") == kind) or \
+                    (older_than is not None and now - entry["last_access"] > older_than):
+                self.remove(entry["key"])
+                removed += 1
+            else:
+                kept.append(entry)
+        total = sum(entry["bytes"] for entry in kept)
+        for entry in kept:
+            if total <= max_bytes:
+                break
+            self.remove(entry["key"])
+            total -= entry["bytes"]
+            removed += 1
+        _sizes[os.path.abspath(self.directory)] = total
+        return removed
+
+    def clear(self):
+        return self.prune(max_bytes=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspeção e limpeza da cache de resultados.")
+    parser.add_argument("--dir", default=CACHE_DIR, help="diretório da cache")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser("list", help="lista as entradas (mais antigas primeiro)")
+    list_parser.add_argument("--kind", default=None)
+    prune_parser = subparsers.add_parser("prune", help="remove entradas até ao limite de tamanho")
+    prune_parser.add_argument("--max-mb", type=float, default=CACHE_MAX_MB)
+    prune_parser.add_argument("--kind", default=None, help="remove todas as entradas deste tipo")
+    prune_parser.add_argument("--older-than-days", type=float, default=None)
+    subparsers.add_parser("clear", help="remove todas as entradas")
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.dir)
+    if args.command == "list":
+        entries = [e for e in cache.entries() if args.kind is None or e.get("kind") == args.kind]
+        print(f"{'Chave':<12} {'Tipo':<11} {'KB':>9} {'Último acesso':<19} Descrição")
+        for entry in entries:
+            last = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["last_access"]))
+            print(f"{entry['key'][:12]:<12} {entry.get('kind', ''):<11} {entry['bytes'] / 1024:>9.1f} "
+                  f"{last:<19} {entry.get('label', '')}")
+        total = sum(entry["bytes"] for entry in entries)
+        print(f"{len(entries)} entrada(s), {total / (1024 * 1024):.2f} MB (limite {CACHE_MAX_MB} MB)")
+    elif args.command == "prune":
+        older_than = args.older_than_days * 86400 if args.older_than_days is not None else None
+        removed = cache.prune(int(args.max_mb * 1024 * 1024), args.kind, older_than)
+        print(f"{removed} entrada(s) removida(s)")
+    else:
+        print(f"{cache.clear()} entrada(s) removida(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+# checkpoint.py
+"""
+Checkpoints incrementais de uma Simulation, gravados numa thread de fundo.
+
+Estrutura do diretório de checkpoint:
+  manifest.json            - lista de checkpoints (escrito por último, de forma atómica)
+  chunk_000001.npz         - grupos de emissão criados desde o checkpoint anterior (imutáveis),
+                             registos de posição/colisão novos do contexto e as flags de deteção
+                             dos grupos (novos ou antigos) com detecções desde o checkpoint anterior
+  detections_000001.npz    - detecções novas (colunas do DetectionStore)
+  state_000001.npz         - estado mutável no frame do checkpoint: próximos tempos de emissão,
+                             contagens, matriz de crosstalk e estado do RNG
+Apenas o último ficheiro de estado é mantido; os blocos de grupos e detecções acumulam-se, pelo que
+o tamanho de cada checkpoint depende apenas do que mudou desde o anterior.
+Uma falha de escrita pára os checkpoints seguintes (que dependeriam dele) e é levantada como
+CheckpointError no ciclo de simulação.
+"""
+import os
+import json
+import queue
+import threading
+import numpy as np
+from ray import Ray
+
+MANIFEST_FILE = "manifest.json"
+CHECKPOINT_VERSION = 2
+CHECKPOINT_QUEUE_SIZE = 2  # checkpoints pendentes antes de o ciclo de simulação esperar pela escrita
+
+
+class CheckpointError(RuntimeError):
+    """
+    Falha na escrita de um checkpoint (os checkpoints seguintes deixam de ser escritos).
+    """
+
+
+def _to_native(x):
+    return x.item() if hasattr(x, 'item') else x
+
+
+def _geometry(sim):
+    """
+    Identificação da configuração da simulação, verificada ao retomar.
+    """
+    return {
+        "sensor_ids": [sensor.sensor_id for sensor in sim.sensors],
+        "sensor_positions": [list(sensor.position_at(0.0)) for sensor in sim.sensors],
+        "surface_points": np.asarray(sim.surface.points_at(0.0)).tolist(),
+        "frames": sim.frames,
+        "total_time": sim.total_time,
+    }
+
+
+def _pack_groups(groups):
+    """
+    Converte uma lista de grupos de emissão em arrays concatenados (um elemento por raio).
+    """
+    rays = [ray for group in groups for ray in group['rays']]
+    nan2 = (np.nan, np.nan)
+    return {
+        "group_emitter": np.array([group['emitter'] for group in groups], dtype=np.int64),
+        "group_emission_time": np.array([group['emission_time'] for group in groups], dtype=float),
+        "group_pulse": np.array([-1 if group['pulse'] is None else group['pulse'] for group in groups],
+                                dtype=np.int64),
+        "group_size": np.array([len(group['rays']) for group in groups], dtype=np.int64),
+        "group_emitter_velocity": np.array([group['emitter_velocity'] for group in groups], dtype=float).reshape(-1, 2),
+        "ray_sensor_pos": np.array([ray.sensor_pos for ray in rays], dtype=float).reshape(-1, 2),
+        "ray_angle": np.array([ray.emission_angle_deg for ray in rays], dtype=float),
+        "ray_color": np.array([str(ray.color) for ray in rays]),
+        "ray_loss": np.array([ray.loss_percentage for ray in rays], dtype=float),
+        "ray_weight": np.array([ray.weight for ray in rays], dtype=float),
+        "ray_dispersion": np.array([ray.dispersion_deg for ray in rays], dtype=float),
+        "ray_has_collision": np.array([ray.has_collision for ray in rays], dtype=bool),
+        "ray_collision_point": np.array([ray.collision_point if ray.has_collision else nan2 for ray in rays],
+                                        dtype=float).reshape(-1, 2),
+        "ray_reflection": np.array([ray.reflection_direction if ray.has_collision else nan2 for ray in rays],
+                                   dtype=float).reshape(-1, 2),
+        "ray_dispersion_offset": np.array([ray.dispersion_offset_deg if ray.has_collision else np.nan
+                                           for ray in rays], dtype=float),
+        "ray_t_out": np.array([ray.t_out if ray.has_collision else np.nan for ray in rays], dtype=float),
+        "ray_t_return": np.array([ray.t_return if ray.has_collision else np.nan for ray in rays], dtype=float),
+        "ray_response_time": np.array([ray.response_time if ray.has_collision else np.nan for ray in rays],
+                                      dtype=float),
+        "ray_positions": np.concatenate([group['positions'] for group in groups]).reshape(-1, 2)
+        if groups else np.zeros((0, 2)),
+    }
+
+
+def _unpack_groups(sim, data):
+    """
+    Reconstrói os grupos de emissão (Ray e arrays do lote) a partir de um bloco gravado por _pack_groups.
+    """
+    groups = []
+    start = 0
+    offsets = data["ray_dispersion_offset"] if "ray_dispersion_offset" in data.files else \
+        np.full(len(data["ray_angle"]), np.nan)
+    pulses = data["group_pulse"] if "group_pulse" in data.files else np.full(len(data["group_emitter"]), -1)
+    velocities = data["group_emitter_velocity"] if "group_emitter_velocity" in data.files else \
+        np.zeros((len(data["group_emitter"]), 2))
+    weights = data["ray_weight"] if "ray_weight" in data.files else np.ones(len(data["ray_angle"]))
+    for emitter, emission_time, size, velocity, pulse in zip(data["group_emitter"], data["group_emission_time"],
+                                                             data["group_size"], velocities, pulses):
+        rays = []
+        for k in range(start, start + size):
+            sensor_pos = data["ray_sensor_pos"][k].astype(sim.sensors[emitter].position.dtype)
+            ray = Ray(sensor_pos, data["ray_angle"][k], sensor_id=sim.sensors[emitter].sensor_id,
+                      color=str(data["ray_color"][k]), loss_percentage=data["ray_loss"][k],
+                      dispersion_deg=data["ray_dispersion"][k], context=sim.context, weight=weights[k])
+            if data["ray_has_collision"][k]:
+                ray.has_collision = True
+                ray.collision_point = data["ray_collision_point"][k].copy()
+                ray.reflection_direction = data["ray_reflection"][k].copy()
+                ray.dispersion_offset_deg = None if np.isnan(offsets[k]) else offsets[k]
+                ray.t_out = data["ray_t_out"][k]
+                ray.t_return = data["ray_t_return"][k]
+                ray.response_time = data["ray_response_time"][k]
+            rays.append(ray)
+        origins = np.array([ray.sensor_pos for ray in rays], dtype=float).reshape(-1, 2)
+        directions = np.array([ray.direction for ray in rays], dtype=float).reshape(-1, 2)
+        groups.append({
+            'sensor_id': sim.sensors[emitter].sensor_id,
+            'rays': rays,
+            'markers': [],
+            'positions': data["ray_positions"][start:start + size].copy(),
+            'emission_time': float(emission_time),
+            'arrays': sim._ray_arrays(rays, origins, directions),
+            'emitter': int(emitter),
+            'detected': np.zeros((len(rays), len(sim.sensors)), dtype=bool),
+            'emitter_velocity': velocity.copy(),
+            'pulse': None if pulse < 0 else int(pulse),
+        })
+        start += size
+    return groups
+
+
+def capture_state(sim, frame):
+    """
+    Estado mutável da simulação no fim do frame indicado (cópias, seguras para gravar noutra thread).
+    As flags de deteção são gravadas à parte, só para os grupos que mudaram (ver capture_detected).
+    """
+    version, internal, gauss_next = sim.context.rng.getstate()
+    return {
+        "frame": np.array(frame),
+        "next_emission_time": np.array([sim.sensor_next_emission_time[sensor.sensor_id] for sensor in sim.sensors],
+                                       dtype=float),
+        "emitted": sim.emitted.copy(),
+        "crosstalk": sim.crosstalk.copy(),
+        "n_groups": np.array(len(sim.emission_groups)),
+        "n_detections": np.array(len(sim.detection_store)),
+        "n_records": np.array(len(sim.context.simulation_data)),
+        "frame_counter": np.array(sim.context.frame_counter),
+        "pulse_count": np.array(sim.pulse_count),
+        "rng_version": np.array(version),
+        "rng_internal": np.array(internal, dtype=np.uint32),
+        "rng_gauss_next": np.array(np.nan if gauss_next is None else gauss_next),
+    }
+
+
+def capture_detected(sim, saved_counts):
+    """
+    Flags de deteção dos grupos com detecções novas desde o checkpoint anterior, em que o grupo g
+    tinha saved_counts[g] flags ativas (as flags só passam de falso a verdadeiro; grupos em falta contam 0).
+    Devolve (arrays para o bloco do checkpoint, contagens atuais por grupo).
+    """
+    groups = sim.emission_groups
+    counts = [int(np.count_nonzero(group['detected'])) for group in groups]
+    changed = [g for g, n in enumerate(counts) if n != (saved_counts[g] if g < len(saved_counts) else 0)]
+    flags = np.concatenate([groups[g]['detected'] for g in changed]) if changed else np.zeros(0, dtype=bool)
+    return {"detected_groups": np.array(changed, dtype=np.int64), "detected": np.packbits(flags)}, counts
+
+
+def _apply_detected(groups, n_sensors, data):
+    """
+    Repõe as flags de deteção gravadas por capture_detected nos grupos indicados.
+    """
+    sizes = [len(groups[g]['rays']) for g in data["detected_groups"]]
+    flags = np.unpackbits(data["detected"], count=sum(sizes) * n_sensors).astype(bool).reshape(-1, n_sensors)
+    start = 0
+    for g, size in zip(data["detected_groups"], sizes):
+        groups[g]['detected'] = flags[start:start + size].copy()
+        start += size
+
+
+class CheckpointWriter:
+    def __init__(self, directory, sim, resume=False):
+        """
+        Escreve checkpoints incrementais de `sim` em `directory` numa thread de fundo:
+         - o ciclo de simulação só copia o estado (capture_state e blocos novos) e coloca-o na fila;
+         - a compressão e a escrita em disco são feitas pela thread.
+        Com resume=True continua a numeração e os blocos do manifesto existente.
+        Uma falha na thread é guardada e levantada (CheckpointError) na chamada seguinte a submit ou close.
+        """
+        self.directory = directory
+        self.sim = sim
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = {"version": CHECKPOINT_VERSION, "geometry": json.loads(json.dumps(_geometry(sim),
+                                                                                       default=_to_native)),
+                         "checkpoints": []}
+        if resume:
+            self.manifest = read_manifest(directory)
+        last = self.manifest["checkpoints"][-1] if self.manifest["checkpoints"] else None
+        self.saved_groups = last["n_groups"] if last else 0
+        self.saved_detections = last["n_detections"] if last else 0
+        self.saved_records = last["n_records"] if last else 0
+        # Flags ativas por grupo no último checkpoint; ao retomar, o primeiro checkpoint grava todos os grupos
+        # com detecções (que se sobrepõem às flags anteriores)
+        self.saved_detected = []
+        self.failed = False
+        self.error = None
+        self.queue = queue.Queue(maxsize=CHECKPOINT_QUEUE_SIZE)
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def submit(self, frame):
+        """
+        Captura o estado no fim de `frame` e agenda a escrita (bloqueia apenas se a fila estiver cheia).
+        """
+        self._raise_error()
+        if self.failed:
+            return
+        sim = self.sim
+        state = capture_state(sim, frame)
+        chunk = _pack_groups(sim.emission_groups[self.saved_groups:])
+        detected, self.saved_detected = capture_detected(sim, self.saved_detected)
+        chunk.update(detected)
+        chunk["records"] = np.array(json.dumps(sim.context.simulation_data[self.saved_records:], default=_to_native))
+        detections = sim.detection_store.columns(self.saved_detections)
+        self.saved_groups = int(state["n_groups"])
+        self.saved_detections = int(state["n_detections"])
+        self.saved_records = int(state["n_records"])
+        self.queue.put((int(frame), chunk, detections, state))
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                if not self.failed:
+                    self._write(*item)
+            except Exception as e:
+                # Os checkpoints seguintes dependeriam deste: deixam de ser escritos
+                self.failed = True
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def _raise_error(self):
+        """
+        Levanta (uma vez) a falha de escrita ocorrida na thread, se houver.
+        """
+        error, self.error = self.error, None
+        if error is not None:
+            raise CheckpointError(f"Falha ao escrever o checkpoint em '{self.directory}': {error}") from error
+
+    def _write(self, frame, chunk, detections, state):
+        index = len(self.manifest["checkpoints"]) + 1
+        names = {
+            "chunk": f"chunk_{index:06d}.npz",
+            "detections": f"detections_{index:06d}.npz",
+            "state": f"state_{index:06d}.npz",
+        }
+        np.savez_compressed(os.path.join(self.directory, names["chunk"]), **chunk)
+        np.savez_compressed(os.path.join(self.directory, names["detections"]), **detections)
+        np.savez_compressed(os.path.join(self.directory, names["state"]), **state)
+        previous = self.manifest["checkpoints"][-1] if self.manifest["checkpoints"] else None
+        self.manifest["checkpoints"].append({
+            "frame": frame,
+            **names,
+            "n_groups": int(state["n_groups"]),
+            "n_detections": int(state["n_detections"]),
+            "n_records": int(state["n_records"]),
+        })
+        # O manifesto é substituído atomicamente: um checkpoint só conta depois de estar completo
+        tmp = os.path.join(self.directory, MANIFEST_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, os.path.join(self.directory, MANIFEST_FILE))
+        if previous is not None:
+            try:
+                os.remove(os.path.join(self.directory, previous["state"]))
+            except OSError:
+                pass
+
+    def close(self):
+        """
+        Espera que os checkpoints pendentes sejam escritos, termina a thread e levanta uma falha ainda não indicada.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        self._raise_error()
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def restore(sim, directory):
+    """
+    Repõe em `sim` o estado do último checkpoint de `directory` e devolve o frame seguinte.
+    A simulação tem de ter sido criada com a mesma superfície, sensores, frames e tempo total.
+    """
+    from detection_store import DetectionStore
+    manifest = read_manifest(directory)
+    if not manifest["checkpoints"]:
+        raise ValueError(f"Sem checkpoints em {directory}")
+    geometry = json.loads(json.dumps(_geometry(sim), default=_to_native))
+    if manifest["geometry"] != geometry:
+        raise ValueError("O checkpoint foi criado com outra configuração de simulação")
+
+    groups, detections, records = [], [], []
+    for entry in manifest["checkpoints"]:
+        with np.load(os.path.join(directory, entry["chunk"])) as chunk:
+            groups.extend(_unpack_groups(sim, chunk))
+            records.extend(json.loads(str(chunk["records"])))
+            if "detected_groups" in chunk.files:
+                _apply_detected(groups, len(sim.sensors), chunk)
+        detections.extend(DetectionStore.load(os.path.join(directory, entry["detections"])).to_records())
+
+    last = manifest["checkpoints"][-1]
+    with np.load(os.path.join(directory, last["state"])) as state:
+        if "detected" in state.files:
+            # Versão 1: flags de todos os grupos no ficheiro de estado
+            _apply_detected(groups, len(sim.sensors), {"detected_groups": np.arange(len(groups)),
+                                                       "detected": state["detected"]})
+        for group in groups:
+            for ray, row in zip(group['rays'], group['detected']):
+                ray.detected_by = [sim.sensors[j].sensor_id for j in np.nonzero(row)[0]]
+
+        sim.emission_groups = groups
+        sim.detections = detections
+        sim.detection_store = DetectionStore.from_results(detections)
+        sim.sensor_next_emission_time = {sensor.sensor_id: float(t) for sensor, t
+                                         in zip(sim.sensors, state["next_emission_time"])}
+        sim.emitted = state["emitted"].astype(float)
+        sim.crosstalk = state["crosstalk"].astype(float)
+        sim.context.simulation_data = records
+        sim.context.frame_counter = int(state["frame_counter"])
+        if "pulse_count" in state.files:
+            sim.pulse_count = int(state["pulse_count"])
+        gauss_next = float(state["rng_gauss_next"])
+        sim.context.rng.setstate((int(state["rng_version"]), tuple(int(v) for v in state["rng_internal"]),
+                                  None if np.isnan(gauss_next) else gauss_next))
+        return int(state["frame"]) + 1
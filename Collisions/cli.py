@@ -0,0 +1,280 @@
+# cli.py
+"""
+Ponto de entrada único (sem janelas gráficas) para simulação, calibração e estatísticas.
+
+Exemplos:
+  python cli.py simulate cenario1.json cenario2.json --workers 4 --output runs
+  python cli.py calibrate cenario1.json --output runs
+  python cli.py stats runs/cenario1/focus_0.0_10.0 runs/cenario2
+  python cli.py stats resultados_antigos --scenario cenario1.json
+  python cli.py --no-cache simulate cenario1.json
+  python cli.py simulate cenario_grande.json --shards 8
+Os resultados de simulações com semente e as estatísticas ficam na cache (ver cache.py).
+"""
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from scenario import load_scenario, scenario_context
+from pipeline import CalibrationPipeline, create_sensor, focus_to_tuple
+from simulation import Simulation
+from shard import run_sharded
+from stats import load_results, load_statistics_from_json, load_sensor_positions, calcular_estatisticas
+from stats import StatsContext
+from cache import ResultCache, file_digest
+from configs import CACHE_DIR
+
+
+def to_native(data):
+    """
+    Converte tipos NumPy em tipos nativos do Python para gravação em JSON.
+    """
+    return json.loads(json.dumps(data, default=lambda x: x.item() if hasattr(x, 'item') else x))
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(to_native(data), f, indent=4, ensure_ascii=False)
+
+
+def job_simulate(scenario, focus, output_dir, checkpoint_every=0, resume=False, cache_dir=None, record=False,
+                 shards=1):
+    """
+    Executa um cenário (para um ponto focal, ou com os initial_delay configurados se focus for None)
+    e grava 'resultados.json', 'nrparticulas.json' e 'fisica.json' (constantes físicas do cenário,
+    usadas pelo subcomando stats) no diretório do job.
+    Com checkpoint_every > 0 grava checkpoints em '<output_dir>/checkpoint'; resume retoma do último.
+    Com cache_dir e semente definida, uma execução idêntica já feita é lida da cache.
+    Com record=True grava a trajetória em '<output_dir>/trajectory' para replay (sem usar a cache).
+    Com shards > 1 os pulsos são repartidos por esse número de processos (ver shard.py).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if shards > 1 and (checkpoint_every > 0 or resume or record):
+        raise ValueError("A execução com shards não suporta checkpoints nem gravação da trajetória")
+
+    def compute():
+        return _simulate(scenario, focus, output_dir, checkpoint_every, resume, record, shards)
+
+    if cache_dir and scenario["seed"] is not None and not resume and not record:
+        params = {key: scenario[key] for key in ("surface_points", "sensors", "frames", "total_time", "seed",
+                                                 "physics", "surface_motion")}
+        params["focus"] = focus
+        if shards > 1:
+            params["shards"] = shards  # cada shard tem o seu gerador aleatório: resultados diferentes
+        detections, particle_stats = ResultCache(cache_dir).get_or_compute(
+            "simulation", params, compute, label=f"{scenario['name']} foco {focus}")
+    else:
+        detections, particle_stats = compute()
+    write_json(os.path.join(output_dir, "resultados.json"), detections)
+    write_json(os.path.join(output_dir, "nrparticulas.json"), particle_stats)
+    write_json(os.path.join(output_dir, "fisica.json"), scenario["physics"])
+    return output_dir
+
+
+def _simulate(scenario, focus, output_dir, checkpoint_every, resume, record=False, shards=1):
+    """
+    Corre a simulação de um job e devolve (detecções, estatísticas de partículas).
+    """
+    context = scenario_context(scenario)
+    context.positions_file = os.path.join(output_dir, "posicoes.json")
+    if focus is not None:
+        pipeline = CalibrationPipeline(scenario["surface_points"], scenario["sensors"],
+                                       frames=scenario["frames"], total_time=scenario["total_time"])
+        sensors = pipeline.build_sensors(focus)
+    else:
+        sensors = [create_sensor(conf) for conf in scenario["sensors"]]
+    if shards > 1:
+        detections, particle_stats = run_sharded(scenario["surface_points"], sensors, frames=scenario["frames"],
+                                                 total_time=scenario["total_time"], context=context, shards=shards,
+                                                 workers=shards, surface_motion=scenario["surface_motion"])
+        return to_native(detections), particle_stats
+    checkpoint_dir = os.path.join(output_dir, "checkpoint")
+    sim = Simulation(scenario["surface_points"], sensors, frames=scenario["frames"], verbose=False,
+                     context=context, total_time=scenario["total_time"],
+                     checkpoint_dir=checkpoint_dir if checkpoint_every > 0 or resume else None,
+                     checkpoint_every=checkpoint_every,
+                     record_dir=os.path.join(output_dir, "trajectory") if record else None,
+                     surface_motion=scenario["surface_motion"])
+    if resume and os.path.exists(os.path.join(checkpoint_dir, "manifest.json")):
+        sim.resume()
+    sim.run()
+    return to_native(sim.detections), sim.particle_statistics()
+
+
+def job_calibrate(scenario, output_dir):
+    """
+    Calcula fases e atrasos para todos os pontos focais do cenário
+    (mesmo formato de 'emitter_focus_config.json' gerado por Demos.demo9).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pipeline = CalibrationPipeline(scenario["surface_points"], scenario["sensors"])
+    results = {}
+    for focus in scenario["focal_points"]:
+        fx, fy = focus_to_tuple(focus)
+        delays = pipeline.compute_delays((fx, fy))
+        results[f"{fx},{fy}"] = [{
+            "emitter_id": conf["sensor_id"],
+            "x": conf["position"][0],
+            "y": conf["position"][1],
+            "freq": conf["frequency"],
+            "phase_shift": delays[conf["sensor_id"]]["phase_shift"],
+            "initial_delay": delays[conf["sensor_id"]]["initial_delay"],
+        } for conf in scenario["sensors"]]
+    write_json(os.path.join(output_dir, "emitter_focus_config.json"), results)
+    return output_dir
+
+
+def load_physics(results_dir):
+    """
+    Constantes físicas gravadas por job_simulate em 'fisica.json' (None se o ficheiro não existir).
+    """
+    path = os.path.join(results_dir, "fisica.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def job_stats(results_dir, cache_dir=None, physics=None):
+    """
+    Analisa 'resultados.json' (e 'nrparticulas.json', se existir) de um diretório de resultados
+    e grava 'estatisticas.json' no mesmo diretório. Com cache_dir, ficheiros já analisados
+    (mesmo conteúdo) não são recalculados.
+     - physics: constantes físicas da simulação (dict "physics" de um cenário); por omissão,
+       as de 'fisica.json' no diretório, ou as de configs.py se não existir.
+    """
+    results_file = os.path.join(results_dir, "resultados.json")
+    particles_file = os.path.join(results_dir, "nrparticulas.json")
+    physics = physics if physics is not None else load_physics(results_dir)
+    contexto = StatsContext.from_physics(physics) if physics is not None else StatsContext()
+
+    def compute():
+        results = load_results(results_file)
+        if not results:
+            raise ValueError(f"Sem detecções em {results_dir}")
+        json_stats = load_statistics_from_json(particles_file)
+        sensor_positions = load_sensor_positions(particles_file)
+        analise = calcular_estatisticas(results, json_stats, contexto, sensor_positions=sensor_positions, workers=1)
+        return {k: ({str(key): v for key, v in val.items()} if isinstance(val, dict) else val)
+                for k, val in analise.items()}
+
+    if cache_dir and os.path.exists(results_file):
+        params = {
+            "resultados": file_digest(results_file),
+            "nrparticulas": file_digest(particles_file) if os.path.exists(particles_file) else None,
+            "contexto": vars(contexto),
+        }
+        analise = ResultCache(cache_dir).get_or_compute("stats", params, compute, label=results_dir)
+    else:
+        analise = compute()
+    write_json(os.path.join(results_dir, "estatisticas.json"), analise)
+    return results_dir
+
+
+def build_jobs(args):
+    """
+    Constrói a fila de jobs (função, argumentos) a partir dos argumentos da linha de comandos.
+    """
+    jobs = []
+    cache_dir = None if args.no_cache else args.cache_dir
+    if args.command == "simulate":
+        for path in args.scenarios:
+            scenario = load_scenario(path)
+            base_dir = os.path.join(args.output, scenario["name"])
+            focal_points = scenario["focal_points"] if not args.no_focus else []
+            if not focal_points:
+                jobs.append((job_simulate, (scenario, None, base_dir, args.checkpoint_every, args.resume,
+                                            cache_dir, args.record, args.shards)))
+            for focus in focal_points:
+                fx, fy = focus_to_tuple(focus)
+                jobs.append((job_simulate, (scenario, (fx, fy), os.path.join(base_dir, f"focus_{fx}_{fy}"),
+                                            args.checkpoint_every, args.resume, cache_dir, args.record,
+                                            args.shards)))
+    elif args.command == "calibrate":
+        for path in args.scenarios:
+            scenario = load_scenario(path)
+            jobs.append((job_calibrate, (scenario, os.path.join(args.output, scenario["name"]))))
+    elif args.command == "stats":
+        physics = load_scenario(args.scenario)["physics"] if args.scenario else None
+        for results_dir in args.results_dirs:
+            jobs.append((job_stats, (results_dir, cache_dir, physics)))
+    return jobs
+
+
+def job_label(job_args):
+    """
+    Identificação de um job nas mensagens de erro (o seu diretório).
+    """
+    return next((arg for arg in job_args if isinstance(arg, str)), "")
+
+
+def run_jobs(jobs, workers=1):
+    """
+    Executa a fila de jobs com o número de workers indicado (1 = no próprio processo).
+    Devolve o número de jobs que falharam.
+    """
+    failures = 0
+    if workers <= 1:
+        for func, job_args in jobs:
+            try:
+                print(f"[ok] {func(*job_args)}")
+            except Exception as e:
+                failures += 1
+                print(f"[erro] {func.__name__}({job_label(job_args)}): {e}")
+        return failures
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [(func, job_args, executor.submit(func, *job_args)) for func, job_args in jobs]
+        for func, job_args, future in futures:
+            try:
+                print(f"[ok] {future.result()}")
+            except Exception as e:
+                failures += 1
+                print(f"[erro] {func.__name__}({job_label(job_args)}): {e}")
+    return failures
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Simulação, calibração e estatísticas sem interface gráfica.")
+    parser.add_argument("--workers", type=int, default=1, help="número de jobs em paralelo")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="diretório da cache de resultados")
+    parser.add_argument("--no-cache", action="store_true", help="não lê nem grava a cache de resultados")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sim_parser = subparsers.add_parser("simulate", help="executa a simulação de colisões para cada cenário")
+    sim_parser.add_argument("scenarios", nargs="+", help="ficheiros de cenário (JSON)")
+    sim_parser.add_argument("--output", default="runs", help="diretório base dos resultados")
+    sim_parser.add_argument("--no-focus", action="store_true",
+                            help="ignora os pontos focais e usa os initial_delay dos sensores")
+    sim_parser.add_argument("--checkpoint-every", type=int, default=0,
+                            help="grava um checkpoint a cada N frames (0 = sem checkpoints)")
+    sim_parser.add_argument("--resume", action="store_true",
+                            help="retoma cada job a partir do último checkpoint, se existir")
+    sim_parser.add_argument("--record", action="store_true",
+                            help="grava a trajetória de cada job em '<job>/trajectory' (ver trajectory.py)")
+    sim_parser.add_argument("--shards", type=int, default=1,
+                            help="reparte os pulsos de cada job por N processos (ver shard.py)")
+
+    cal_parser = subparsers.add_parser("calibrate", help="calcula fases e atrasos para os pontos focais")
+    cal_parser.add_argument("scenarios", nargs="+", help="ficheiros de cenário (JSON)")
+    cal_parser.add_argument("--output", default="runs", help="diretório base dos resultados")
+
+    stats_parser = subparsers.add_parser("stats", help="calcula estatísticas de diretórios de resultados")
+    stats_parser.add_argument("results_dirs", nargs="+", help="diretórios com 'resultados.json'")
+    stats_parser.add_argument("--scenario", default=None,
+                              help="cenário JSON com a física da simulação (por omissão, 'fisica.json' de cada "
+                                   "diretório)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    jobs = build_jobs(args)
+    print(f"{len(jobs)} job(s) em fila, {args.workers} worker(s)")
+    failures = run_jobs(jobs, args.workers)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
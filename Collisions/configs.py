@@ -7,6 +7,15 @@ SIMULATION_TOTAL_TIME = 5.0  # tempo total em segundos
 PLOT_X_LIMITS = (-10, 10)
 PLOT_Y_LIMITS = (-5, 15)
 
+# Pontos da superfície (barreira)
+SURFACE_POINTS = [
+    [10, 5],
+    [1, 5],
+    [0, 13],
+    [-1, 5],
+    [-10, 5]
+]
+
 # Configurações dos sensores
 SENSOR_CONFIGS = [
     {
@@ -50,4 +59,19 @@ WRITE_INTERVAL = 60
 RESULT_SAVE_FRAMES = 0  # 0 significa não salvar os resultados de posição/colisão
 FOCAL_POINTS= [ 
     {"x": 0.0, "y": 10.0}, 
-]
\ No newline at end of file
+]
+# Checkpoints da simulação (checkpoint.py)
+CHECKPOINT_DIR = None  # None desativa os checkpoints
+CHECKPOINT_INTERVAL_FRAMES = 50
+RESUME_FROM_CHECKPOINT = False  # retoma a partir do último checkpoint em CHECKPOINT_DIR
+
+# Gravação da trajetória e replay (trajectory.py)
+RECORD_DIR = None  # None desativa a gravação das posições dos raios
+REPLAY_DIR = None  # se definido, main.py reproduz esta gravação em vez de simular
+
+# Execução repartida por processos (shard.py)
+SHARD_WORKERS = None  # None = número de CPUs
+
+# Cache de resultados (cache.py)
+CACHE_DIR = "cache"
+CACHE_MAX_MB = 512  # tamanho máximo; as entradas menos usadas são removidas (<= 0: sem limite)
@@ -0,0 +1,63 @@
+# context.py
+import json
+import random
+from configs import SPEED_OF_SOUND, LOSS_PERCENTAGE, REFLECTION_DISPERSION_DEG, WRITE_INTERVAL, RESULT_SAVE_FRAMES
+
+
+class SimulationContext:
+    def __init__(self, speed_of_sound=SPEED_OF_SOUND, loss_percentage=LOSS_PERCENTAGE,
+                 dispersion_deg=REFLECTION_DISPERSION_DEG, write_interval=WRITE_INTERVAL,
+                 result_save_frames=RESULT_SAVE_FRAMES, positions_file="posicoes.json", seed=None):
+        """
+        Estado e parâmetros físicos de uma execução (substitui as variáveis globais de ray.py):
+         - speed_of_sound, loss_percentage, dispersion_deg: parâmetros físicos dos raios.
+         - write_interval, result_save_frames, positions_file: gravação das posições/colisões.
+         - seed: semente do gerador aleatório da dispersão (None = não determinístico).
+        Cada Simulation tem o seu próprio contexto, pelo que várias execuções podem correr
+        no mesmo processo (ou em threads) sem interferirem entre si.
+        """
+        self.speed_of_sound = speed_of_sound
+        self.loss_percentage = loss_percentage
+        self.dispersion_deg = dispersion_deg
+        self.write_interval = write_interval
+        self.result_save_frames = result_save_frames
+        self.positions_file = positions_file
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        # Buffer com os dados de posição e colisão
+        self.simulation_data = []
+        # Contador do número de posições calculadas
+        self.frame_counter = 0
+
+    def record(self, data):
+        """
+        Guarda um registo de posição/colisão no buffer (apenas se a gravação estiver ativa).
+        """
+        if self.result_save_frames > 0:
+            self.simulation_data.append(data)
+
+    def count_frame(self):
+        """
+        Incrementa o contador e grava periodicamente o buffer em JSON.
+        """
+        self.frame_counter += 1
+        if self.result_save_frames > 0 and self.frame_counter % self.write_interval == 0:
+            self.write_to_json()
+
+    def write_to_json(self):
+        """
+        Writes the buffered simulation data to the positions file.
+        """
+        try:
+            with open(self.positions_file, "w") as file:
+                json.dump(self.simulation_data, file, indent=4)
+        except Exception as e:
+            print(f"Error saving simulation data: {e}")
+
+    def save_simulation_data(self):
+        """
+        Writes the remaining buffered data; call at the end of the simulation.
+        """
+        if self.result_save_frames > 0:
+            self.write_to_json()
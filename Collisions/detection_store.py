@@ -0,0 +1,220 @@
+# detection_store.py
+import json
+import numpy as np
+
+# Capacidade inicial das colunas (duplica quando fica cheia)
+STORE_INITIAL_CAPACITY = 1024
+
+
+class DetectionStore:
+    def __init__(self, capacity=STORE_INITIAL_CAPACITY):
+        """
+        Armazenamento colunar, só de acréscimo, das detecções de eco:
+         - receptor / emissor: ids dos sensores codificados como inteiros (tabela sensor_ids);
+         - coords: posição do emissor codificada como inteiro (tabela coords, valores originais);
+         - angle / time_ms: colunas float;
+         - doppler: fator Doppler (1.0 por omissão) e arrival_ms: tempo de chegada ao receptor em movimento
+           ('tempo_chegada_ms', NaN por omissão); só exportados se alguma detecção os tiver, ver has_doppler.
+        Mantém índices de grupo por (receptor, emissor) e por posição do emissor,
+        atualizados a cada acréscimo, para consultas sem percorrer todas as linhas.
+        """
+        self.size = 0
+        self.receptor = np.zeros(capacity, dtype=np.int32)
+        self.emissor = np.zeros(capacity, dtype=np.int32)
+        self.coord = np.zeros(capacity, dtype=np.int32)
+        self.angle = np.zeros(capacity, dtype=np.float64)
+        self.time_ms = np.zeros(capacity, dtype=np.float64)
+        self.doppler = np.ones(capacity, dtype=np.float64)
+        self.arrival_ms = np.full(capacity, np.nan)
+        self.has_doppler = False  # cenários com movimento (simulation.py) acrescentam 'doppler' e 'tempo_chegada_ms'
+        self.sensor_ids = []      # código -> id original
+        self.coords = []          # código -> coordenadas originais (tuple)
+        self._sensor_codes = {}
+        self._coord_codes = {}
+        self._pair_index = {}     # (código receptor, código emissor) -> lista de linhas
+        self._coord_index = {}    # código coords -> lista de linhas
+        self._group_index = {}    # (receptor, emissor, coords) -> lista de linhas (ordem de chegada)
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        Cria o armazenamento a partir de uma lista de detecções (esquema de 'resultados.json').
+        """
+        store = cls(capacity=max(len(results), STORE_INITIAL_CAPACITY))
+        for event in results:
+            store.append(event)
+        return store
+
+    def _code(self, table, codes, value):
+        code = codes.get(value)
+        if code is None:
+            code = len(table)
+            codes[value] = code
+            table.append(value)
+        return code
+
+    def _grow(self):
+        capacity = 2 * len(self.receptor)
+        for name in ("receptor", "emissor", "coord", "angle", "time_ms", "doppler", "arrival_ms"):
+            column = getattr(self, name)
+            grown = np.full(capacity, np.nan) if name == "arrival_ms" else np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def append(self, event):
+        """
+        Acrescenta uma detecção (dict com sensor_receptor, sensor_emissor, emissor_coords, angulo, tempo_ms
+        e, opcionalmente, doppler e tempo_chegada_ms).
+        """
+        if self.size == len(self.receptor):
+            self._grow()
+        row = self.size
+        r = self._code(self.sensor_ids, self._sensor_codes, event["sensor_receptor"])
+        e = self._code(self.sensor_ids, self._sensor_codes, event["sensor_emissor"])
+        c = self._code(self.coords, self._coord_codes, tuple(event["emissor_coords"]))
+        self.receptor[row] = r
+        self.emissor[row] = e
+        self.coord[row] = c
+        self.angle[row] = event["angulo"]
+        self.time_ms[row] = event["tempo_ms"]
+        self.doppler[row] = event.get("doppler", 1.0)
+        self.arrival_ms[row] = event.get("tempo_chegada_ms", np.nan)
+        self.has_doppler = self.has_doppler or "doppler" in event
+        self._pair_index.setdefault((r, e), []).append(row)
+        self._coord_index.setdefault(c, []).append(row)
+        self._group_index.setdefault((r, e, c), []).append(row)
+        self.size += 1
+
+    def extend(self, results):
+        for event in results:
+            self.append(event)
+
+    def query(self, receptor=None, emissor=None, coords=None, time_range=None, angle_range=None):
+        """
+        Devolve os índices das linhas que satisfazem os filtros. Os filtros por sensores/coords usam
+        os índices de grupo; os intervalos de tempo/ângulo são aplicados de forma vetorizada.
+        """
+        rows = None
+        if receptor is not None or emissor is not None:
+            r = self._sensor_codes.get(receptor) if receptor is not None else None
+            e = self._sensor_codes.get(emissor) if emissor is not None else None
+            if (receptor is not None and r is None) or (emissor is not None and e is None):
+                return np.zeros(0, dtype=np.intp)
+            rows = np.concatenate([np.asarray(idx, dtype=np.intp) for (pr, pe), idx in self._pair_index.items()
+                                   if (r is None or pr == r) and (e is None or pe == e)] or
+                                  [np.zeros(0, dtype=np.intp)])
+        if coords is not None:
+            c = self._coord_codes.get(tuple(coords))
+            coord_rows = np.asarray(self._coord_index.get(c, []), dtype=np.intp)
+            rows = coord_rows if rows is None else np.intersect1d(rows, coord_rows)
+        if rows is None:
+            rows = np.arange(self.size)
+        rows = np.sort(rows)
+        mask = np.ones(len(rows), dtype=bool)
+        if time_range is not None:
+            mask &= (self.time_ms[rows] >= time_range[0]) & (self.time_ms[rows] <= time_range[1])
+        if angle_range is not None:
+            mask &= (self.angle[rows] >= angle_range[0]) & (self.angle[rows] <= angle_range[1])
+        return rows[mask]
+
+    def times(self, **filters):
+        """
+        Tempos (ms) das linhas que satisfazem os filtros de query.
+        """
+        return self.time_ms[self.query(**filters)]
+
+    def group_times(self):
+        """
+        Tempos agrupados por (receptor, emissor, coords) com os ids e coordenadas originais,
+        pela ordem de primeira ocorrência.
+        """
+        return {(self.sensor_ids[r], self.sensor_ids[e], self.coords[c]): self.time_ms[np.asarray(rows)]
+                for (r, e, c), rows in self._group_index.items()}
+
+    def to_records(self, start=0, stop=None):
+        """
+        Converte de volta para a lista de dicts de 'resultados.json' (linhas [start, stop)).
+        """
+        stop = self.size if stop is None else stop
+        records = [{
+            "sensor_receptor": self.sensor_ids[self.receptor[i]],
+            "sensor_emissor": self.sensor_ids[self.emissor[i]],
+            "emissor_coords": list(self.coords[self.coord[i]]),
+            "angulo": float(self.angle[i]),
+            "tempo_ms": float(self.time_ms[i]),
+        } for i in range(start, stop)]
+        if self.has_doppler:
+            for record, doppler, arrival in zip(records, self.doppler[start:stop], self.arrival_ms[start:stop]):
+                record["doppler"] = float(doppler)
+                if not np.isnan(arrival):
+                    record["tempo_chegada_ms"] = float(arrival)
+        return records
+
+    def columns(self, start=0, stop=None):
+        """
+        Cópia das colunas das linhas [start, stop) e das tabelas de códigos (em JSON), prontas a gravar.
+        """
+        stop = self.size if stop is None else stop
+        tables = json.dumps({"sensor_ids": self.sensor_ids, "coords": [list(c) for c in self.coords],
+                             "has_doppler": self.has_doppler},
+                            default=lambda x: x.item() if hasattr(x, 'item') else x)
+        return {
+            "receptor": self.receptor[start:stop].copy(),
+            "emissor": self.emissor[start:stop].copy(),
+            "coord": self.coord[start:stop].copy(),
+            "angle": self.angle[start:stop].copy(),
+            "time_ms": self.time_ms[start:stop].copy(),
+            "doppler": self.doppler[start:stop].copy(),
+            "arrival_ms": self.arrival_ms[start:stop].copy(),
+            "tables": np.array(tables),
+        }
+
+    def save(self, filename="resultados.npz", start=0, stop=None):
+        """
+        Grava as colunas num ficheiro binário compacto (.npz comprimido); as tabelas de códigos vão em JSON.
+        start/stop permitem gravar apenas um intervalo de linhas (checkpoints incrementais).
+        """
+        np.savez_compressed(filename, **self.columns(start, stop))
+
+    @classmethod
+    def load(cls, filename="resultados.npz"):
+        """
+        Carrega um ficheiro gravado por save e reconstrói os índices de grupo.
+        """
+        data = np.load(filename)
+        tables = json.loads(str(data["tables"]))
+        n = len(data["receptor"])
+        store = cls(capacity=max(n, STORE_INITIAL_CAPACITY))
+        store.sensor_ids = tables["sensor_ids"]
+        store.coords = [tuple(c) for c in tables["coords"]]
+        store._sensor_codes = {v: i for i, v in enumerate(store.sensor_ids)}
+        store._coord_codes = {v: i for i, v in enumerate(store.coords)}
+        store.receptor[:n] = data["receptor"]
+        store.emissor[:n] = data["emissor"]
+        store.coord[:n] = data["coord"]
+        store.angle[:n] = data["angle"]
+        store.time_ms[:n] = data["time_ms"]
+        if "doppler" in data.files:
+            store.doppler[:n] = data["doppler"]
+        if "arrival_ms" in data.files:
+            store.arrival_ms[:n] = data["arrival_ms"]
+        store.has_doppler = tables.get("has_doppler", False)
+        store.size = n
+        for row in range(n):
+            r, e, c = int(store.receptor[row]), int(store.emissor[row]), int(store.coord[row])
+            store._pair_index.setdefault((r, e), []).append(row)
+            store._coord_index.setdefault(c, []).append(row)
+            store._group_index.setdefault((r, e, c), []).append(row)
+        return store
+
+
+def as_detection_store(results):
+    """
+    Aceita uma lista de detecções (esquema de 'resultados.json') ou um DetectionStore.
+    """
+    if isinstance(results, DetectionStore):
+        return results
+    return DetectionStore.from_results(results)
@@ -0,0 +1,222 @@
+# fdtd.py
+import numpy as np
+from surface import Surface
+from configs import SPEED_OF_SOUND
+
+# Parâmetros do solver FDTD
+FDTD_CELL_SIZE = 0.1        # tamanho da célula da grelha (m)
+FDTD_CFL = 0.9              # fração do passo máximo estável (CFL 2D: c*dt/dx <= 1/sqrt(2))
+FDTD_SPONGE_CELLS = 20      # espessura da camada absorvente nas bordas (células)
+FDTD_SPONGE_STRENGTH = 3.0  # amortecimento máximo na camada absorvente (por passo, escala relativa)
+
+
+class FDTDSolver:
+    def __init__(self, x_limits, y_limits, dx=FDTD_CELL_SIZE, c=SPEED_OF_SOUND, cfl=FDTD_CFL,
+                 sponge_cells=FDTD_SPONGE_CELLS, sponge_strength=FDTD_SPONGE_STRENGTH):
+        """
+        Solver acústico 2D no domínio do tempo (diferenças finitas, grelha desfasada p/v).
+         - x_limits, y_limits: extensão do domínio (m).
+         - dx: tamanho da célula (m).
+         - c: velocidade de propagação (m/s).
+         - cfl: fração do passo de tempo máximo estável.
+         - sponge_cells / sponge_strength: camada absorvente nas bordas do domínio.
+
+        Equações (unidades normalizadas, ρ = 1, v escalado por c):
+          v ← v - (c·dt/dx) · ∇p
+          p ← p - (c·dt/dx) · ∇·v
+        Todos os buffers são pré-alocados; cada passo atualiza os campos no próprio lugar.
+        """
+        self.x_min, self.x_max = x_limits
+        self.y_min, self.y_max = y_limits
+        self.dx = dx
+        self.c = c
+        self.dt = cfl * dx / (c * np.sqrt(2))
+        self.k = c * self.dt / dx
+        self.nx = int(np.ceil((self.x_max - self.x_min) / dx)) + 1
+        self.ny = int(np.ceil((self.y_max - self.y_min) / dx)) + 1
+        self.t = 0.0
+        self.step_count = 0
+
+        # Campos: p nas células, vx/vy nas faces (as faces exteriores ficam a zero)
+        self.p = np.zeros((self.ny, self.nx))
+        self.vx = np.zeros((self.ny, self.nx + 1))
+        self.vy = np.zeros((self.ny + 1, self.nx))
+
+        # Buffers temporários reutilizados em todos os passos
+        self._grad_x = np.zeros((self.ny, self.nx - 1))
+        self._grad_y = np.zeros((self.ny - 1, self.nx))
+        self._div = np.zeros((self.ny, self.nx))
+        self._div_y = np.zeros((self.ny, self.nx))
+
+        # Máscaras das faces abertas (1) / rígidas (0)
+        self.solid = np.zeros((self.ny, self.nx), dtype=bool)
+        self._open_x = np.ones((self.ny, self.nx - 1))
+        self._open_y = np.ones((self.ny - 1, self.nx))
+
+        self._build_sponge(sponge_cells, sponge_strength)
+
+        # Fontes e recetores (definidos por add_emitter/add_source e add_receiver)
+        self._src_idx = np.zeros(0, dtype=np.intp)
+        self._src_freq = np.zeros(0)
+        self._src_delay = np.zeros(0)
+        self._src_phase = np.zeros(0)
+        self._src_amp = np.zeros(0)
+        self._src_buf = np.zeros(0)
+        self._src_on = np.zeros(0, dtype=bool)
+        self.receiver_ids = []
+        self._rec_idx = np.zeros(0, dtype=np.intp)
+
+    def _build_sponge(self, n_cells, strength):
+        """
+        Pré-calcula os fatores de amortecimento (perfil quadrático) da camada absorvente.
+        """
+        def profile(n, n_layer):
+            idx = np.arange(n, dtype=float)
+            dist = np.minimum(idx, n - 1 - idx)
+            depth = np.clip((n_layer - dist) / max(n_layer, 1), 0, 1)
+            return strength * self.k * depth ** 2
+
+        sx_cells = profile(self.nx, n_cells)
+        sy_cells = profile(self.ny, n_cells)
+        sx_faces = profile(self.nx + 1, n_cells)
+        sy_faces = profile(self.ny + 1, n_cells)
+        self._damp_p = np.exp(-(sy_cells[:, None] + sx_cells[None, :]))
+        self._damp_vx = np.exp(-(sy_cells[:, None] + sx_faces[None, :]))[:, 1:-1]
+        self._damp_vy = np.exp(-(sy_faces[:, None] + sx_cells[None, :]))[1:-1, :]
+
+    def cell_index(self, point):
+        """
+        Devolve o índice (iy, ix) da célula que contém o ponto [x, y].
+        """
+        ix = int(round((point[0] - self.x_min) / self.dx))
+        iy = int(round((point[1] - self.y_min) / self.dx))
+        return min(max(iy, 0), self.ny - 1), min(max(ix, 0), self.nx - 1)
+
+    def add_surface(self, surface):
+        """
+        Rasteriza uma Surface (ou lista de pontos) como fronteira rígida: as células atravessadas
+        pelos segmentos ficam sólidas e as faces à sua volta fechadas (velocidade normal nula).
+        """
+        if not isinstance(surface, Surface):
+            surface = Surface(surface)
+        for A, B in surface.segments:
+            n_samples = int(np.ceil(np.linalg.norm(B - A) / (0.5 * self.dx))) + 1
+            s = np.linspace(0.0, 1.0, n_samples)
+            pts = A[None, :] + s[:, None] * (B - A)[None, :]
+            ix = np.rint((pts[:, 0] - self.x_min) / self.dx).astype(int)
+            iy = np.rint((pts[:, 1] - self.y_min) / self.dx).astype(int)
+            inside = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+            self.solid[iy[inside], ix[inside]] = True
+
+        fluid = ~self.solid
+        self._open_x = (fluid[:, 1:] & fluid[:, :-1]).astype(float)
+        self._open_y = (fluid[1:, :] & fluid[:-1, :]).astype(float)
+        self.p[self.solid] = 0.0
+
+    def add_source(self, x, y, frequency, delay=0.0, phase=0.0, amplitude=1.0):
+        """
+        Adiciona uma fonte pontual suave: s(t) = A·sin(2π f (t - delay) + phase), para t >= delay.
+        """
+        iy, ix = self.cell_index((x, y))
+        self._src_idx = np.append(self._src_idx, iy * self.nx + ix)
+        self._src_freq = np.append(self._src_freq, frequency)
+        self._src_delay = np.append(self._src_delay, delay)
+        self._src_phase = np.append(self._src_phase, phase)
+        self._src_amp = np.append(self._src_amp, amplitude)
+        self._src_buf = np.zeros(len(self._src_idx))
+        self._src_on = np.zeros(len(self._src_idx), dtype=bool)
+
+    def add_emitter(self, emitter, amplitude=1.0):
+        """
+        Adiciona um Emitter (Calibrate) como fonte: usa a posição r, a frequência f
+        e o atraso t0 calculado por SetPhase/CalculatePhaseFromFocus.
+        """
+        self.add_source(emitter.r[0], emitter.r[1], emitter.f, delay=emitter.t0, amplitude=amplitude)
+
+    def add_receiver(self, sensor):
+        """
+        Regista a pressão na posição de um Sensor a cada passo.
+        """
+        iy, ix = self.cell_index(sensor.position)
+        self.receiver_ids.append(sensor.sensor_id)
+        self._rec_idx = np.append(self._rec_idx, iy * self.nx + ix)
+
+    def step(self):
+        """
+        Avança um passo de tempo dt, sem alocações: gradiente → velocidades → divergência → pressão.
+        """
+        k = self.k
+        p, vx, vy = self.p, self.vx, self.vy
+        vx_in = vx[:, 1:-1]
+        vy_in = vy[1:-1, :]
+
+        # v ← (v - k·∇p) nas faces interiores, com faces rígidas fechadas e camada absorvente
+        np.subtract(p[:, 1:], p[:, :-1], out=self._grad_x)
+        self._grad_x *= k
+        vx_in -= self._grad_x
+        vx_in *= self._open_x
+        vx_in *= self._damp_vx
+
+        np.subtract(p[1:, :], p[:-1, :], out=self._grad_y)
+        self._grad_y *= k
+        vy_in -= self._grad_y
+        vy_in *= self._open_y
+        vy_in *= self._damp_vy
+
+        # p ← p - k·∇·v
+        np.subtract(vx[:, 1:], vx[:, :-1], out=self._div)
+        np.subtract(vy[1:, :], vy[:-1, :], out=self._div_y)
+        self._div += self._div_y
+        self._div *= k
+        p -= self._div
+        p *= self._damp_p
+
+        self.t += self.dt
+        self.step_count += 1
+
+        # Fontes suaves (apenas as que já começaram a emitir)
+        if len(self._src_idx):
+            buf = self._src_buf
+            np.greater_equal(self.t, self._src_delay, out=self._src_on)
+            np.subtract(self.t, self._src_delay, out=buf)
+            buf *= self._src_freq
+            buf *= 2 * np.pi
+            buf += self._src_phase
+            np.sin(buf, out=buf)
+            buf *= self._src_amp
+            buf *= self._src_on
+            np.add.at(p.reshape(-1), self._src_idx, buf)
+
+    def run(self, total_time, snapshot_every=0):
+        """
+        Executa a simulação durante total_time segundos.
+        Devolve um dict com os tempos, a pressão registada em cada recetor (n_passos × n_recetores)
+        e, opcionalmente, instantâneos do campo a cada snapshot_every passos.
+        """
+        n_steps = int(np.ceil(total_time / self.dt))
+        times = self.t + self.dt * np.arange(1, n_steps + 1)
+        recordings = np.zeros((n_steps, len(self._rec_idx)))
+        snapshots = []
+        p_flat = self.p.reshape(-1)
+        try:
+            for n in range(n_steps):
+                self.step()
+                if len(self._rec_idx):
+                    np.take(p_flat, self._rec_idx, out=recordings[n])
+                if snapshot_every > 0 and n % snapshot_every == 0:
+                    snapshots.append(self.p.copy())
+        except Exception as e:
+            print(f"Error during FDTD step {self.step_count}: {e}")
+        return {
+            "times": times,
+            "receiver_ids": list(self.receiver_ids),
+            "pressure": recordings,
+            "snapshots": snapshots,
+        }
+
+    def extent(self):
+        """
+        Extensão [x_min, x_max, y_min, y_max] da grelha, para uso com imshow.
+        """
+        return [self.x_min - self.dx / 2, self.x_min + (self.nx - 0.5) * self.dx,
+                self.y_min - self.dx / 2, self.y_min + (self.ny - 0.5) * self.dx]
@@ -0,0 +1,238 @@
+# impulse_response.py
+"""
+Respostas impulsionais de eco por par (emissor, receptor).
+
+Em vez de reduzir os tempos de chegada a médias aparadas (stats.py), os tempos são acumulados num
+histograma de resolução fixa por par, pesado pela atenuação de cada eco. A acumulação é vetorizada
+(um único np.bincount sobre o índice (emissor, receptor, bin)) e pode juntar vários pulsos, execuções
+e sementes. Os picos são escolhidos depois de um filtro adaptado (correlação com o pulso emitido),
+o que dá estimativas de distância robustas mesmo com muitas chegadas dispersas.
+
+Uso:
+  python impulse_response.py runs/cenario1/resultados.json runs/cenario2/resultados.npz --output ir.npz
+"""
+import json
+import argparse
+import numpy as np
+from detection_store import DetectionStore
+from configs import SPEED_OF_SOUND, LOSS_PERCENTAGE
+
+IR_BIN_MS = 0.5          # resolução temporal do histograma
+IR_MAX_MS = 2000.0       # chegadas posteriores são descartadas
+IR_PULSE_MS = 5.0        # largura do pulso (janela de Hann) usado no filtro adaptado
+IR_PEAK_THRESHOLD = 0.2  # fração do máximo de cada par abaixo da qual os picos são ignorados
+
+
+def echo_attenuation(time_ms, speed_of_sound=SPEED_OF_SOUND, loss_percentage=LOSS_PERCENTAGE):
+    """
+    Amplitude relativa de cada eco: perda na reflexão e espalhamento cilíndrico (2D) no percurso total.
+    """
+    path = speed_of_sound * np.asarray(time_ms, dtype=float) / 1000
+    return (1 - loss_percentage) / np.sqrt(np.maximum(path, 1.0))
+
+
+def pulse_template(pulse_ms=IR_PULSE_MS, bin_ms=IR_BIN_MS):
+    """
+    Pulso emitido amostrado na resolução do histograma (janela de Hann normalizada).
+    """
+    n = max(int(round(pulse_ms / bin_ms)), 1) | 1  # comprimento ímpar para ficar centrado
+    template = np.hanning(n + 2)[1:-1]
+    return template / np.linalg.norm(template)
+
+
+class ImpulseResponse:
+    def __init__(self, sensor_ids=(), bin_ms=IR_BIN_MS, max_ms=IR_MAX_MS):
+        """
+        Histograma de chegadas por par:
+         - histogram[e, r, k]: soma das amplitudes dos ecos emitidos por sensor_ids[e] e recebidos
+           por sensor_ids[r] com tempo no bin k ([k * bin_ms, (k + 1) * bin_ms));
+         - counts[e, r, k]: número de chegadas no mesmo bin.
+        Os sensores podem ser indicados à partida ou acrescentados ao acumular.
+        """
+        self.bin_ms = float(bin_ms)
+        self.n_bins = int(np.ceil(max_ms / bin_ms))
+        self.sensor_ids = []
+        self._codes = {}
+        self.histogram = np.zeros((0, 0, self.n_bins))
+        self.counts = np.zeros((0, 0, self.n_bins), dtype=np.int64)
+        self.discarded = 0
+        self._indices(sensor_ids)
+
+    @property
+    def max_ms(self):
+        return self.n_bins * self.bin_ms
+
+    def bin_centers(self):
+        return (np.arange(self.n_bins) + 0.5) * self.bin_ms
+
+    def _indices(self, ids):
+        """
+        Índices dos sensores no histograma; sensores novos alargam as duas primeiras dimensões.
+        """
+        for sensor_id in ids:
+            if sensor_id not in self._codes:
+                self._codes[sensor_id] = len(self.sensor_ids)
+                self.sensor_ids.append(sensor_id)
+        n = len(self.sensor_ids)
+        if n > self.histogram.shape[0]:
+            old = self.histogram.shape[0]
+            for name in ("histogram", "counts"):
+                grown = np.zeros((n, n, self.n_bins), dtype=getattr(self, name).dtype)
+                grown[:old, :old] = getattr(self, name)
+                setattr(self, name, grown)
+        return np.array([self._codes[sensor_id] for sensor_id in ids], dtype=np.int64)
+
+    def accumulate(self, results, weights=None, speed_of_sound=SPEED_OF_SOUND, loss_percentage=LOSS_PERCENTAGE):
+        """
+        Acrescenta as detecções de uma execução (lista de 'resultados.json' ou DetectionStore).
+        weights: amplitude de cada detecção; por omissão, echo_attenuation do tempo de chegada.
+        """
+        store = results if isinstance(results, DetectionStore) else DetectionStore.from_results(results)
+        n = len(store)
+        if n == 0:
+            return self
+        # Códigos do armazenamento -> índices do histograma
+        mapping = self._indices(store.sensor_ids)
+        emitter = mapping[store.emissor[:n]]
+        receiver = mapping[store.receptor[:n]]
+        time_ms = store.time_ms[:n]
+        if weights is None:
+            weights = echo_attenuation(time_ms, speed_of_sound, loss_percentage)
+        weights = np.broadcast_to(np.asarray(weights, dtype=float), (n,))
+        bins = np.floor(time_ms / self.bin_ms).astype(np.int64)
+        valid = (bins >= 0) & (bins < self.n_bins)
+        self.discarded += int(n - valid.sum())
+        n_sensors = len(self.sensor_ids)
+        flat = (emitter[valid] * n_sensors + receiver[valid]) * self.n_bins + bins[valid]
+        size = n_sensors * n_sensors * self.n_bins
+        self.histogram += np.bincount(flat, weights=weights[valid], minlength=size).reshape(self.histogram.shape)
+        self.counts += np.bincount(flat, minlength=size).reshape(self.counts.shape)
+        return self
+
+    def merge(self, other):
+        """
+        Junta outro histograma com a mesma resolução (outras sementes ou execuções paralelas).
+        """
+        if other.bin_ms != self.bin_ms or other.n_bins != self.n_bins:
+            raise ValueError("Histogramas com resoluções diferentes")
+        index = self._indices(other.sensor_ids)
+        self.histogram[np.ix_(index, index)] += other.histogram
+        self.counts[np.ix_(index, index)] += other.counts
+        self.discarded += other.discarded
+        return self
+
+    def pair(self, emitter, receiver):
+        """
+        Resposta impulsional (amplitudes por bin) do par (id do emissor, id do receptor).
+        """
+        if emitter not in self._codes or receiver not in self._codes:
+            return np.zeros(self.n_bins)
+        return self.histogram[self._codes[emitter], self._codes[receiver]]
+
+    def matched_filter(self, pulse_ms=IR_PULSE_MS, template=None):
+        """
+        Correlação de todas as respostas com o pulso emitido (por FFT, ao longo do eixo do tempo).
+        Devolve um array com a forma de histogram, alinhado com os mesmos bins.
+        """
+        if template is None:
+            template = pulse_template(pulse_ms, self.bin_ms)
+        template = np.asarray(template, dtype=float)
+        size = self.n_bins + len(template) - 1
+        spectrum = np.fft.rfft(self.histogram, size, axis=-1) * np.conj(np.fft.rfft(template, size))[None, None, :]
+        correlation = np.fft.irfft(spectrum, size, axis=-1)
+        # Correlação circular: os atrasos negativos ficam no fim do array
+        half = len(template) // 2
+        return np.concatenate([correlation[..., size - half:], correlation[..., :self.n_bins - half]], axis=-1)
+
+    def peaks(self, pulse_ms=IR_PULSE_MS, threshold=IR_PEAK_THRESHOLD, max_peaks=3, template=None):
+        """
+        Picos da resposta filtrada de cada par com chegadas:
+        {(emissor, receptor): [(tempo_ms, amplitude), ...]} por amplitude decrescente.
+        Os picos são máximos locais numa janela da largura do pulso, acima de threshold × máximo do par;
+        o tempo é refinado por interpolação parabólica entre bins vizinhos.
+        """
+        filtered = self.matched_filter(pulse_ms, template)
+        width = len(pulse_template(pulse_ms, self.bin_ms)) if template is None else len(template)
+        half = width // 2
+        padded = np.pad(filtered, ((0, 0), (0, 0), (half, half)), constant_values=-np.inf)
+        local_max = np.lib.stride_tricks.sliding_window_view(padded, width, axis=-1).max(axis=-1)
+        strongest = filtered.max(axis=-1, keepdims=True)
+        is_peak = (filtered == local_max) & (filtered > threshold * strongest) & (strongest > 0)
+        result = {}
+        for e, r, k in zip(*np.nonzero(is_peak)):
+            left = filtered[e, r, k - 1] if k > 0 else filtered[e, r, k]
+            right = filtered[e, r, k + 1] if k < self.n_bins - 1 else filtered[e, r, k]
+            denominator = left - 2 * filtered[e, r, k] + right
+            shift = 0.5 * (left - right) / denominator if denominator != 0 else 0.0
+            time_ms = (k + 0.5 + shift) * self.bin_ms
+            result.setdefault((self.sensor_ids[e], self.sensor_ids[r]), []).append(
+                (float(time_ms), float(filtered[e, r, k])))
+        for key in result:
+            result[key] = sorted(result[key], key=lambda peak: -peak[1])[:max_peaks]
+        return result
+
+    def range_estimates(self, speed_of_sound=SPEED_OF_SOUND, loss_percentage=LOSS_PERCENTAGE, **peak_options):
+        """
+        Distância estimada por par a partir do pico mais forte. A volta, depois da reflexão, é mais lenta
+        (velocidade c·(1 - perda), como em ray.py): d = t / (1/c + 1/(c·(1 - perda))).
+        """
+        seconds_per_meter = 1 / speed_of_sound + 1 / (speed_of_sound * (1 - loss_percentage))
+        return {key: {"tempo_ms": peaks[0][0], "distancia_m": peaks[0][0] / 1000 / seconds_per_meter,
+                      "amplitude": peaks[0][1], "chegadas": int(self.counts[self._codes[key[0]],
+                                                                            self._codes[key[1]]].sum())}
+                for key, peaks in self.peaks(**peak_options).items()}
+
+    def to_arrays(self):
+        """
+        Arrays para exportação (histograma, contagens, bins e ids dos sensores em JSON).
+        """
+        return {
+            "histogram": self.histogram,
+            "counts": self.counts,
+            "bin_centers_ms": self.bin_centers(),
+            "bin_ms": np.array(self.bin_ms),
+            "discarded": np.array(self.discarded),
+            "sensor_ids": np.array(json.dumps(self.sensor_ids, default=lambda x: x.item() if hasattr(x, 'item') else x)),
+        }
+
+    def save(self, filename="resposta_impulsional.npz"):
+        np.savez_compressed(filename, **self.to_arrays())
+
+    @classmethod
+    def load(cls, filename="resposta_impulsional.npz"):
+        with np.load(filename) as data:
+            bin_ms = float(data["bin_ms"])
+            response = cls(json.loads(str(data["sensor_ids"])), bin_ms, data["histogram"].shape[-1] * bin_ms)
+            response.histogram[...] = data["histogram"]
+            response.counts[...] = data["counts"]
+            response.discarded = int(data["discarded"])
+        return response
+
+
+def main(argv=None):
+    from stats import load_results
+    parser = argparse.ArgumentParser(description="Respostas impulsionais de eco por par de sensores.")
+    parser.add_argument("results", nargs="+", help="ficheiros de resultados (.json ou .npz) a acumular")
+    parser.add_argument("--bin-ms", type=float, default=IR_BIN_MS)
+    parser.add_argument("--max-ms", type=float, default=IR_MAX_MS)
+    parser.add_argument("--pulse-ms", type=float, default=IR_PULSE_MS)
+    parser.add_argument("--output", default=None, help="grava os histogramas neste ficheiro .npz")
+    args = parser.parse_args(argv)
+
+    response = ImpulseResponse(bin_ms=args.bin_ms, max_ms=args.max_ms)
+    for filename in args.results:
+        results = load_results(filename)
+        if len(results) == 0:
+            continue
+        response.accumulate(results)
+    if response.discarded:
+        print(f"{response.discarded} chegada(s) fora do intervalo [0, {response.max_ms:.0f}) ms")
+    for (emitter, receiver), estimate in sorted(response.range_estimates(pulse_ms=args.pulse_ms).items()):
+        print(f"Emissor {emitter} -> receptor {receiver}: {estimate['tempo_ms']:.2f} ms, "
+              f"{estimate['distancia_m']:.3f} m ({estimate['chegadas']} chegadas)")
+    if args.output:
+        response.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# inverse.py
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from configs import SENSOR_CONFIGS, SPEED_OF_SOUND, LOSS_PERCENTAGE, PLOT_X_LIMITS
+from detection_store import as_detection_store
+
+# Parâmetros da reconstrução inversa
+INVERSE_VERTICES = 7            # número de vértices livres da polilinha
+INVERSE_STARTS = 8              # número de pontos de partida do ajuste
+INVERSE_HEIGHT_RANGE = (1, 15)  # intervalo das alturas iniciais aleatórias (m)
+INVERSE_SMOOTHING = 0.05        # peso da regularização (segunda diferença das alturas)
+INVERSE_SPECULAR_WEIGHT = 0.5   # peso (ms/grau) do desvio entre a reflexão ideal e o recetor
+INVERSE_MISS_PENALTY_MS = 1000  # resíduo quando o raio não atinge a superfície modelada
+
+
+def detections_to_arrays(results, sensor_positions=None):
+    """
+    Converte as detecções (lista no esquema de 'resultados.json' ou DetectionStore) em arrays:
+    origens dos emissores, ângulos, posições dos recetores e tempos observados (ms).
+    As colunas do DetectionStore são lidas diretamente, com as tabelas sensor_ids/coords.
+     - sensor_positions: {sensor_id: [x, y]}; por omissão, as posições de SENSOR_CONFIGS.
+    """
+    if sensor_positions is None:
+        sensor_positions = {conf['sensor_id']: conf['position'] for conf in SENSOR_CONFIGS}
+    store = as_detection_store(results)
+    n = len(store)
+    coords = np.array(store.coords, dtype=float).reshape(-1, 2)
+    receptor = store.receptor[:n]
+    positions = np.zeros((len(store.sensor_ids), 2))
+    for code in np.unique(receptor):
+        positions[code] = sensor_positions[store.sensor_ids[code]]
+    origins = coords[store.coord[:n]]
+    angles = np.deg2rad(store.angle[:n])
+    receivers = positions[receptor]
+    times = store.time_ms[:n].copy()
+    return origins, angles, receivers, times
+
+
+def forward_model(vertices, origins, angles, receivers, speed_of_sound=SPEED_OF_SOUND,
+                  loss_percentage=LOSS_PERCENTAGE):
+    """
+    Modelo direto vetorizado (mesma física de Ray.propagate, sem dispersão) para todas as
+    detecções e todos os segmentos em simultâneo:
+      - tempo = d · (1/c + 1/(c·(1 - perda))) · 1000, d = distância até à colisão;
+      - desvio (graus) entre a reflexão ideal e a direção colisão → recetor.
+    Devolve (tempos previstos em ms, desvios em graus, máscara de colisão).
+    """
+    directions = np.column_stack([np.cos(angles), np.sin(angles)])
+    A = vertices[:-1]
+    seg = vertices[1:] - A                                       # (S, 2)
+    denom = directions[:, None, 0] * seg[None, :, 1] - directions[:, None, 1] * seg[None, :, 0]
+    diff = A[None, :, :] - origins[:, None, :]                   # (M, S, 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (diff[..., 0] * seg[None, :, 1] - diff[..., 1] * seg[None, :, 0]) / denom
+        u = (diff[..., 0] * directions[:, None, 1] - diff[..., 1] * directions[:, None, 0]) / denom
+    valid = (np.abs(denom) >= 1e-6) & (t >= 0) & (u >= 0) & (u <= 1)
+    t = np.where(valid, t, np.inf)
+    hit_seg = np.argmin(t, axis=1)
+    dist = t[np.arange(len(t)), hit_seg]
+    hit = np.isfinite(dist)
+    dist = np.where(hit, dist, 0.0)
+
+    times = dist * (1 / speed_of_sound + 1 / (speed_of_sound * (1 - loss_percentage))) * 1000
+
+    # Reflexão ideal e desvio em relação ao recetor
+    s = seg[hit_seg]
+    normal = np.column_stack([s[:, 1], -s[:, 0]]) / np.linalg.norm(s, axis=1, keepdims=True)
+    refl = directions - 2 * np.sum(directions * normal, axis=1, keepdims=True) * normal
+    points = origins + dist[:, None] * directions
+    to_receiver = receivers - points
+    to_receiver /= np.maximum(np.linalg.norm(to_receiver, axis=1, keepdims=True), 1e-12)
+    deviation = np.degrees(np.arccos(np.clip(np.sum(refl * to_receiver, axis=1), -1, 1)))
+    return times, deviation, hit
+
+
+class SurfaceModel:
+    def __init__(self, x_vertices, origins, angles, receivers, times, speed_of_sound=SPEED_OF_SOUND,
+                 loss_percentage=LOSS_PERCENTAGE, smoothing=INVERSE_SMOOTHING,
+                 specular_weight=INVERSE_SPECULAR_WEIGHT):
+        """
+        Problema de mínimos quadrados: alturas y dos vértices (x fixos) que explicam os tempos de eco.
+        """
+        self.x_vertices = np.asarray(x_vertices, dtype=float)
+        self.origins = origins
+        self.angles = angles
+        self.receivers = receivers
+        self.times = times
+        self.speed_of_sound = speed_of_sound
+        self.loss_percentage = loss_percentage
+        self.smoothing = smoothing
+        self.specular_weight = specular_weight
+
+    def vertices(self, heights):
+        return np.column_stack([self.x_vertices, heights])
+
+    def residuals(self, heights):
+        predicted, deviation, hit = forward_model(self.vertices(heights), self.origins, self.angles,
+                                                  self.receivers, self.speed_of_sound, self.loss_percentage)
+        time_res = np.where(hit, predicted - self.times, INVERSE_MISS_PENALTY_MS)
+        spec_res = np.where(hit, self.specular_weight * deviation, 0.0)
+        smooth_res = self.smoothing * np.diff(heights, 2) * 1000 / max(len(self.times), 1) ** 0.5
+        return np.concatenate([time_res, spec_res, smooth_res])
+
+
+def levenberg_marquardt(fun, x0, max_iter=100, tol=1e-8, step=1e-4):
+    """
+    Levenberg–Marquardt com Jacobiano por diferenças finitas. Devolve (x, custo, iterações).
+    """
+    x = np.array(x0, dtype=float)
+    r = fun(x)
+    cost = r @ r
+    lam = 1e-2
+    for it in range(max_iter):
+        J = np.empty((len(r), len(x)))
+        for j in range(len(x)):
+            dx = np.zeros_like(x)
+            dx[j] = step
+            J[:, j] = (fun(x + dx) - r) / step
+        JtJ = J.T @ J
+        g = J.T @ r
+        improved = False
+        while lam < 1e10:
+            delta = np.linalg.solve(JtJ + lam * (np.diag(np.diag(JtJ)) + 1e-9 * np.eye(len(x))), -g)
+            r_new = fun(x + delta)
+            cost_new = r_new @ r_new
+            if cost_new < cost:
+                improved = cost - cost_new > tol * max(cost, 1e-12)
+                x, r, cost = x + delta, r_new, cost_new
+                lam = max(lam / 3, 1e-12)
+                break
+            lam *= 3
+        if not improved:
+            break
+    return x, cost, it + 1
+
+
+def _fit_from_start(args):
+    model, start = args
+    heights, cost, iterations = levenberg_marquardt(model.residuals, start)
+    return heights, cost, iterations
+
+
+def reconstruct_surface(results, sensor_positions=None, n_vertices=INVERSE_VERTICES, x_limits=PLOT_X_LIMITS,
+                        n_starts=INVERSE_STARTS, height_range=INVERSE_HEIGHT_RANGE, workers=None, seed=0,
+                        speed_of_sound=SPEED_OF_SOUND, loss_percentage=LOSS_PERCENTAGE):
+    """
+    Ajusta uma polilinha com n_vertices vértices (x fixos e igualmente espaçados em x_limits,
+    alturas livres) aos tempos de eco observados, com mínimos quadrados a partir de vários
+    pontos de partida em paralelo. Devolve o melhor ajuste e os resíduos.
+    """
+    origins, angles, receivers, times = detections_to_arrays(results, sensor_positions)
+    x_vertices = np.linspace(x_limits[0], x_limits[1], n_vertices)
+    model = SurfaceModel(x_vertices, origins, angles, receivers, times, speed_of_sound, loss_percentage)
+
+    rng = np.random.default_rng(seed)
+    # Um ponto de partida plano à altura média observada, os restantes aleatórios
+    flat_height = np.mean(times) / 1000 / (1 / speed_of_sound + 1 / (speed_of_sound * (1 - loss_percentage)))
+    starts = [np.full(n_vertices, flat_height)]
+    starts += [rng.uniform(*height_range, n_vertices) for _ in range(n_starts - 1)]
+
+    if workers == 1:
+        fits = [_fit_from_start((model, start)) for start in starts]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            fits = list(executor.map(_fit_from_start, [(model, start) for start in starts]))
+
+    heights, cost, iterations = min(fits, key=lambda fit: fit[1])
+    vertices = model.vertices(heights)
+    predicted, deviation, hit = forward_model(vertices, origins, angles, receivers, speed_of_sound, loss_percentage)
+    residuals_ms = np.where(hit, predicted - times, np.nan)
+    return {
+        "vertices": vertices,
+        "residuals_ms": residuals_ms,
+        "rms_ms": float(np.sqrt(np.nanmean(residuals_ms ** 2))) if np.any(hit) else float("nan"),
+        "specular_deviation_deg": deviation,
+        "cost": float(cost),
+        "iterations": iterations,
+        "starts": len(starts),
+    }
+
+
+def surface_distance(vertices, point=(0.0, 0.0), angle_deg=90.0):
+    """
+    Distância de um ponto à superfície ajustada ao longo de uma direção (por omissão, na vertical).
+    """
+    times, _, hit = forward_model(vertices, np.array([point], dtype=float), np.deg2rad([angle_deg]),
+                                  np.array([point], dtype=float), 1.0, 0.0)
+    # com c = 1 e perda 0, tempo = 2·d·1000
+    return float(times[0] / 2000) if hit[0] else float("nan")
+
+
+def surface_inclination(vertices):
+    """
+    Inclinação (graus) da reta de mínimos quadrados pelos vértices ajustados.
+    """
+    slope = np.polyfit(vertices[:, 0], vertices[:, 1], 1)[0]
+    return float(np.degrees(np.arctan(slope)))
@@ -0,0 +1,151 @@
+# kernels.py
+"""
+Kernels em lote para os ciclos mais pesados da simulação de colisões:
+ - interseção de N raios com S segmentos (Surface._intersect_ray_segment em lote);
+ - posição de N raios num instante (Ray.position_at_time em lote).
+
+Se o Numba estiver instalado, os kernels são compilados (ciclos paralelos, sem arrays temporários);
+caso contrário usa-se a implementação NumPy de referência. DISABLE_JIT=1 força a versão NumPy.
+Para verificar a equivalência entre as duas implementações: python kernels.py
+"""
+import os
+import importlib.util
+import numpy as np
+
+# O Numba só é importado (em kernels_jit.py) na primeira chamada a um kernel compilado
+USE_JIT = os.environ.get("DISABLE_JIT", "0") != "1" and importlib.util.find_spec("numba") is not None
+
+_jit = None
+
+
+def _jit_kernels():
+    """
+    Módulo com os kernels compilados, importado (e compilado) na primeira utilização.
+    """
+    global _jit
+    if _jit is None:
+        import kernels_jit
+        _jit = kernels_jit
+    return _jit
+
+
+def intersect_rays_segments_numpy(origins, directions, seg_a, seg_b):
+    """
+    Referência NumPy: para cada raio, o primeiro segmento atingido (mesmas regras de
+    Surface._intersect_ray_segment: |denom| >= 1e-6, t >= 0, 0 <= u <= 1; empates ficam com o primeiro).
+    Devolve (t, índice do segmento); t = inf e índice -1 quando não há colisão.
+    """
+    seg = seg_b - seg_a
+    denom = directions[:, None, 0] * seg[None, :, 1] - directions[:, None, 1] * seg[None, :, 0]
+    diff = seg_a[None, :, :] - origins[:, None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (diff[..., 0] * seg[None, :, 1] - diff[..., 1] * seg[None, :, 0]) / denom
+        u = (diff[..., 0] * directions[:, None, 1] - diff[..., 1] * directions[:, None, 0]) / denom
+    valid = (np.abs(denom) >= 1e-6) & (t >= 0) & (u >= 0) & (u <= 1)
+    t = np.where(valid, t, np.inf)
+    index = np.argmin(t, axis=1)
+    best = t[np.arange(len(t)), index]
+    index = np.where(np.isfinite(best), index, -1)
+    return best, index
+
+
+def positions_at_time_numpy(sensor_pos, directions, collision_points, reflection_directions,
+                            t_out, has_collision, return_speed, speed, t_local, out):
+    """
+    Referência NumPy de Ray.position_at_time para N raios (t_local por raio), escrita em `out`.
+    """
+    returning = has_collision & (t_local > t_out)
+    t_prime = np.where(returning, t_local - t_out, 0.0)
+    out[:] = np.where(returning[:, None],
+                      collision_points + reflection_directions * (return_speed * t_prime)[:, None],
+                      sensor_pos + directions * (speed * t_local)[:, None])
+    return out
+
+
+def init_threads(num_threads=None):
+    """
+    Inicia o pool de threads do Numba na thread atual. Deve ser chamado na thread principal antes de
+    usar os kernels a partir de outras threads: se a primeira chamada paralela vier de uma thread
+    secundária, o processo fica bloqueado ao terminar. Não chamar antes de criar processos com fork.
+     - num_threads: limita as threads dos kernels (por exemplo, 1 em cada processo de um pool).
+    """
+    if USE_JIT:
+        import numba
+        numba.get_num_threads()
+        if num_threads:
+            numba.set_num_threads(min(num_threads, numba.config.NUMBA_NUM_THREADS))
+
+
+def intersect_rays_segments(origins, directions, seg_a, seg_b):
+    """
+    Interseção em lote raios × segmentos (Numba se disponível, senão NumPy).
+    """
+    origins = np.ascontiguousarray(origins, dtype=float)
+    directions = np.ascontiguousarray(directions, dtype=float)
+    seg_a = np.ascontiguousarray(seg_a, dtype=float)
+    seg_b = np.ascontiguousarray(seg_b, dtype=float)
+    if not USE_JIT:
+        return intersect_rays_segments_numpy(origins, directions, seg_a, seg_b)
+    t = np.empty(len(origins))
+    index = np.empty(len(origins), dtype=np.int64)
+    _jit_kernels().intersect_rays_segments_jit(origins, directions, seg_a, seg_b, t, index)
+    return t, index
+
+
+def positions_at_time(sensor_pos, directions, collision_points, reflection_directions,
+                      t_out, has_collision, return_speed, speed, t_local, out=None):
+    """
+    Posições de N raios no instante t_local (escalar ou por raio), em `out` se fornecido.
+    """
+    t_local = np.broadcast_to(np.asarray(t_local, dtype=float), (len(sensor_pos),))
+    if out is None:
+        out = np.empty((len(sensor_pos), 2))
+    if not USE_JIT:
+        return positions_at_time_numpy(sensor_pos, directions, collision_points, reflection_directions,
+                                       t_out, has_collision, return_speed, speed, t_local, out)
+    _jit_kernels().positions_at_time_jit(sensor_pos, directions, collision_points, reflection_directions, t_out,
+                                         has_collision, return_speed, float(speed), np.ascontiguousarray(t_local), out)
+    return out
+
+
+def check_equivalence(n_rays=5000, seed=0):
+    """
+    Compara os kernels compilados com a referência NumPy (e a interseção com Surface).
+    """
+    from surface import Surface
+    from configs import SURFACE_POINTS
+    rng = np.random.default_rng(seed)
+    points = np.array(SURFACE_POINTS, dtype=float)
+    origins = rng.uniform(-3, 3, (n_rays, 2))
+    angles = rng.uniform(0, 2 * np.pi, n_rays)
+    directions = np.column_stack([np.cos(angles), np.sin(angles)])
+
+    t_ref, idx_ref = intersect_rays_segments_numpy(origins, directions, points[:-1], points[1:])
+    t_fast, idx_fast = intersect_rays_segments(origins, directions, points[:-1], points[1:])
+    assert np.array_equal(idx_ref, idx_fast), "índices de segmento diferentes"
+    assert np.allclose(t_ref, t_fast, equal_nan=True), "distâncias diferentes"
+
+    surface = Surface(points)
+    for i in range(0, n_rays, max(n_rays // 200, 1)):
+        result = surface.ray_intersection_index(origins[i], directions[i])
+        if result is None:
+            assert idx_ref[i] == -1
+        else:
+            assert result[2] == idx_ref[i] and np.isclose(result[0], t_ref[i])
+
+    hit = idx_ref >= 0
+    cps = origins + np.where(hit, t_ref, 0)[:, None] * directions
+    refl = rng.normal(size=(n_rays, 2))
+    refl /= np.linalg.norm(refl, axis=1, keepdims=True)
+    t_out = np.where(hit, t_ref, np.inf) / 34.3
+    return_speed = np.full(n_rays, 34.3 * 0.8)
+    t_local = rng.uniform(0, 2, n_rays)
+    ref = positions_at_time_numpy(origins, directions, cps, refl, t_out, hit, return_speed, 34.3, t_local,
+                                  np.empty((n_rays, 2)))
+    fast = positions_at_time(origins, directions, cps, refl, t_out, hit, return_speed, 34.3, t_local)
+    assert np.allclose(ref, fast), "posições diferentes"
+    print(f"Kernels equivalentes ({'Numba' if USE_JIT else 'NumPy'}), {n_rays} raios.")
+
+
+if __name__ == "__main__":
+    check_equivalence()
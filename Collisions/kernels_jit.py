@@ -0,0 +1,48 @@
+# kernels_jit.py
+"""
+Versões compiladas (Numba) dos kernels de kernels.py. Este módulo só é importado por kernels.py
+na primeira chamada com JIT ativo, para que importar a simulação não carregue o Numba.
+"""
+import numba
+import numpy as np
+
+
+@numba.njit(parallel=True, cache=True)
+def intersect_rays_segments_jit(origins, directions, seg_a, seg_b, t_out, index_out):
+    n_rays = origins.shape[0]
+    n_seg = seg_a.shape[0]
+    for i in numba.prange(n_rays):
+        best = np.inf
+        best_j = -1
+        dx = directions[i, 0]
+        dy = directions[i, 1]
+        for j in range(n_seg):
+            sx = seg_b[j, 0] - seg_a[j, 0]
+            sy = seg_b[j, 1] - seg_a[j, 1]
+            denom = dx * sy - dy * sx
+            if abs(denom) < 1e-6:
+                continue
+            ax = seg_a[j, 0] - origins[i, 0]
+            ay = seg_a[j, 1] - origins[i, 1]
+            t = (ax * sy - ay * sx) / denom
+            u = (ax * dy - ay * dx) / denom
+            if t >= 0 and 0 <= u <= 1 and t < best:
+                best = t
+                best_j = j
+        t_out[i] = best
+        index_out[i] = best_j
+
+
+@numba.njit(parallel=True, cache=True)
+def positions_at_time_jit(sensor_pos, directions, collision_points, reflection_directions,
+                         t_out, has_collision, return_speed, speed, t_local, out):
+    for i in numba.prange(sensor_pos.shape[0]):
+        t = t_local[i]
+        if has_collision[i] and t > t_out[i]:
+            s = return_speed[i] * (t - t_out[i])
+            out[i, 0] = collision_points[i, 0] + reflection_directions[i, 0] * s
+            out[i, 1] = collision_points[i, 1] + reflection_directions[i, 1] * s
+        else:
+            s = speed * t
+            out[i, 0] = sensor_pos[i, 0] + directions[i, 0] * s
+            out[i, 1] = sensor_pos[i, 1] + directions[i, 1] * s
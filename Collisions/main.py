@@ -2,16 +2,10 @@
 import numpy as np
 from sensor import Sensor
 from simulation import Simulation
-from configs import SENSOR_CONFIGS
+from configs import SENSOR_CONFIGS, SURFACE_POINTS, CHECKPOINT_DIR, RESUME_FROM_CHECKPOINT, RECORD_DIR, REPLAY_DIR
 
 # Define os pontos da superfície (barreira)
-surface_points = np.array([
-    [10, 5],
-    [1, 5],
-    [0, 13],
-    [-1, 5],
-    [-10, 5]
-])
+surface_points = np.array(SURFACE_POINTS)
 
 # Cria os sensores a partir dos dados de configuração
 sensors = []
@@ -28,6 +22,11 @@ for conf in SENSOR_CONFIGS:
     )
     sensors.append(sensor)
 
-# Cria e executa a simulação
-sim = Simulation(surface_points, sensors)
-sim.animate()
+# Reproduz uma execução gravada ou cria e executa a simulação
+if REPLAY_DIR:
+    Simulation.replay(REPLAY_DIR)
+else:
+    sim = Simulation(surface_points, sensors, checkpoint_dir=CHECKPOINT_DIR, record_dir=RECORD_DIR)
+    if CHECKPOINT_DIR and RESUME_FROM_CHECKPOINT:
+        sim.resume()
+    sim.animate()
@@ -0,0 +1,359 @@
+# mesh3d.py
+import numpy as np
+from context import SimulationContext
+from configs import SIMULATION_FRAMES, SIMULATION_TOTAL_TIME
+
+# Parâmetros da BVH
+BVH_LEAF_SIZE = 8  # número máximo de triângulos por folha
+
+
+def load_mesh(filename):
+    """
+    Carrega uma malha de triângulos de um ficheiro simples:
+     - .obj: linhas 'v x y z' e 'f i j k ...' (índices a partir de 1; polígonos são triangulados em leque).
+     - .npz: arrays 'vertices' (n, 3) e 'faces' (m, 3).
+    """
+    if filename.endswith(".npz"):
+        data = np.load(filename)
+        return TriangleMesh(data["vertices"], data["faces"])
+
+    vertices = []
+    faces = []
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == "v":
+                vertices.append([float(v) for v in parts[1:4]])
+            elif parts[0] == "f":
+                idx = [int(p.split("/")[0]) - 1 for p in parts[1:]]
+                for k in range(1, len(idx) - 1):
+                    faces.append([idx[0], idx[k], idx[k + 1]])
+    return TriangleMesh(np.array(vertices), np.array(faces))
+
+
+def mesh_from_surface(points, z_min=-5.0, z_max=5.0):
+    """
+    Extruda a polilinha 2D de uma Surface (plano x-y) ao longo de z, criando uma malha 3D equivalente.
+    """
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    bottom = np.column_stack([points, np.full(n, z_min)])
+    top = np.column_stack([points, np.full(n, z_max)])
+    vertices = np.vstack([bottom, top])
+    i = np.arange(n - 1)
+    faces = np.vstack([np.column_stack([i, i + 1, n + i]),
+                       np.column_stack([i + 1, n + i + 1, n + i])])
+    return TriangleMesh(vertices, faces)
+
+
+class TriangleMesh:
+    def __init__(self, vertices, faces, leaf_size=BVH_LEAF_SIZE):
+        """
+        Malha de triângulos com BVH (bounding volume hierarchy) para interseção em lote.
+         - vertices: array (n, 3).
+         - faces: array (m, 3) de índices de vértices.
+        """
+        self.vertices = np.asarray(vertices, dtype=float)
+        self.faces = np.asarray(faces, dtype=np.intp)
+        self.v0 = self.vertices[self.faces[:, 0]]
+        self.e1 = self.vertices[self.faces[:, 1]] - self.v0
+        self.e2 = self.vertices[self.faces[:, 2]] - self.v0
+        normals = np.cross(self.e1, self.e2)
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        self.normals = normals / np.where(lengths > 0, lengths, 1)
+        self.leaf_size = leaf_size
+        self._build_bvh()
+
+    def _build_bvh(self):
+        """
+        Constrói a BVH por divisão na mediana do eixo mais longo (arrays planos, sem recursão).
+        """
+        tri = self.vertices[self.faces]
+        tri_min = tri.min(axis=1)
+        tri_max = tri.max(axis=1)
+        centroids = tri.mean(axis=1)
+
+        order = np.arange(len(self.faces))
+        bmin, bmax, left, right, start, count = [], [], [], [], [], []
+
+        def new_node(lo, hi):
+            idx = order[lo:hi]
+            bmin.append(tri_min[idx].min(axis=0))
+            bmax.append(tri_max[idx].max(axis=0))
+            left.append(-1)
+            right.append(-1)
+            start.append(lo)
+            count.append(hi - lo)
+            return len(bmin) - 1
+
+        stack = [(new_node(0, len(order)), 0, len(order))]
+        while stack:
+            node, lo, hi = stack.pop()
+            if hi - lo <= self.leaf_size:
+                continue
+            idx = order[lo:hi]
+            extent = centroids[idx].max(axis=0) - centroids[idx].min(axis=0)
+            axis = int(np.argmax(extent))
+            mid = (hi - lo) // 2
+            part = np.argpartition(centroids[idx, axis], mid)
+            order[lo:hi] = idx[part]
+            left_node = new_node(lo, lo + mid)
+            right_node = new_node(lo + mid, hi)
+            left[node], right[node] = left_node, right_node
+            count[node] = 0  # nó interior
+            stack.append((left_node, lo, lo + mid))
+            stack.append((right_node, lo + mid, hi))
+
+        self.bvh_min = np.array(bmin)
+        self.bvh_max = np.array(bmax)
+        self.bvh_left = np.array(left, dtype=np.intp)
+        self.bvh_right = np.array(right, dtype=np.intp)
+        self.bvh_start = np.array(start, dtype=np.intp)
+        self.bvh_count = np.array(count, dtype=np.intp)
+        self.tri_order = order
+
+    def _intersect_pairs(self, origins, directions, tri):
+        """
+        Möller–Trumbore vetorizado para pares (raio, triângulo). Devolve t (inf se não houver interseção).
+        """
+        e1 = self.e1[tri]
+        e2 = self.e2[tri]
+        pvec = np.cross(directions, e2)
+        det = np.einsum("ij,ij->i", e1, pvec)
+        valid = np.abs(det) > 1e-12
+        inv_det = np.where(valid, 1.0 / np.where(valid, det, 1.0), 0.0)
+        tvec = origins - self.v0[tri]
+        u = np.einsum("ij,ij->i", tvec, pvec) * inv_det
+        qvec = np.cross(tvec, e1)
+        v = np.einsum("ij,ij->i", directions, qvec) * inv_det
+        t = np.einsum("ij,ij->i", e2, qvec) * inv_det
+        hit = valid & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > 1e-9)
+        return np.where(hit, t, np.inf)
+
+    def ray_intersection(self, origins, directions):
+        """
+        Interseção em lote de N raios com a malha, percorrendo a BVH por níveis
+        (vetorizado sobre todos os pares raio–nó ativos).
+        Devolve (t, pontos de colisão, índice do triângulo); t = inf e índice -1 quando não há colisão.
+        """
+        origins = np.atleast_2d(np.asarray(origins, dtype=float))
+        directions = np.atleast_2d(np.asarray(directions, dtype=float))
+        n_rays = len(origins)
+        # Direção paralela a um eixo: o raio está dentro da laje (sempre) ou fora (nunca), incluindo as faces
+        parallel = np.abs(directions) <= 1e-12
+        inv_dir = 1.0 / np.where(parallel, 1.0, directions)
+
+        best_t = np.full(n_rays, np.inf)
+        best_tri = np.full(n_rays, -1, dtype=np.intp)
+        ray_ids = np.arange(n_rays)
+        nodes = np.zeros(n_rays, dtype=np.intp)
+
+        while ray_ids.size:
+            # Teste das caixas (slabs)
+            o = origins[ray_ids]
+            inv = inv_dir[ray_ids]
+            lo, hi = self.bvh_min[nodes], self.bvh_max[nodes]
+            t1 = (lo - o) * inv
+            t2 = (hi - o) * inv
+            par = parallel[ray_ids]
+            inside = (o >= lo) & (o <= hi)
+            t_near = np.where(par, np.where(inside, -np.inf, np.inf), np.minimum(t1, t2)).max(axis=1)
+            t_far = np.where(par, np.where(inside, np.inf, -np.inf), np.maximum(t1, t2)).min(axis=1)
+            keep = (t_far >= np.maximum(t_near, 0)) & (t_near < best_t[ray_ids])
+            ray_ids, nodes = ray_ids[keep], nodes[keep]
+
+            # Folhas: teste de todos os pares (raio, triângulo)
+            leaf = self.bvh_count[nodes] > 0
+            if np.any(leaf):
+                leaf_rays, leaf_nodes = ray_ids[leaf], nodes[leaf]
+                counts = self.bvh_count[leaf_nodes]
+                rep_rays = np.repeat(leaf_rays, counts)
+                offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                tri = self.tri_order[np.repeat(self.bvh_start[leaf_nodes], counts) + offsets]
+                t = self._intersect_pairs(origins[rep_rays], directions[rep_rays], tri)
+                found = np.isfinite(t)
+                np.minimum.at(best_t, rep_rays[found], t[found])
+                winner = found & (t == best_t[rep_rays])
+                best_tri[rep_rays[winner]] = tri[winner]
+
+            # Nós interiores: descer para os dois filhos
+            inner = ~leaf
+            ray_ids = np.concatenate([ray_ids[inner], ray_ids[inner]])
+            nodes = np.concatenate([self.bvh_left[nodes[inner]], self.bvh_right[nodes[inner]]])
+
+        points = origins + np.where(np.isfinite(best_t), best_t, 0)[:, None] * directions
+        return best_t, points, best_tri
+
+
+def _rotation_from_pose(yaw_deg, pitch_deg):
+    """
+    Matriz de rotação do referencial local do sensor (x = direção central) para o global.
+    """
+    yaw, pitch = np.deg2rad(yaw_deg), np.deg2rad(pitch_deg)
+    rz = np.array([[np.cos(yaw), -np.sin(yaw), 0], [np.sin(yaw), np.cos(yaw), 0], [0, 0, 1]])
+    ry = np.array([[np.cos(pitch), 0, -np.sin(pitch)], [0, 1, 0], [np.sin(pitch), 0, np.cos(pitch)]])
+    return rz @ ry
+
+
+class Sensor3D:
+    def __init__(self, sensor_id, position, yaw_deg=90, pitch_deg=0, azimuth_range_deg=60, elevation_range_deg=60,
+                 emission_step_deg=5, frequency=1.0, color='blue', initial_delay=0.0, radius=0.3):
+        """
+        Sensor 3D com pose (posição, yaw, pitch) e cone de emissão 2D:
+         - azimuth_range_deg / elevation_range_deg: aberturas totais do cone (graus).
+         - emission_step_deg: espaçamento angular em ambas as direções.
+         - radius: raio da esfera de receção.
+        """
+        self.sensor_id = sensor_id
+        self.position = np.array(position, dtype=float)
+        self.yaw_deg = yaw_deg
+        self.pitch_deg = pitch_deg
+        self.azimuth_range_deg = azimuth_range_deg
+        self.elevation_range_deg = elevation_range_deg
+        self.emission_step_deg = emission_step_deg
+        self.frequency = frequency
+        self.color = color
+        self.initial_delay = initial_delay
+        self.radius = radius
+
+    def emission_directions(self):
+        """
+        Devolve (direções (n, 3), azimutes, elevações) de um pulso, no referencial global.
+        """
+        half_az = self.azimuth_range_deg / 2.0
+        half_el = self.elevation_range_deg / 2.0
+        az = np.arange(-half_az, half_az + self.emission_step_deg, self.emission_step_deg)
+        el = np.arange(-half_el, half_el + self.emission_step_deg, self.emission_step_deg)
+        az, el = np.meshgrid(az, el)
+        az, el = az.ravel(), el.ravel()
+        az_r, el_r = np.deg2rad(az), np.deg2rad(el)
+        local = np.column_stack([np.cos(el_r) * np.cos(az_r), np.cos(el_r) * np.sin(az_r), np.sin(el_r)])
+        return local @ _rotation_from_pose(self.yaw_deg, self.pitch_deg).T, az, el
+
+    def emit_rays(self, context=None):
+        directions, az, el = self.emission_directions()
+        return RayBundle3D(self.position, directions, az, el, sensor_id=self.sensor_id, context=context)
+
+
+class RayBundle3D:
+    def __init__(self, sensor_pos, directions, azimuth_deg, elevation_deg, sensor_id=0, context=None):
+        """
+        Conjunto de raios de um pulso 3D, tratado em arrays (equivalente 3D de Ray).
+        """
+        self.context = context if context is not None else SimulationContext()
+        self.sensor_pos = np.asarray(sensor_pos, dtype=float)
+        self.directions = np.asarray(directions, dtype=float)
+        self.azimuth_deg = azimuth_deg
+        self.elevation_deg = elevation_deg
+        self.sensor_id = sensor_id
+        n = len(self.directions)
+        self.has_collision = np.zeros(n, dtype=bool)
+        self.collision_points = np.zeros((n, 3))
+        self.reflection_directions = np.zeros((n, 3))
+        self.t_out = np.full(n, np.inf)
+        self.response_time = np.full(n, np.inf)
+
+    def propagate(self, mesh):
+        """
+        Interseção com a malha e reflexão com dispersão aleatória (como Ray.propagate):
+          R = D - 2 (D·N) N, com N orientada contra D, rodada por um ângulo uniforme em ±dispersion_deg.
+        """
+        speed = self.context.speed_of_sound
+        loss = self.context.loss_percentage
+        origins = np.broadcast_to(self.sensor_pos, self.directions.shape)
+        t, points, tri = mesh.ray_intersection(origins, self.directions)
+        hit = tri >= 0
+        self.has_collision = hit
+        self.collision_points = points
+
+        normals = mesh.normals[np.where(hit, tri, 0)]
+        d_dot_n = np.einsum("ij,ij->i", self.directions, normals)
+        normals = np.where((d_dot_n > 0)[:, None], -normals, normals)
+        d_dot_n = -np.abs(d_dot_n)
+        refl = self.directions - 2 * d_dot_n[:, None] * normals
+
+        # Dispersão: rotação em torno de um eixo aleatório perpendicular a R
+        rng = np.random.default_rng(self.context.rng.getrandbits(64))
+        delta = np.deg2rad(rng.uniform(-self.context.dispersion_deg, self.context.dispersion_deg, len(refl)))
+        axis = np.cross(refl, rng.normal(size=refl.shape))
+        axis /= np.maximum(np.linalg.norm(axis, axis=1, keepdims=True), 1e-12)
+        refl = refl * np.cos(delta)[:, None] + np.cross(axis, refl) * np.sin(delta)[:, None]
+        refl /= np.linalg.norm(refl, axis=1, keepdims=True)
+        self.reflection_directions = refl
+
+        distance = np.where(hit, t, np.inf)
+        self.t_out = distance / speed
+        self.response_time = self.t_out + distance / (speed * (1 - loss))
+
+    def positions_at_time(self, t_local):
+        """
+        Posições de todos os raios no tempo t_local desde a emissão (ida ou retorno).
+        """
+        speed = self.context.speed_of_sound
+        out = self.sensor_pos + self.directions * speed * t_local
+        t_prime = np.maximum(t_local - np.where(self.has_collision, self.t_out, 0), 0)
+        back = self.collision_points + self.reflection_directions * (speed * (1 - self.context.loss_percentage)) * t_prime[:, None]
+        returning = self.has_collision & (t_local > self.t_out)
+        return np.where(returning[:, None], back, out), returning
+
+
+class Simulation3D:
+    def __init__(self, mesh, sensors, frames=SIMULATION_FRAMES, total_time=SIMULATION_TOTAL_TIME, context=None):
+        """
+        Simulação 3D headless: sensores Sensor3D e superfície TriangleMesh.
+        As detecções seguem o esquema de 'resultados.json' (coordenadas 3D e elevação adicional).
+        """
+        self.mesh = mesh
+        self.sensors = sensors
+        self.frames = frames
+        self.total_time = total_time
+        self.context = context if context is not None else SimulationContext()
+        self.detections = []
+        self.emission_groups = []
+        self.sensor_next_emission_time = {s.sensor_id: s.initial_delay for s in sensors}
+        self.particle_stats = {s.sensor_id: {"emitted": 0, "received": {o.sensor_id: 0 for o in sensors}}
+                               for s in sensors}
+        self._receiver_pos = np.array([s.position for s in sensors])
+        self._receiver_r2 = np.array([s.radius for s in sensors]) ** 2
+        self._receiver_ids = [s.sensor_id for s in sensors]
+
+    def step(self, frame):
+        t_global = (frame / (self.frames - 1)) * self.total_time
+        for sensor in self.sensors:
+            if t_global >= self.sensor_next_emission_time[sensor.sensor_id]:
+                bundle = sensor.emit_rays(self.context)
+                bundle.propagate(self.mesh)
+                self.particle_stats[sensor.sensor_id]["emitted"] += len(bundle.directions)
+                detected = np.zeros((len(bundle.directions), len(self.sensors)), dtype=bool)
+                detected[:, self._receiver_ids.index(sensor.sensor_id)] = True  # o emissor não se deteta
+                self.emission_groups.append({"bundle": bundle, "emission_time": t_global, "detected": detected})
+                self.sensor_next_emission_time[sensor.sensor_id] = t_global + 1.0 / sensor.frequency
+
+        for group in self.emission_groups:
+            bundle = group["bundle"]
+            pos, returning = bundle.positions_at_time(t_global - group["emission_time"])
+            d2 = np.sum((pos[:, None, :] - self._receiver_pos[None, :, :]) ** 2, axis=2)
+            new = returning[:, None] & (d2 < self._receiver_r2[None, :]) & ~group["detected"]
+            group["detected"] |= new
+            for ray_idx, rec_idx in zip(*np.nonzero(new)):
+                receptor = self._receiver_ids[rec_idx]
+                self.detections.append({
+                    'sensor_receptor': receptor,
+                    'sensor_emissor': bundle.sensor_id,
+                    'emissor_coords': bundle.sensor_pos.tolist(),
+                    'angulo': round(float(bundle.azimuth_deg[ray_idx]), 1),
+                    'elevacao': round(float(bundle.elevation_deg[ray_idx]), 1),
+                    'tempo_ms': round(float(bundle.response_time[ray_idx]) * 1000, 2)
+                })
+                self.particle_stats[receptor]["received"][bundle.sensor_id] += 1
+        return t_global
+
+    def run(self):
+        for frame in range(self.frames):
+            try:
+                self.step(frame)
+            except Exception as e:
+                print(f"Error during 3D step {frame}: {e}")
+        return self.detections
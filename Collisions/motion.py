@@ -0,0 +1,59 @@
+# motion.py
+"""
+Movimento de sensores (posição) e de superfícies (vértices) ao longo do tempo da simulação.
+
+Um movimento pode ser dado por:
+ - keyframes: lista de (t, valor) com t crescente; entre keyframes o valor é interpolado linearmente
+   e fora do intervalo fica no primeiro/último valor. Em JSON: [[t, [x, y]], ...] para um sensor,
+   [[t, [[x, y], ...]], ...] para os vértices de uma superfície;
+ - callback: função t -> valor (por exemplo, uma órbita ou uma deformação analítica).
+"""
+import numpy as np
+
+
+class Motion:
+    def __init__(self, keyframes=None, callback=None):
+        if (keyframes is None) == (callback is None):
+            raise ValueError("Indique keyframes ou callback (apenas um)")
+        self.callback = callback
+        self.times = None
+        self.values = None
+        if keyframes is not None:
+            self.times = np.array([float(t) for t, _ in keyframes])
+            self.values = np.array([np.asarray(value, dtype=float) for _, value in keyframes])
+            if len(self.times) == 0 or np.any(np.diff(self.times) < 0):
+                raise ValueError("Os keyframes têm de ter tempos crescentes")
+
+    def at(self, t):
+        """
+        Valor (array float) no instante t.
+        """
+        if self.callback is not None:
+            return np.asarray(self.callback(t), dtype=float)
+        k = np.searchsorted(self.times, t, side="right")
+        if k == 0:
+            return self.values[0].copy()
+        if k == len(self.times):
+            return self.values[-1].copy()
+        t0, t1 = self.times[k - 1], self.times[k]
+        w = (t - t0) / (t1 - t0) if t1 > t0 else 1.0
+        return (1 - w) * self.values[k - 1] + w * self.values[k]
+
+    def to_config(self):
+        """
+        Keyframes no formato JSON (None para callbacks, que não são serializáveis).
+        """
+        if self.callback is not None:
+            return None
+        return [[float(t), value.tolist()] for t, value in zip(self.times, self.values)]
+
+
+def as_motion(spec):
+    """
+    Normaliza a especificação de um movimento: None, Motion, função t -> valor ou lista de keyframes.
+    """
+    if spec is None or isinstance(spec, Motion):
+        return spec
+    if callable(spec):
+        return Motion(callback=spec)
+    return Motion(keyframes=spec)
@@ -0,0 +1,168 @@
+# pipeline.py
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+from sensor import Sensor
+from simulation import Simulation
+from configs import SENSOR_CONFIGS, SURFACE_POINTS, SIMULATION_FRAMES, SIMULATION_TOTAL_TIME
+
+# O código de calibração (Calibrate) é usado diretamente, sem passar por JSON
+CALIBRATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Calibrate")
+if CALIBRATE_DIR not in sys.path:
+    sys.path.append(CALIBRATE_DIR)
+
+from Emitter import Emitter  # noqa: E402
+from Configs import FOCAL_POINTS as CALIBRATE_FOCAL_POINTS, SOUND_SPEED as CALIBRATE_SOUND_SPEED, LAMBDA0  # noqa: E402
+
+
+def focus_to_tuple(focus):
+    """
+    Aceita um ponto focal como dict {"x": .., "y": ..} ou (x, y).
+    """
+    if isinstance(focus, dict):
+        return float(focus["x"]), float(focus["y"])
+    return float(focus[0]), float(focus[1])
+
+
+def create_sensor(conf, **overrides):
+    """
+    Cria um Sensor a partir de uma entrada de SENSOR_CONFIGS, com valores opcionalmente substituídos.
+    """
+    conf = {**conf, **overrides}
+    return Sensor(
+        sensor_id=conf['sensor_id'],
+        position=conf['position'],
+        rotation_deg=conf['rotation_deg'],
+        emission_range_deg=conf['emission_range_deg'],
+        emission_step_deg=conf['emission_step_deg'],
+        frequency=conf['frequency'],
+        color=conf['color'],
+        initial_delay=conf['initial_delay'],
+        adaptive_emission=conf.get('adaptive_emission', False),
+        min_emission_step_deg=conf.get('min_emission_step_deg', 0.5),
+        refine_reflection_deg=conf.get('refine_reflection_deg', 10.0),
+        motion=conf.get('motion')
+    )
+
+
+class CalibrationPipeline:
+    def __init__(self, surface_points=SURFACE_POINTS, sensor_configs=SENSOR_CONFIGS,
+                 frames=SIMULATION_FRAMES, c=CALIBRATE_SOUND_SPEED, total_time=SIMULATION_TOTAL_TIME):
+        """
+        Liga a calibração (Calibrate) à simulação de colisões (Collisions) em memória:
+         - surface_points: pontos da superfície.
+         - sensor_configs: configurações dos sensores (cada sensor é também um emissor Calibrate).
+         - frames: número de frames da simulação headless.
+         - c: velocidade de propagação usada no cálculo das fases.
+         - total_time: tempo total simulado (segundos).
+        Os atrasos calculados ficam em cache por hash da geometria e do ponto focal.
+        """
+        self.surface_points = np.array(surface_points)
+        self.sensor_configs = sensor_configs
+        self.frames = frames
+        self.c = c
+        self.total_time = total_time
+        self.delay_cache = {}
+
+    def geometry_key(self, focus):
+        """
+        Hash estável da geometria dos emissores, do comprimento de onda de referência e do foco.
+        """
+        fx, fy = focus_to_tuple(focus)
+        geometry = {
+            "sensors": [[conf['sensor_id'], list(map(float, conf['position'])), float(conf['frequency'])]
+                        for conf in self.sensor_configs],
+            "c": self.c,
+            "lambda0": LAMBDA0,
+            "focus": [fx, fy],
+        }
+        return hashlib.sha1(json.dumps(geometry, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def compute_delays(self, focus):
+        """
+        Calcula (ou obtém da cache) a fase e o atraso inicial de cada sensor para o ponto focal,
+        com Emitter.CalculatePhaseFromFocus / SetPhase (o mesmo cálculo de Demos.demo9).
+        Devolve {sensor_id: {"phase_shift": φ, "initial_delay": t0}}.
+        """
+        key = self.geometry_key(focus)
+        if key in self.delay_cache:
+            return self.delay_cache[key]
+
+        fx, fy = focus_to_tuple(focus)
+        delays = {}
+        for conf in self.sensor_configs:
+            emitter = Emitter(x=conf['position'][0], y=conf['position'][1], c=self.c, f=conf['frequency'], phase=0)
+            phase = emitter.CalculatePhaseFromFocus(fx, fy)
+            emitter.SetPhase(phase)
+            delays[conf['sensor_id']] = {"phase_shift": phase, "initial_delay": emitter.t0}
+        self.delay_cache[key] = delays
+        return delays
+
+    def build_sensors(self, focus):
+        """
+        Cria os objetos Sensor com os atrasos iniciais calculados para o ponto focal.
+        """
+        delays = self.compute_delays(focus)
+        return [create_sensor(conf, initial_delay=delays[conf['sensor_id']]["initial_delay"])
+                for conf in self.sensor_configs]
+
+    def cache_params(self, focus, context):
+        """
+        Parâmetros que determinam o resultado de run_focus (chave da ResultCache).
+        """
+        return {
+            "surface_points": self.surface_points,
+            "sensors": self.sensor_configs,
+            "focus": focus_to_tuple(focus),
+            "c": self.c,
+            "lambda0": LAMBDA0,
+            "frames": self.frames,
+            "total_time": self.total_time,
+            "physics": [context.speed_of_sound, context.loss_percentage, context.dispersion_deg],
+            "seed": context.seed,
+        }
+
+    def run_focus(self, focus, context=None, cache=None):
+        """
+        Executa a simulação headless para um ponto focal e devolve os resultados em memória.
+         - context: SimulationContext da execução (por omissão, um contexto novo).
+         - cache: ResultCache opcional; só é usada quando o contexto tem semente (execução determinística).
+        """
+        if cache is not None and context is not None and context.seed is not None:
+            fx, fy = focus_to_tuple(focus)
+            return cache.get_or_compute("simulation", self.cache_params(focus, context),
+                                        lambda: self.run_focus(focus, context),
+                                        label=f"foco ({fx}, {fy}) seed {context.seed}")
+        sensors = self.build_sensors(focus)
+        sim = Simulation(self.surface_points, sensors, frames=self.frames, verbose=False, context=context,
+                         total_time=self.total_time)
+        sim.run()
+        return {
+            "focus": focus_to_tuple(focus),
+            "delays": self.compute_delays(focus),
+            "detections": sim.detections,
+            "particle_stats": sim.particle_statistics(),
+        }
+
+    def run_all(self, focal_points=CALIBRATE_FOCAL_POINTS):
+        """
+        Executa a cadeia completa (atrasos → sensores → simulação) para todos os pontos focais.
+        """
+        results = []
+        for focus in focal_points:
+            try:
+                results.append(self.run_focus(focus))
+            except Exception as e:
+                print(f"Error running pipeline for focus {focus}: {e}")
+        return results
+
+
+if __name__ == "__main__":
+    pipeline = CalibrationPipeline()
+    for result in pipeline.run_all():
+        summary = result["particle_stats"]["statistics"]
+        print(f"Foco {result['focus']}: {len(result['detections'])} ecos | "
+              f"L {summary['left']['percentage']:.2f}% C {summary['center']['percentage']:.2f}% "
+              f"R {summary['right']['percentage']:.2f}%")
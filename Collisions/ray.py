@@ -1,49 +1,36 @@
 import numpy as np
-import random
-import json
-from configs import SPEED_OF_SOUND, LOSS_PERCENTAGE, REFLECTION_DISPERSION_DEG, WRITE_INTERVAL, RESULT_SAVE_FRAMES
-
-# Global buffer to store position and collision data
-simulation_data = []
-
-# Counter to track the number of frames processed
-frame_counter = 0
-
-
-def write_to_json():
-    """
-    Writes the buffered simulation data to 'posicoes.json'.
-    """
-    try:
-        with open("posicoes.json", "w") as file:
-            json.dump(simulation_data, file, indent=4)
-    except Exception as e:
-        print(f"Error saving simulation data: {e}")
+from context import SimulationContext
 
 class Ray:
     def __init__(self, sensor_pos, emission_angle_deg, sensor_id=0, color='blue',
-                 loss_percentage=LOSS_PERCENTAGE, dispersion_deg=REFLECTION_DISPERSION_DEG):
+                 loss_percentage=None, dispersion_deg=None, context=None, weight=1.0):
         """
         Inicializa um raio com:
          - sensor_pos: posição do sensor (centro) de emissão.
          - emission_angle_deg: ângulo de emissão (graus).
          - sensor_id: identificador do sensor emissor.
          - color: cor do raio.
+         - loss_percentage, dispersion_deg: por omissão, os valores do contexto.
+         - context: SimulationContext da execução (parâmetros físicos, RNG e gravação).
+         - weight: peso do raio nas contagens de partículas (1 com passo fixo; ver Sensor.emission_weights).
         """
+        self.context = context if context is not None else SimulationContext()
         self.sensor_pos = np.array(sensor_pos)
         self.emission_angle_deg = emission_angle_deg
         self.emission_angle_rad = np.deg2rad(emission_angle_deg)
         self.direction = np.array([np.cos(self.emission_angle_rad), np.sin(self.emission_angle_rad)])
         self.sensor_id = sensor_id
         self.color = color
-        self.loss_percentage = loss_percentage
-        self.dispersion_deg = dispersion_deg
+        self.weight = weight
+        self.loss_percentage = self.context.loss_percentage if loss_percentage is None else loss_percentage
+        self.dispersion_deg = self.context.dispersion_deg if dispersion_deg is None else dispersion_deg
 
         # Dados de colisão e retorno
         self.has_collision = False
         self.collision_point = None
         self.t_out = None   # tempo de ida (sensor -> colisão)
         self.reflection_direction = None
+        self.dispersion_offset_deg = None  # desvio aleatório aplicado à reflexão (mantido se a colisão mudar)
         self.t_return = None  # tempo de retorno (colisão -> sensor)
         self.response_time = None
         # Lista de sensores que já detectaram este raio (para evitar duplicação)
@@ -62,10 +49,21 @@ class Ray:
             if result is None:
                 return
             t, collision_point, hit_segment = result
+            self.apply_collision(collision_point, hit_segment)
+        except Exception as e:
+            print(f"Error during ray propagation (angle {self.emission_angle_deg:.1f}°): {e}")
+
+    def apply_collision(self, collision_point, hit_segment, dispersion_offset_deg=None):
+        """
+        Regista a colisão já calculada (por propagate ou por Surface.ray_intersection_batch):
+        calcula t_out, a direção de retorno com dispersão e o tempo de resposta.
+         - dispersion_offset_deg: desvio da reflexão a usar; por omissão é sorteado no RNG do contexto.
+        """
+        try:
             self.has_collision = True
             self.collision_point = collision_point
             distance_out = np.linalg.norm(collision_point - self.sensor_pos)
-            self.t_out = distance_out / SPEED_OF_SOUND
+            self.t_out = distance_out / self.context.speed_of_sound
 
             # Save collision data to the in-memory buffer
             collision_data = {
@@ -73,8 +71,7 @@ class Ray:
                 "collision_point": collision_point.tolist(),
                 "t_out": self.t_out
             }
-            if RESULT_SAVE_FRAMES > 0:
-                simulation_data.append(collision_data)
+            self.context.record(collision_data)
 
             # Calcula a normal do segmento atingido:
             A, B = hit_segment
@@ -89,7 +86,10 @@ class Ray:
             refl = self.direction - 2 * (np.dot(self.direction, normal)) * normal
 
             # Aplica dispersão aleatória
-            delta_deg = random.uniform(-self.dispersion_deg, self.dispersion_deg)
+            if dispersion_offset_deg is None:
+                dispersion_offset_deg = self.context.rng.uniform(-self.dispersion_deg, self.dispersion_deg)
+            self.dispersion_offset_deg = dispersion_offset_deg
+            delta_deg = dispersion_offset_deg
             delta_rad = np.deg2rad(delta_deg)
             cos_d = np.cos(delta_rad)
             sin_d = np.sin(delta_rad)
@@ -99,7 +99,7 @@ class Ray:
             self.reflection_direction /= np.linalg.norm(self.reflection_direction)
 
             distance_return = np.linalg.norm(collision_point - self.sensor_pos)
-            self.t_return = distance_return / (SPEED_OF_SOUND * (1 - self.loss_percentage))
+            self.t_return = distance_return / (self.context.speed_of_sound * (1 - self.loss_percentage))
             self.response_time = self.t_out + self.t_return
         except Exception as e:
             print(f"Error during ray propagation (angle {self.emission_angle_deg:.1f}°): {e}")
@@ -110,11 +110,10 @@ class Ray:
          - Se t_global <= t_out, está na fase de ida.
          - Se t_global > t_out, segue a trajetória de retorno.
         """
-        global frame_counter
         try:
             if not self.has_collision or t_global <= self.t_out:
                 # Fase de ida (out phase)
-                pos = self.sensor_pos + self.direction * SPEED_OF_SOUND * t_global
+                pos = self.sensor_pos + self.direction * self.context.speed_of_sound * t_global
                 # Save position during 'out' phase
                 position_data = {
                     "angle_deg": self.emission_angle_deg,
@@ -125,7 +124,7 @@ class Ray:
             else:
                 # Fase de retorno (return phase)
                 t_prime = t_global - self.t_out
-                pos = self.collision_point + self.reflection_direction * (SPEED_OF_SOUND * (1 - self.loss_percentage)) * t_prime
+                pos = self.collision_point + self.reflection_direction * (self.context.speed_of_sound * (1 - self.loss_percentage)) * t_prime
                 # Save position during 'return' phase
                 position_data = {
                     "angle_deg": self.emission_angle_deg,
@@ -134,24 +133,13 @@ class Ray:
                     "time": t_global
                 }
 
-            if RESULT_SAVE_FRAMES > 0:
-                # Append position data to the in-memory buffer
-                simulation_data.append(position_data)
+            # Append position data to the in-memory buffer
+            self.context.record(position_data)
 
             # Increment frame counter and write to JSON periodically
-            frame_counter += 1
-            if RESULT_SAVE_FRAMES > 0 and frame_counter % WRITE_INTERVAL == 0:
-                write_to_json()
+            self.context.count_frame()
 
             return pos
         except Exception as e:
             print(f"Error calculating position for Ray {self.emission_angle_deg:.1f}° at time {t_global:.2f}s: {e}")
             return self.sensor_pos
-
-# Ensure this function is called at the end of the simulation to save remaining data
-def save_simulation_data():
-    """
-    Writes the buffered simulation data to 'posicoes.json'.
-    """
-    if RESULT_SAVE_FRAMES > 0:
-        write_to_json()
\ No newline at end of file
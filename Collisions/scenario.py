@@ -0,0 +1,70 @@
+# scenario.py
+import os
+import json
+import inspect
+from context import SimulationContext
+from sensor import Sensor
+from configs import (SENSOR_CONFIGS, SURFACE_POINTS, SIMULATION_FRAMES, SIMULATION_TOTAL_TIME, FOCAL_POINTS,
+                     SPEED_OF_SOUND, LOSS_PERCENTAGE, REFLECTION_DISPERSION_DEG)
+
+# Valores por omissão de um cenário (os mesmos de configs.py)
+DEFAULT_SCENARIO = {
+    "surface_points": SURFACE_POINTS,
+    "sensors": SENSOR_CONFIGS,
+    "focal_points": FOCAL_POINTS,
+    "frames": SIMULATION_FRAMES,
+    "total_time": SIMULATION_TOTAL_TIME,
+    "seed": None,
+    "surface_motion": None,
+    "physics": {
+        "speed_of_sound": SPEED_OF_SOUND,
+        "loss_percentage": LOSS_PERCENTAGE,
+        "dispersion_deg": REFLECTION_DISPERSION_DEG,
+    },
+}
+
+# Chaves obrigatórias de cada sensor e chaves opcionais, com os valores por omissão de Sensor
+SENSOR_REQUIRED_KEYS = ("sensor_id", "position", "rotation_deg")
+SENSOR_DEFAULTS = {name: parameter.default for name, parameter in inspect.signature(Sensor).parameters.items()
+                   if name in ("emission_range_deg", "emission_step_deg", "frequency", "color", "initial_delay")}
+
+
+def load_scenario(path):
+    """
+    Carrega um cenário JSON e completa as chaves em falta com os valores de configs.py.
+    Formato:
+      {
+        "name": "...",
+        "surface_points": [[x, y], ...],
+        "sensors": [ entradas no formato de SENSOR_CONFIGS; "motion": [[t, [x, y]], ...] opcional ],
+                     (sensor_id, position e rotation_deg obrigatórios; as restantes chaves têm
+                      os valores por omissão de Sensor)
+        "focal_points": [{"x": .., "y": ..}, ...],   (lista vazia = usar os initial_delay dos sensores)
+        "frames": 300, "total_time": 5.0, "seed": 0,
+        "surface_motion": [[t, [[x, y], ...]], ...],   (opcional; keyframes dos vértices, ver motion.py)
+        "physics": {"speed_of_sound": .., "loss_percentage": .., "dispersion_deg": ..}
+      }
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    scenario = {**DEFAULT_SCENARIO, **data}
+    scenario["physics"] = {**DEFAULT_SCENARIO["physics"], **data.get("physics", {})}
+    scenario.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    scenario["sensors"] = [{**SENSOR_DEFAULTS, **conf} for conf in scenario["sensors"]]
+    for i, conf in enumerate(scenario["sensors"]):
+        missing = [key for key in SENSOR_REQUIRED_KEYS if key not in conf]
+        if missing:
+            raise ValueError(f"Sensor {i} do cenário '{path}' sem as chaves obrigatórias: {', '.join(missing)}")
+        conf["emission_range_deg"] = tuple(conf["emission_range_deg"])
+    return scenario
+
+
+def scenario_context(scenario, seed=None):
+    """
+    Cria o SimulationContext com as constantes físicas do cenário.
+    """
+    physics = scenario["physics"]
+    return SimulationContext(speed_of_sound=physics["speed_of_sound"],
+                             loss_percentage=physics["loss_percentage"],
+                             dispersion_deg=physics["dispersion_deg"],
+                             seed=scenario["seed"] if seed is None else seed)
@@ -0,0 +1,313 @@
+# schedule.py
+"""
+Otimização do calendário de emissão (initial_delay e frequency de cada sensor) para minimizar
+detecções ambíguas: ecos que chegam a um recetor quase ao mesmo tempo que ecos de outro emissor,
+e que por isso não podem ser atribuídos ao emissor certo.
+
+Os candidatos são avaliados com um modelo analítico de tempo de voo (sem animação):
+ - cada raio do leque de cada emissor é intersetado com a superfície (kernels em lote);
+ - para cada recetor calcula-se o tempo de chegada do eco refletido e a probabilidade de o
+   atingir dentro da tolerância de deteção, dada a dispersão uniforme da reflexão;
+ - com o calendário (atraso, frequência) obtêm-se os instantes de emissão tal como na Simulation
+   (na grelha de frames, com a próxima emissão marcada a partir do frame da anterior) e todas as
+   chegadas a cada recetor no tempo simulado; uma chegada é ambígua se houver outra, de outro
+   emissor, a menos de guard_ms.
+O próprio eco de um sensor também conta como fonte de conflito (fisicamente é recebido).
+
+A pesquisa é uma evolução diferencial; a população de cada geração é avaliada em paralelo.
+O melhor calendário é gravado no formato de SENSOR_CONFIGS (também aceite como cenário).
+Com --validate, os calendários atual e otimizado são simulados com a física, os frames e o tempo total
+do cenário, e é indicada a fração de detecções ambíguas medida na simulação.
+
+Exemplo:
+  python schedule.py --target-rate 6 --workers 4 --output calendario.json --validate
+"""
+import json
+import pprint
+import argparse
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from surface import Surface
+from pipeline import create_sensor
+from kernels import intersect_rays_segments
+from configs import (SENSOR_CONFIGS, SURFACE_POINTS, SIMULATION_FRAMES, SIMULATION_TOTAL_TIME, SPEED_OF_SOUND,
+                     LOSS_PERCENTAGE, REFLECTION_DISPERSION_DEG)
+
+# Parâmetros da otimização
+SCHEDULE_TARGET_RATE_HZ = 6.0    # frequência mínima de emissão de cada sensor (taxa de atualização)
+SCHEDULE_MAX_RATE_HZ = 12.0      # frequência máxima admitida
+SCHEDULE_GUARD_MS = 25.0         # janela em que duas chegadas de emissores diferentes são ambíguas
+SCHEDULE_DETECTION_TOLERANCE = 1.0  # a mesma tolerância de Simulation.detection_tolerance (m)
+SCHEDULE_POPULATION = 32
+SCHEDULE_GENERATIONS = 60
+SCHEDULE_MUTATION = 0.6          # fator F da evolução diferencial
+SCHEDULE_CROSSOVER = 0.9         # probabilidade CR da evolução diferencial
+
+
+def arrival_model(sensor_configs=SENSOR_CONFIGS, surface_points=SURFACE_POINTS, speed_of_sound=SPEED_OF_SOUND,
+                  loss_percentage=LOSS_PERCENTAGE, dispersion_deg=REFLECTION_DISPERSION_DEG,
+                  tolerance=SCHEDULE_DETECTION_TOLERANCE):
+    """
+    Tempos de chegada por pulso, independentes do calendário. Devolve, para cada recetor r,
+    uma lista com um elemento por emissor e: (atrasos desde a emissão em s, peso esperado por raio).
+    """
+    surface = Surface(surface_points)
+    sensors = [create_sensor(conf) for conf in sensor_configs]
+    receivers = np.array([sensor.position for sensor in sensors], dtype=float)
+    return_speed = speed_of_sound * (1 - loss_percentage)
+    model = [[None] * len(sensors) for _ in sensors]
+    for e, sensor in enumerate(sensors):
+        angles = np.deg2rad(sensor.emission_angles())
+        directions = np.column_stack([np.cos(angles), np.sin(angles)])
+        origins = np.broadcast_to(np.asarray(sensor.position, dtype=float), directions.shape)
+        t_hit, index = intersect_rays_segments(origins, directions, surface.seg_a, surface.seg_b)
+        hit = index >= 0
+        directions, t_hit, index = directions[hit], t_hit[hit], index[hit]
+        points = origins[hit] + t_hit[:, None] * directions
+        seg = surface.seg_b[index] - surface.seg_a[index]
+        normal = np.column_stack([seg[:, 1], -seg[:, 0]]) / np.linalg.norm(seg, axis=1, keepdims=True)
+        refl = directions - 2 * np.sum(directions * normal, axis=1, keepdims=True) * normal
+        t_out = t_hit / speed_of_sound
+        for r in range(len(sensors)):
+            w = receivers[r] - points
+            dist = np.linalg.norm(w, axis=1)
+            # Desvio (graus) entre a reflexão ideal e a direção para o recetor, e meia abertura aceite
+            delta = np.degrees(np.arctan2(refl[:, 0] * w[:, 1] - refl[:, 1] * w[:, 0], np.sum(refl * w, axis=1)))
+            alpha = np.degrees(np.arcsin(np.clip(tolerance / np.maximum(dist, 1e-12), 0, 1)))
+            if dispersion_deg > 0:
+                overlap = np.minimum(delta + alpha, dispersion_deg) - np.maximum(delta - alpha, -dispersion_deg)
+                weight = np.clip(overlap, 0, None) / (2 * dispersion_deg)
+            else:
+                weight = (np.abs(delta) < alpha).astype(float)
+            keep = weight > 0
+            model[r][e] = (t_out[keep] + dist[keep] / return_speed, weight[keep])
+    return model
+
+
+def decode(x, n_sensors):
+    """
+    Vetor de parâmetros → (atrasos em s, frequências em Hz). Os atrasos são codificados como
+    fração [0, 1) do período, para que os limites não dependam da frequência.
+    """
+    frequencies = x[n_sensors:]
+    return x[:n_sensors] / frequencies, frequencies
+
+
+def emission_times(delay, frequency, total_time=SIMULATION_TOTAL_TIME, frames=SIMULATION_FRAMES):
+    """
+    Instantes de emissão de um sensor como em Simulation.step: cada pulso sai no primeiro frame com
+    t >= próxima emissão e a seguinte fica marcada para esse instante + período, pelo que o intervalo
+    entre pulsos é arredondado para cima à grelha de frames (dt = total_time / (frames - 1)).
+    Com atraso 0 a simulação emite duas vezes em t = 0 (na criação e no frame 0).
+    """
+    frame_times = (np.arange(frames) / (frames - 1)) * total_time
+    period = 1.0 / frequency
+    pulses = [0.0] if delay == 0.0 else []
+    k = np.searchsorted(frame_times, delay)
+    while k < frames:
+        pulses.append(frame_times[k])
+        k = np.searchsorted(frame_times, frame_times[k] + period)
+    return np.array(pulses)
+
+
+def _nearest_gap(times, others):
+    """
+    Distância de cada instante de `times` ao mais próximo de `others` (ordenado e não vazio).
+    """
+    pos = np.searchsorted(others, times)
+    before = others[np.maximum(pos - 1, 0)]
+    after = others[np.minimum(pos, len(others) - 1)]
+    return np.minimum(np.abs(times - before), np.abs(after - times))
+
+
+def schedule_cost(x, model, total_time=SIMULATION_TOTAL_TIME, guard_ms=SCHEDULE_GUARD_MS, frames=SIMULATION_FRAMES):
+    """
+    Avalia um calendário: devolve (fração de chegadas ambíguas, chegadas ambíguas, chegadas totais),
+    em número esperado de detecções no tempo simulado.
+    """
+    n = len(model)
+    delays, frequencies = decode(np.asarray(x, dtype=float), n)
+    guard = guard_ms / 1000
+    pulses = [emission_times(delays[e], frequencies[e], total_time, frames) for e in range(n)]
+    ambiguous = 0.0
+    total = 0.0
+    for r in range(n):
+        times = [(pulses[e][:, None] + model[r][e][0][None, :]).ravel() for e in range(n)]
+        weights = [np.tile(model[r][e][1], len(pulses[e])) for e in range(n)]
+        for e in range(n):
+            if len(times[e]) == 0:
+                continue
+            total += weights[e].sum()
+            others = np.sort(np.concatenate([times[o] for o in range(n) if o != e]))
+            if len(others) == 0:
+                continue
+            ambiguous += weights[e][_nearest_gap(times[e], others) < guard].sum()
+    return (ambiguous / total if total > 0 else 0.0), ambiguous, total
+
+
+def detected_ambiguity(receivers, emitters, times, guard_ms=SCHEDULE_GUARD_MS):
+    """
+    Fração de detecções ambíguas de uma simulação: detecções com outra, no mesmo recetor e de outro
+    emissor, a menos de guard_ms (times em s). Devolve (fração, detecções ambíguas, detecções).
+    """
+    receivers, emitters, times = np.asarray(receivers), np.asarray(emitters), np.asarray(times, dtype=float)
+    guard = guard_ms / 1000
+    ambiguous = 0
+    for r in np.unique(receivers):
+        at_r = receivers == r
+        for e in np.unique(emitters[at_r]):
+            own = at_r & (emitters == e)
+            others = np.sort(times[at_r & (emitters != e)])
+            if len(others):
+                ambiguous += int(np.count_nonzero(_nearest_gap(times[own], others) < guard))
+    return (ambiguous / len(times) if len(times) else 0.0), ambiguous, len(times)
+
+
+_worker_args = None
+
+
+def _init_worker(model, total_time, guard_ms, frames):
+    global _worker_args
+    _worker_args = (model, total_time, guard_ms, frames)
+
+
+def _evaluate(x):
+    return schedule_cost(x, *_worker_args)[0]
+
+
+def optimize_schedule(sensor_configs=SENSOR_CONFIGS, surface_points=SURFACE_POINTS, target_rate=SCHEDULE_TARGET_RATE_HZ,
+                      max_rate=SCHEDULE_MAX_RATE_HZ, total_time=SIMULATION_TOTAL_TIME, guard_ms=SCHEDULE_GUARD_MS,
+                      population=SCHEDULE_POPULATION, generations=SCHEDULE_GENERATIONS, workers=None, seed=0,
+                      verbose=True, frames=SIMULATION_FRAMES, physics=None):
+    """
+    Evolução diferencial (rand/1/bin) sobre os atrasos (fração do período) e as frequências
+    (entre target_rate e max_rate). O calendário atual de sensor_configs entra na população inicial.
+     - frames, total_time: grelha de frames da simulação em que as emissões são quantizadas.
+     - physics: constantes físicas do cenário (speed_of_sound, loss_percentage, dispersion_deg)
+       usadas no modelo de chegadas; por omissão, as de configs.py.
+    Devolve um dict com as configurações otimizadas e as pontuações inicial e final.
+    """
+    n = len(sensor_configs)
+    model = arrival_model(sensor_configs, surface_points, **(physics or {}))
+    lower = np.concatenate([np.zeros(n), np.full(n, target_rate)])
+    upper = np.concatenate([np.full(n, 1.0 - 1e-9), np.full(n, max_rate)])
+    rng = np.random.default_rng(seed)
+
+    current_freq = np.clip([conf['frequency'] for conf in sensor_configs], target_rate, max_rate)
+    current_frac = np.array([conf['initial_delay'] for conf in sensor_configs]) * current_freq % 1.0
+    initial = np.concatenate([current_frac, current_freq])
+    pop = lower + rng.random((population, 2 * n)) * (upper - lower)
+    pop[0] = initial
+
+    _init_worker(model, total_time, guard_ms, frames)
+    # "spawn": o modelo foi calculado com os kernels Numba, cujas threads não sobrevivem a um fork
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(model, total_time, guard_ms, frames),
+                                   mp_context=multiprocessing.get_context("spawn")) if workers != 1 else None
+    evaluate = (lambda xs: list(executor.map(_evaluate, xs, chunksize=max(len(xs) // 16, 1)))) if executor \
+        else (lambda xs: [_evaluate(x) for x in xs])
+    try:
+        scores = np.array(evaluate(pop))
+        initial_score = scores[0]
+        for generation in range(generations):
+            idx = np.array([rng.choice(np.delete(np.arange(population), i), 3, replace=False)
+                            for i in range(population)])
+            mutant = pop[idx[:, 0]] + SCHEDULE_MUTATION * (pop[idx[:, 1]] - pop[idx[:, 2]])
+            cross = rng.random((population, 2 * n)) < SCHEDULE_CROSSOVER
+            cross[np.arange(population), rng.integers(0, 2 * n, population)] = True
+            trial = np.clip(np.where(cross, mutant, pop), lower, upper)
+            trial_scores = np.array(evaluate(trial))
+            better = trial_scores <= scores
+            pop[better] = trial[better]
+            scores[better] = trial_scores[better]
+            if verbose and (generation % 10 == 0 or generation == generations - 1):
+                print(f"Geração {generation + 1}/{generations}: melhor {scores.min() * 100:.2f}% de chegadas ambíguas")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    best = pop[np.argmin(scores)]
+    delays, frequencies = decode(best, n)
+    configs = [{**conf, 'frequency': round(float(f), 4), 'initial_delay': round(float(d), 6)}
+               for conf, d, f in zip(sensor_configs, delays, frequencies)]
+    rounded = np.concatenate([[c['initial_delay'] * c['frequency'] for c in configs],
+                              [c['frequency'] for c in configs]])
+    final_score, ambiguous, total = schedule_cost(rounded, model, total_time, guard_ms, frames)
+    return {
+        "sensors": configs,
+        "ambiguous_fraction_initial": float(initial_score),
+        "ambiguous_fraction": float(final_score),
+        "ambiguous_expected": float(ambiguous),
+        "arrivals_expected": float(total),
+    }
+
+
+def validate(sensor_configs, surface_points=SURFACE_POINTS, seed=0, frames=SIMULATION_FRAMES,
+             total_time=SIMULATION_TOTAL_TIME, physics=None, guard_ms=SCHEDULE_GUARD_MS):
+    """
+    Corre uma simulação completa (headless) com o calendário, os frames, o tempo total e a física do cenário
+    e devolve as estatísticas de partículas com a fração de detecções ambíguas medida ('ambiguous_fraction',
+    ver detected_ambiguity). O instante de cada detecção é o do frame em que a simulação a regista; a
+    simulação não regista o eco do próprio emissor, que por isso não entra na medida.
+    """
+    from context import SimulationContext
+    from simulation import Simulation
+    sensors = [create_sensor(conf) for conf in sensor_configs]
+    sim = Simulation(surface_points, sensors, frames=frames, verbose=False, total_time=total_time,
+                     context=SimulationContext(**(physics or {}), seed=seed))
+    times = []
+    for frame in range(frames):
+        t_global = sim.step(frame)
+        times.extend([t_global] * (len(sim.detections) - len(times)))
+    stats = sim.particle_statistics()["statistics"]
+    fraction, ambiguous, _ = detected_ambiguity([d['sensor_receptor'] for d in sim.detections],
+                                                [d['sensor_emissor'] for d in sim.detections], times, guard_ms)
+    stats["ambiguous_fraction"] = fraction
+    stats["ambiguous"] = ambiguous
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Otimiza atrasos e frequências de emissão dos sensores.")
+    parser.add_argument("--scenario", default=None, help="cenário JSON (por omissão, configs.py)")
+    parser.add_argument("--target-rate", type=float, default=SCHEDULE_TARGET_RATE_HZ)
+    parser.add_argument("--max-rate", type=float, default=SCHEDULE_MAX_RATE_HZ)
+    parser.add_argument("--guard-ms", type=float, default=SCHEDULE_GUARD_MS)
+    parser.add_argument("--population", type=int, default=SCHEDULE_POPULATION)
+    parser.add_argument("--generations", type=int, default=SCHEDULE_GENERATIONS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="calendario.json", help="ficheiro JSON com o calendário otimizado")
+    parser.add_argument("--validate", action="store_true", help="compara com uma simulação completa")
+    args = parser.parse_args(argv)
+
+    from scenario import DEFAULT_SCENARIO, load_scenario
+    scenario = load_scenario(args.scenario) if args.scenario else DEFAULT_SCENARIO
+    sensor_configs, surface_points = scenario["sensors"], scenario["surface_points"]
+    frames, total_time, physics = scenario["frames"], scenario["total_time"], scenario["physics"]
+
+    result = optimize_schedule(sensor_configs, surface_points, args.target_rate, args.max_rate, total_time,
+                               args.guard_ms, args.population, args.generations, args.workers, args.seed,
+                               frames=frames, physics=physics)
+    print(f"\nChegadas ambíguas (modelo): {result['ambiguous_fraction_initial'] * 100:.2f}% → "
+          f"{result['ambiguous_fraction'] * 100:.2f}%")
+
+    if args.validate:
+        result["validation"] = {}
+        for label, configs in (("atual", sensor_configs), ("otimizado", result["sensors"])):
+            stats = validate(configs, surface_points, args.seed, frames, total_time, physics, args.guard_ms)
+            result["validation"][label] = stats
+            print(f"Simulação ({label}): {stats['total_received']} receções, "
+                  f"{stats['ambiguous_fraction'] * 100:.2f}% ambíguas | "
+                  f"L {stats['left']['percentage']:.2f}% C {stats['center']['percentage']:.2f}% "
+                  f"R {stats['right']['percentage']:.2f}%")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=4, ensure_ascii=False)
+    print(f"Calendário gravado em '{args.output}' (utilizável como cenário). Para configs.py:\n")
+    print("SENSOR_CONFIGS = " + pprint.pformat(result["sensors"], sort_dicts=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
 # sensor.py
 import numpy as np
-import matplotlib.patches as patches
+from motion import as_motion
 
 class Sensor:
     def __init__(self, sensor_id, position, rotation_deg, width=0.6, height=0.3,
                  emission_range_deg=(60, 120), emission_step_deg=5, frequency=1.0, color='blue',
-                 initial_delay=0.0):
+                 initial_delay=0.0, adaptive_emission=False, min_emission_step_deg=0.5,
+                 refine_reflection_deg=10.0, motion=None):
         """
         Parâmetros:
          - sensor_id: identificador do sensor.
@@ -16,6 +17,12 @@ class Sensor:
          - frequency: frequência de emissão em Hz (número de emissões por segundo).
          - color: cor dos raios emitidos.
          - initial_delay: atraso inicial (em segundos) para a primeira emissão.
+         - adaptive_emission: começa com emission_step_deg e subdivide onde raios vizinhos divergem
+           (os raios subdivididos contam menos nas estatísticas de partículas, ver emission_weights).
+         - min_emission_step_deg: passo angular mínimo da subdivisão adaptativa.
+         - refine_reflection_deg: diferença de direção de reflexão que obriga a subdividir.
+         - motion: movimento do sensor (keyframes [(t, [x, y]), ...], função t -> [x, y] ou Motion);
+           None para um sensor fixo em position. Ver motion.py.
         """
         self.sensor_id = sensor_id
         self.position = np.array(position)
@@ -27,21 +34,130 @@ class Sensor:
         self.emission_range_deg = emission_range_deg
         self.emission_step_deg = emission_step_deg
         self.initial_delay = initial_delay  # novo parâmetro
+        self.adaptive_emission = adaptive_emission
+        self.min_emission_step_deg = min_emission_step_deg
+        self.refine_reflection_deg = refine_reflection_deg
+        self.motion = as_motion(motion)
 
-    def emit_rays(self):
+    def position_at(self, t):
+        """
+        Posição do sensor no instante t (segundos) da simulação.
+        """
+        if self.motion is None:
+            return self.position
+        return self.motion.at(t)
+
+    def emission_angles(self):
+        """
+        Ângulos de emissão com passo fixo (emission_step_deg).
+        """
+        min_angle = self.rotation_deg - (self.emission_range_deg[1] - self.emission_range_deg[0]) / 2.0
+        max_angle = self.rotation_deg + (self.emission_range_deg[1] - self.emission_range_deg[0]) / 2.0
+        return np.arange(min_angle, max_angle + self.emission_step_deg, self.emission_step_deg)
+
+    def _probe(self, surface, angle):
+        """
+        Traça um raio sem dispersão: devolve (índice do segmento, ponto de colisão, direção refletida ideal)
+        ou (None, None, None) se não houver colisão.
+        """
+        rad = np.deg2rad(angle)
+        direction = np.array([np.cos(rad), np.sin(rad)])
+        result = surface.ray_intersection_index(self.position, direction)
+        if result is None:
+            return None, None, None
+        _, point, index = result
+        A, B = surface.segments[index]
+        seg_vec = B - A
+        normal = np.array([seg_vec[1], -seg_vec[0]]) / np.linalg.norm(seg_vec)
+        refl = direction - 2 * np.dot(direction, normal) * normal
+        return index, point, refl
+
+    def _needs_refinement(self, probe_a, probe_b, receivers):
+        """
+        Critérios de subdivisão entre dois raios vizinhos:
+         - atingem segmentos diferentes (ou só um deles colide);
+         - as direções refletidas diferem mais do que refine_reflection_deg;
+         - as duas trajetórias de retorno ficam de lados opostos de um sensor recetor.
+        """
+        seg_a, point_a, refl_a = probe_a
+        seg_b, point_b, refl_b = probe_b
+        if seg_a != seg_b:
+            return True
+        if seg_a is None:
+            return False
+        cos_angle = np.clip(np.dot(refl_a, refl_b), -1.0, 1.0)
+        if np.degrees(np.arccos(cos_angle)) > self.refine_reflection_deg:
+            return True
+        for receiver in receivers:
+            to_a = receiver.position - point_a
+            to_b = receiver.position - point_b
+            if np.dot(refl_a, to_a) <= 0 and np.dot(refl_b, to_b) <= 0:
+                continue
+            side_a = refl_a[0] * to_a[1] - refl_a[1] * to_a[0]
+            side_b = refl_b[0] * to_b[1] - refl_b[1] * to_b[0]
+            if side_a * side_b < 0:
+                return True
+        return False
+
+    def adaptive_emission_angles(self, surface, receivers):
+        """
+        Ângulos de emissão adaptativos: começa com o passo emission_step_deg e subdivide
+        recursivamente os intervalos entre raios vizinhos que precisam de refinamento,
+        até min_emission_step_deg.
+        """
+        receivers = [r for r in receivers if r.sensor_id != self.sensor_id]
+        coarse = self.emission_angles()
+        probes = {angle: self._probe(surface, angle) for angle in coarse}
+        stack = list(zip(coarse[:-1], coarse[1:]))
+        while stack:
+            a, b = stack.pop()
+            # Só subdivide se as duas metades ainda respeitarem o passo mínimo
+            if (b - a) / 2 < self.min_emission_step_deg or \
+                    not self._needs_refinement(probes[a], probes[b], receivers):
+                continue
+            mid = (a + b) / 2.0
+            probes[mid] = self._probe(surface, mid)
+            stack.append((a, mid))
+            stack.append((mid, b))
+        return np.array(sorted(probes))
+
+    def emission_weights(self, angles):
+        """
+        Peso de cada raio de um leque (ângulos ordenados) nas contagens de partículas: a largura angular
+        que representa (metade dos intervalos até aos vizinhos; nas pontas, mais meio passo base)
+        dividida por emission_step_deg. Com passo fixo todos os pesos são 1; a subdivisão adaptativa
+        mantém a soma, pelo que as contagens são comparáveis com as de uma emissão de passo fixo.
+        """
+        angles = np.asarray(angles, dtype=float)
+        if len(angles) < 2:
+            return np.ones(len(angles))
+        gaps = np.diff(angles)
+        half = self.emission_step_deg / 2.0
+        left = np.concatenate([[half], gaps / 2])
+        right = np.concatenate([gaps / 2, [half]])
+        return (left + right) / self.emission_step_deg
+
+    def emit_rays(self, verbose=True, context=None, surface=None, receivers=()):
         """
         Emite um pulso de raios a partir do centro do sensor.
+         - context: SimulationContext partilhado pelos raios da mesma execução.
+         - surface, receivers: usados pela emissão adaptativa (adaptive_emission=True).
         """
         try:
-            min_angle = self.rotation_deg - (self.emission_range_deg[1] - self.emission_range_deg[0]) / 2.0
-            max_angle = self.rotation_deg + (self.emission_range_deg[1] - self.emission_range_deg[0]) / 2.0
-            angles = np.arange(min_angle, max_angle + self.emission_step_deg, self.emission_step_deg)
+            if self.adaptive_emission and surface is not None:
+                angles = self.adaptive_emission_angles(surface, receivers)
+                weights = self.emission_weights(angles)
+            else:
+                angles = self.emission_angles()
+                weights = np.ones(len(angles))
             from ray import Ray  # Importação local para evitar dependência circular
             rays = []
-            for angle in angles:
-                ray = Ray(self.position, angle, sensor_id=self.sensor_id, color=self.color)
+            for angle, weight in zip(angles, weights):
+                ray = Ray(self.position, angle, sensor_id=self.sensor_id, color=self.color, context=context,
+                          weight=weight)
                 rays.append(ray)
-            print(f"Sensor {self.sensor_id}: Emitted {len(rays)} rays.")
+            if verbose:
+                print(f"Sensor {self.sensor_id}: Emitted {len(rays)} rays.")
             return rays
         except Exception as e:
             print(f"Error during ray emission for Sensor {self.sensor_id}: {e}")
@@ -59,9 +175,11 @@ class Sensor:
         """
         Desenha o sensor como um retângulo e exibe seu ID.
         """
+        import matplotlib.patches as patches  # importação tardia: só necessária para visualização
         sensor_rect = patches.Rectangle((self.position[0] - self.width/2, self.position[1] - self.height/2),
                                         self.width, self.height,
                                         linewidth=1, edgecolor=self.color, facecolor='none')
         ax.add_patch(sensor_rect)
-        ax.text(self.position[0], self.position[1], f"Sensor {self.sensor_id}", color=self.color,
-                fontsize=10, ha='center', va='center')
+        label = ax.text(self.position[0], self.position[1], f"Sensor {self.sensor_id}", color=self.color,
+                        fontsize=10, ha='center', va='center')
+        return sensor_rect, label
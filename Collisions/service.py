@@ -0,0 +1,353 @@
+# service.py
+"""
+Serviço asyncio de ingestão de eventos de eco em tempo real.
+
+Protocolo (TCP, uma mensagem JSON por linha):
+  - evento:   {"sensor_receptor": 1, "sensor_emissor": 0, "emissor_coords": [-2, 0], "angulo": 80.0, "tempo_ms": 333.05}
+  - consulta: {"type": "query"}  →  resposta com as estimativas atuais (uma linha JSON)
+Também aceita eventos por UDP (um evento JSON por datagrama, sem resposta).
+
+Exemplos:
+  python service.py serve --port 8765 --scenario cenario.json
+  python service.py replay resultados.json --port 8765 --rate 200
+"""
+import json
+import asyncio
+import argparse
+from collections import deque
+import numpy as np
+from stats import StatsContext
+from scenario import load_scenario
+from inverse import reconstruct_surface, surface_distance, surface_inclination
+
+# Parâmetros do serviço
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+QUEUE_MAX_EVENTS = 10000    # tamanho máximo da fila (backpressure)
+BATCH_MAX_EVENTS = 256      # tamanho máximo de um micro-lote
+BATCH_MAX_DELAY = 0.05      # tempo máximo de espera para completar um lote (s)
+RECENT_WINDOW = 2000        # eventos recentes usados na reconstrução da superfície
+
+
+class RunningPairStats:
+    def __init__(self):
+        """
+        Estatísticas incrementais por par (receptor, emissor, coords): contagem, média, variância (M2),
+        mínimo e máximo do tempo de eco. Os lotes são combinados com a fórmula paralela de Chan/Welford.
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def update(self, tempos):
+        n_b = len(tempos)
+        if n_b == 0:
+            return
+        mean_b = float(np.mean(tempos))
+        m2_b = float(np.sum((tempos - mean_b) ** 2))
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta ** 2 * n_a * n_b / n
+        self.count = n
+        self.min = min(self.min, float(np.min(tempos)))
+        self.max = max(self.max, float(np.max(tempos)))
+
+    def as_dict(self, speed_of_sound):
+        std = np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        return {
+            "leituras": self.count,
+            "tempo_medio_ms": self.mean,
+            "tempo_desvio_ms": float(std),
+            "tempo_min_ms": self.min,
+            "tempo_max_ms": self.max,
+            "distancia_m": (self.mean / 1000) * speed_of_sound / 2,
+        }
+
+
+class EchoIngestionService:
+    def __init__(self, host=SERVICE_HOST, port=SERVICE_PORT, udp_port=None, queue_size=QUEUE_MAX_EVENTS,
+                 batch_size=BATCH_MAX_EVENTS, batch_delay=BATCH_MAX_DELAY, window=RECENT_WINDOW,
+                 contexto=None, sensor_positions=None):
+        """
+        Serviço de ingestão:
+         - fila limitada (queue_size): os clientes TCP esperam quando está cheia (backpressure);
+           os datagramas UDP são descartados e contabilizados.
+         - micro-lotes de até batch_size eventos ou batch_delay segundos.
+         - window: nº de eventos recentes guardados para a reconstrução da superfície.
+         - contexto: StatsContext com a física da simulação que gera os eventos (ver StatsContext.from_physics).
+        """
+        self.host = host
+        self.port = port
+        self.udp_port = udp_port
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.contexto = contexto if contexto is not None else StatsContext()
+        self.sensor_positions = sensor_positions
+        self.pairs = {}
+        self.recent = deque(maxlen=window)
+        self.received = 0
+        self.enqueued = 0   # eventos colocados na fila
+        self.completed = 0  # eventos retirados da fila e tratados (com ou sem erro)
+        self.processed = 0
+        self.dropped = 0
+        self.invalid = 0
+        self._server = None
+        self._udp_transport = None
+        self._batcher = None
+        self._progress = asyncio.Condition()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        if self.udp_port is not None:
+            loop = asyncio.get_running_loop()
+            self._udp_transport, _ = await loop.create_datagram_endpoint(
+                lambda: _UDPProtocol(self), local_addr=(self.host, self.udp_port))
+        self._batcher = asyncio.create_task(self._batch_loop())
+        print(f"Serviço de ingestão em {self.host}:{self.port}"
+              + (f" (UDP {self.udp_port})" if self.udp_port is not None else ""))
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._udp_transport is not None:
+            self._udp_transport.close()
+        await self.queue.join()
+        if self._batcher is not None:
+            self._batcher.cancel()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def _decode(self, data):
+        """
+        Mensagem JSON recebida (um objeto); qualquer outro conteúdo conta como inválido e devolve None.
+        """
+        try:
+            message = json.loads(data)
+        except ValueError:  # inclui JSONDecodeError e bytes que não são UTF-8
+            self.invalid += 1
+            return None
+        if not isinstance(message, dict):
+            self.invalid += 1
+            return None
+        return message
+
+    def _parse_event(self, message):
+        try:
+            return (int(message["sensor_receptor"]), int(message["sensor_emissor"]),
+                    tuple(message["emissor_coords"]), float(message["angulo"]), float(message["tempo_ms"]))
+        except (KeyError, TypeError, ValueError):
+            self.invalid += 1
+            return None
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Linha maior do que o limite do StreamReader: é descartada e conta como inválida
+                    self.invalid += 1
+                    continue
+                if not line:
+                    break
+                message = self._decode(line)
+                if message is None:
+                    continue
+                if message.get("type") == "query":
+                    # Responde depois de processar o que já estava na fila, sem esperar pelos eventos
+                    # que outros clientes continuam a enviar entretanto
+                    await self._wait_completed(self.enqueued)
+                    writer.write((json.dumps(await self.query()) + "\n").encode("utf-8"))
+                    await writer.drain()
+                    continue
+                event = self._parse_event(message)
+                if event is not None:
+                    self.received += 1
+                    await self.queue.put(event)  # bloqueia o cliente quando a fila está cheia
+                    self.enqueued += 1
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def submit_nowait(self, message):
+        """
+        Entrada sem espera (UDP): descarta o evento se a fila estiver cheia.
+        """
+        event = self._parse_event(message)
+        if event is None:
+            return
+        self.received += 1
+        try:
+            self.queue.put_nowait(event)
+            self.enqueued += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _wait_completed(self, count):
+        """
+        Espera até que os primeiros `count` eventos colocados na fila tenham sido tratados.
+        """
+        async with self._progress:
+            await self._progress.wait_for(lambda: self.completed >= count)
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                self._process_batch(batch)
+            except Exception as e:
+                print(f"Erro ao processar lote de {len(batch)} eventos: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+                self.completed += len(batch)
+                async with self._progress:
+                    self._progress.notify_all()
+
+    def _process_batch(self, batch):
+        """
+        Converte o lote em arrays e atualiza as estatísticas de cada par com uma operação por par.
+        """
+        keys = [(receptor, emissor, coords) for receptor, emissor, coords, _, _ in batch]
+        tempos = np.array([event[4] for event in batch])
+        unique = {}
+        for i, key in enumerate(keys):
+            unique.setdefault(key, []).append(i)
+        for key, idx in unique.items():
+            self.pairs.setdefault(key, RunningPairStats()).update(tempos[idx])
+        self.recent.extend(batch)
+        self.processed += len(batch)
+
+    def _estimate_surface(self, events):
+        results = [{"sensor_receptor": r, "sensor_emissor": e, "emissor_coords": list(c), "angulo": a, "tempo_ms": t}
+                   for r, e, c, a, t in events]
+        ajuste = reconstruct_surface(results, self.sensor_positions, workers=1,
+                                     speed_of_sound=self.contexto.speed_of_sound,
+                                     loss_percentage=self.contexto.loss_percentage)
+        return {
+            "distancia_m": surface_distance(ajuste["vertices"]),
+            "inclinacao_graus": surface_inclination(ajuste["vertices"]),
+            "residuo_rms_ms": ajuste["rms_ms"],
+        }
+
+    async def query(self):
+        """
+        Estimativas atuais: estatísticas por par e distância/inclinação da superfície
+        (a reconstrução corre num executor para não bloquear o loop).
+        """
+        pares = {f"R{r}_E{e}_{c}": stats.as_dict(self.contexto.speed_of_sound)
+                 for (r, e, c), stats in self.pairs.items()}
+        superficie = None
+        if self.recent:
+            loop = asyncio.get_running_loop()
+            try:
+                superficie = await loop.run_in_executor(None, self._estimate_surface, list(self.recent))
+            except Exception as e:
+                superficie = {"erro": str(e)}
+        return {
+            "recebidos": self.received,
+            "processados": self.processed,
+            "descartados": self.dropped,
+            "invalidos": self.invalid,
+            "pares": pares,
+            "superficie": superficie,
+        }
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, service):
+        self.service = service
+
+    def datagram_received(self, data, addr):
+        message = self.service._decode(data)
+        if message is not None:
+            self.service.submit_nowait(message)
+
+
+async def replay(filename="resultados.json", host=SERVICE_HOST, port=SERVICE_PORT, rate=100.0, repeat=1):
+    """
+    Cliente de teste: envia as detecções de um 'resultados.json' ao serviço a `rate` eventos/s
+    (rate <= 0 envia o mais rápido possível) e devolve a resposta a uma consulta final.
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        results = json.load(f)
+    reader, writer = await asyncio.open_connection(host, port)
+    interval = 1.0 / rate if rate > 0 else 0.0
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    sent = 0
+    for _ in range(repeat):
+        for event in results:
+            writer.write((json.dumps(event) + "\n").encode("utf-8"))
+            sent += 1
+            await writer.drain()
+            if interval:
+                delay = start + sent * interval - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+    writer.write((json.dumps({"type": "query"}) + "\n").encode("utf-8"))
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    writer.close()
+    await writer.wait_closed()
+    print(f"{sent} eventos enviados em {loop.time() - start:.2f}s")
+    return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço de ingestão de ecos em tempo real.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="inicia o serviço")
+    serve_parser.add_argument("--host", default=SERVICE_HOST)
+    serve_parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    serve_parser.add_argument("--udp-port", type=int, default=None)
+    serve_parser.add_argument("--queue-size", type=int, default=QUEUE_MAX_EVENTS)
+    serve_parser.add_argument("--scenario", default=None,
+                              help="cenário JSON de onde vêm a física e as posições dos sensores")
+    replay_parser = subparsers.add_parser("replay", help="reenvia um resultados.json ao serviço")
+    replay_parser.add_argument("filename", nargs="?", default="resultados.json")
+    replay_parser.add_argument("--host", default=SERVICE_HOST)
+    replay_parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    replay_parser.add_argument("--rate", type=float, default=100.0, help="eventos por segundo (<= 0: sem limite)")
+    replay_parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        contexto, sensor_positions = None, None
+        if args.scenario:
+            scenario = load_scenario(args.scenario)
+            contexto = StatsContext.from_physics(scenario["physics"])
+            sensor_positions = {conf["sensor_id"]: conf["position"] for conf in scenario["sensors"]}
+        service = EchoIngestionService(args.host, args.port, args.udp_port, args.queue_size,
+                                       contexto=contexto, sensor_positions=sensor_positions)
+        try:
+            asyncio.run(service.serve_forever())
+        except KeyboardInterrupt:
+            pass
+    else:
+        response = asyncio.run(replay(args.filename, args.host, args.port, args.rate, args.repeat))
+        print(json.dumps(response, indent=4, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# shard.py
+"""
+Execução de um único cenário repartida por vários processos (shards).
+
+Os pulsos de emissão são independentes entre si: o shard k de n emite apenas os pulsos cujo número
+de ordem global é k (mod n), com o mesmo calendário de emissões da execução completa, e cada shard
+tem o seu próprio gerador aleatório (semente derivada da semente do cenário com np.random.SeedSequence).
+Os vértices da superfície seguem com cada tarefa: são poucos e cada Simulation copia-os para a sua
+Surface (que os substitui a cada passo quando a superfície se move), pelo que não há memória partilhada.
+
+A junção ordena as detecções por (frame, pulso), a ordem de uma execução num só processo, e soma as
+contagens de emissão e as matrizes de crosstalk; o resultado tem o esquema de 'resultados.json' e
+'nrparticulas.json'. Sem dispersão aleatória, o resultado é idêntico ao de uma execução sem shards.
+"""
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from context import SimulationContext
+from kernels import init_threads
+from simulation import Simulation, particle_stats_from_counts, summarize_particle_stats
+from configs import SIMULATION_FRAMES, SIMULATION_TOTAL_TIME, SHARD_WORKERS
+
+def shard_seed(seed, index):
+    """
+    Semente independente do shard `index` (None se a execução não tiver semente).
+    """
+    if seed is None:
+        return None
+    return int(np.random.SeedSequence(seed, spawn_key=(index,)).generate_state(1)[0])
+
+
+def _init_worker():
+    """
+    Limita os kernels Numba a uma thread em cada worker, já que o paralelismo é feito pelos processos.
+    """
+    init_threads(1)
+
+
+def _run_shard(args):
+    """
+    Corre um shard e devolve as detecções, as chaves (frame, pulso), as contagens
+    e as posições finais dos sensores (que podem ter-se movido).
+    """
+    index, count, surface_points, sensors, frames, total_time, physics, seed, surface_motion = args
+    context = SimulationContext(**physics, seed=shard_seed(seed, index))
+    sim = Simulation(surface_points, sensors, frames=frames, verbose=False, context=context, total_time=total_time,
+                     checkpoint_dir=None, record_dir=None, surface_motion=surface_motion, shard=(index, count))
+    sim.run()
+    return sim.detections, sim.detection_keys, sim.emitted, sim.crosstalk, [sensor.position for sensor in sim.sensors]
+
+
+def merge_shards(sensors, results):
+    """
+    Junta os resultados dos shards: detecções pela ordem (frame, pulso) e estatísticas de partículas somadas.
+    Devolve (detecções, estatísticas no formato de 'nrparticulas.json').
+    """
+    detections, keys = [], []
+    emitted = np.zeros(len(sensors))
+    crosstalk = np.zeros((len(sensors), len(sensors)))
+    positions = None
+    for shard_detections, shard_keys, shard_emitted, shard_crosstalk, positions in results:
+        detections.extend(shard_detections)
+        keys.extend(shard_keys)
+        emitted += shard_emitted
+        crosstalk += shard_crosstalk
+    # Ordenação estável: dentro do mesmo pulso mantém-se a ordem do shard (raio, receptor)
+    order = sorted(range(len(detections)), key=lambda i: keys[i])
+    particle_stats = particle_stats_from_counts(sensors, emitted, crosstalk, positions)
+    return [detections[i] for i in order], summarize_particle_stats(particle_stats)
+
+
+def run_sharded(surface_points, sensors, frames=SIMULATION_FRAMES, total_time=SIMULATION_TOTAL_TIME, context=None,
+                shards=None, workers=SHARD_WORKERS, surface_motion=None):
+    """
+    Executa a simulação repartida em `shards` processos (por omissão, um por worker) e devolve
+    (detecções, estatísticas de partículas), como Simulation.detections e Simulation.particle_statistics().
+     - context: SimulationContext de onde vêm as constantes físicas e a semente (não é alterado).
+     - workers: número de processos (None = número de CPUs); com 1 os shards correm neste processo.
+    """
+    context = context if context is not None else SimulationContext()
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers
+    physics = {"speed_of_sound": context.speed_of_sound, "loss_percentage": context.loss_percentage,
+               "dispersion_deg": context.dispersion_deg}
+    points = np.asarray(surface_points, dtype=np.float64)
+    jobs = [(index, shards, points, sensors, frames, total_time, physics, context.seed, surface_motion)
+            for index in range(shards)]
+    if workers == 1:
+        return merge_shards(sensors, [_run_shard(job) for job in jobs])
+
+    # "spawn": os kernels Numba podem já ter threads ativas neste processo, que não sobrevivem a um fork
+    with ProcessPoolExecutor(max_workers=min(workers, shards), initializer=_init_worker,
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        results = list(executor.map(_run_shard, jobs))
+    return merge_shards(sensors, results)
@@ -1,110 +1,191 @@
 # simulation.py
 import json
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 import numpy as np
-from surface import Surface
+from surface import Surface, rays_hit_boxes
 from sensor import Sensor
 from ray import Ray
+from context import SimulationContext
+from kernels import positions_at_time
+from detection_store import DetectionStore
+from spatial_hash import ReceiverGrid
+from checkpoint import CheckpointWriter, CheckpointError, restore
+from trajectory import TrajectoryRecorder
 from configs import SIMULATION_FRAMES, SIMULATION_TOTAL_TIME, PLOT_X_LIMITS, PLOT_Y_LIMITS
+from configs import CHECKPOINT_DIR, CHECKPOINT_INTERVAL_FRAMES, RECORD_DIR
+
+def _count(value):
+    """
+    Contagem ponderada para JSON: inteiro quando os pesos dos raios são todos 1 (emissão de passo fixo).
+    """
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 6)
+
+
+def particle_stats_from_counts(sensors, emitted, crosstalk, positions=None):
+    """
+    Estatísticas por sensor no formato de 'nrparticulas.json' a partir das partículas emitidas por sensor
+    e da matriz de crosstalk (emissor × receptor), pela ordem da lista de sensores.
+    As contagens são somas dos pesos dos raios (Ray.weight): com emissão adaptativa, os raios de uma
+    subdivisão contam a fração do passo base que representam.
+     - positions: coordenadas a registar por sensor (por omissão, a posição atual de cada sensor).
+    """
+    ids = [sensor.sensor_id for sensor in sensors]
+    positions = [sensor.position for sensor in sensors] if positions is None else positions
+    return {
+        sensor.sensor_id: {
+            "emitted": _count(emitted[j]),
+            "received": {emitter_id: _count(crosstalk[i, j]) for i, emitter_id in enumerate(ids)},
+            "coordinates": {"x": positions[j][0], "y": positions[j][1]},
+        }
+        for j, sensor in enumerate(sensors)
+    }
+
+
+def summarize_particle_stats(particle_stats):
+    """
+    Acrescenta às estatísticas por sensor o total recebido e a divisão esquerda/centro/direita
+    e converte tudo para tipos nativos (conteúdo de 'nrparticulas.json').
+    """
+    # Calculate statistics for particles received
+    total_received = sum(
+        sum(stats["received"].values()) for stats in particle_stats.values()
+    )
+    left_received = sum(
+        sum(stats["received"].values())
+        for sensor_id, stats in particle_stats.items()
+        if stats["coordinates"]["x"] < 0
+    )
+    center_received = sum(
+        sum(stats["received"].values())
+        for sensor_id, stats in particle_stats.items()
+        if stats["coordinates"]["x"] == 0
+    )
+    right_received = sum(
+        sum(stats["received"].values())
+        for sensor_id, stats in particle_stats.items()
+        if stats["coordinates"]["x"] > 0
+    )
+
+    # Calculate percentages
+    left_percentage = (left_received / total_received) * 100 if total_received > 0 else 0
+    center_percentage = (center_received / total_received) * 100 if total_received > 0 else 0
+    right_percentage = (right_received / total_received) * 100 if total_received > 0 else 0
+
+    # Add statistics to the JSON data
+    stats_summary = {
+        "statistics": {
+            "total_received": total_received,
+            "left": {"count": left_received, "percentage": round(left_percentage, 2)},
+            "center": {"count": center_received, "percentage": round(center_percentage, 2)},
+            "right": {"count": right_received, "percentage": round(right_percentage, 2)}
+        }
+    }
+
+    # Combine particle stats and statistics summary
+    combined_data = {**particle_stats, **stats_summary}
+
+    # Convert all values to native Python types
+    return json.loads(json.dumps(combined_data, default=lambda x: x.item() if hasattr(x, 'item') else x))
+
 
 class Simulation:
-    def __init__(self, surface_points, sensors, frames=SIMULATION_FRAMES):
+    def __init__(self, surface_points, sensors, frames=SIMULATION_FRAMES, verbose=True, context=None,
+                 total_time=SIMULATION_TOTAL_TIME, checkpoint_dir=CHECKPOINT_DIR,
+                 checkpoint_every=CHECKPOINT_INTERVAL_FRAMES, record_dir=RECORD_DIR, surface_motion=None,
+                 shard=None):
         """
         Inicializa a simulação com:
          - surface_points: pontos que definem a superfície.
          - sensors: lista de objetos Sensor.
          - frames: número de frames para a animação.
+         - verbose: imprime o progresso de cada frame.
+         - context: SimulationContext com o estado e os parâmetros físicos desta execução.
+         - total_time: tempo total simulado (segundos).
+         - checkpoint_dir: diretório dos checkpoints (None desativa); ver checkpoint.py.
+         - checkpoint_every: intervalo, em frames, entre checkpoints.
+         - record_dir: diretório onde gravar a trajetória para replay (None desativa); ver trajectory.py.
+         - surface_motion: movimento dos vértices da superfície (ver motion.py); os sensores
+           podem ter o seu próprio movimento (Sensor(motion=...)).
+         - shard: (índice, número de shards) para emitir apenas os pulsos cujo número de ordem
+           (contando os de todos os shards) é congruente com o índice; ver shard.py.
         """
         try:
-            self.surface = Surface(surface_points)
+            self.context = context if context is not None else SimulationContext()
+            self.surface = Surface(surface_points, motion=surface_motion)
             self.sensors = sensors
+
+            # Sensores e superfície móveis: pose no instante motion_time e velocidade dos sensores no último passo
+            self.has_motion = self.surface.motion is not None or any(sensor.motion is not None for sensor in sensors)
+            self.sensor_velocity = np.zeros((len(sensors), 2))
+            self.motion_time = 0.0
+            if self.has_motion:
+                self._set_pose(0.0)
             self.detections = []  # Armazena os eventos de detecção
+            self.detection_store = DetectionStore()  # Mesmas detecções em colunas indexadas
 
             # Lista de grupos de emissão; cada grupo é um dict com:
             # { 'sensor_id': ..., 'rays': [...], 'markers': [...], 'emission_time': ... }
             self.emission_groups = []
 
-            # Estatísticas de partículas emitidas e recebidas
-            self.particle_stats = {sensor.sensor_id: {"emitted": 0, "received": {}} for sensor in sensors}
-            for sensor in sensors:
-                self.particle_stats[sensor.sensor_id]["received"] = {s.sensor_id: 0 for s in sensors}
+            # Estatísticas de partículas emitidas e recebidas: contagens por sensor e
+            # matriz densa de crosstalk (emissor × receptor), pela ordem da lista de sensores,
+            # somando os pesos dos raios (ver Sensor.emission_weights)
+            self.sensor_index = {sensor.sensor_id: i for i, sensor in enumerate(sensors)}
+            self.emitted = np.zeros(len(sensors))
+            self.crosstalk = np.zeros((len(sensors), len(sensors)))
+
+            # Receptores indexados numa grelha uniforme com células do tamanho da tolerância
+            self.detection_tolerance = 1.0  # tolerância para detecção (em metros)
+            self.receiver_grid = ReceiverGrid([sensor.position for sensor in sensors], self.detection_tolerance)
 
             # Define o tempo da próxima emissão para cada sensor com base no initial_delay
             self.sensor_next_emission_time = {sensor.sensor_id: sensor.initial_delay for sensor in self.sensors}
 
+            self.verbose = verbose
+
+            # Pulsos numerados pela ordem de emissão; com shard, cada processo emite apenas os seus
+            # e regista (frame, pulso) de cada detecção para a junção dos resultados
+            self.shard = shard
+            self.pulse_count = 0
+            self.detection_keys = []
+
             # Se o initial_delay for 0, emite logo no início (t = 0)
             for sensor in self.sensors:
                 if sensor.initial_delay == 0.0:
-                    rays = sensor.emit_rays()
-                    self.particle_stats[sensor.sensor_id]["emitted"] += len(rays)
-                    for ray in rays:
-                        ray.propagate(self.surface)
-                        for other_sensor in self.sensors:
-                            if other_sensor.sensor_id != sensor.sensor_id and ray.detected_by:
-                                self.particle_stats[other_sensor.sensor_id]["received"][sensor.sensor_id] += 1
-                    self.emission_groups.append({
-                        'sensor_id': sensor.sensor_id,
-                        'rays': rays,
-                        'markers': [],  # os marcadores serão criados no plot inicial
-                        'emission_time': 0.0
-                    })
-
-            self.total_time = SIMULATION_TOTAL_TIME  # tempo total da simulação (em segundos)
+                    pulse, owned = self._take_pulse()
+                    if owned:
+                        self._emit(sensor, 0.0, pulse)
+
+            self.total_time = total_time  # tempo total da simulação (em segundos)
             self.frames = frames
-            self.detection_tolerance = 1.0  # tolerância para detecção (em metros)
+            self.start_frame = 0
+            self.checkpoint_dir = checkpoint_dir
+            self.checkpoint_every = checkpoint_every
+            self.checkpointer = None
+            self.record_dir = record_dir
+            self.recorder = None
         except Exception as e:
             print(f"Error during initialization: {e}")
 
+    @property
+    def particle_stats(self):
+        """
+        Estatísticas por sensor no formato de 'nrparticulas.json', construídas a partir da matriz de crosstalk:
+        particle_stats[receptor]["received"][emissor] = crosstalk[emissor, receptor].
+        """
+        return particle_stats_from_counts(self.sensors, self.emitted, self.crosstalk)
+
+    def particle_statistics(self):
+        """
+        Calcula as estatísticas de partículas recebidas (total e divisão esquerda/centro/direita)
+        e devolve os dados combinados no formato de 'nrparticulas.json'.
+        """
+        return summarize_particle_stats(self.particle_stats)
+
     def save_particle_stats(self, filename="nrparticulas.json"):
         try:
-            # Add sensor coordinates to the particle stats
-            for sensor in self.sensors:
-                self.particle_stats[sensor.sensor_id]["coordinates"] = {
-                    "x": sensor.position[0],
-                    "y": sensor.position[1]
-                }
-
-            # Calculate statistics for particles received
-            total_received = sum(
-                sum(stats["received"].values()) for stats in self.particle_stats.values()
-            )
-            left_received = sum(
-                sum(stats["received"].values())
-                for sensor_id, stats in self.particle_stats.items()
-                if stats["coordinates"]["x"] < 0
-            )
-            center_received = sum(
-                sum(stats["received"].values())
-                for sensor_id, stats in self.particle_stats.items()
-                if stats["coordinates"]["x"] == 0
-            )
-            right_received = sum(
-                sum(stats["received"].values())
-                for sensor_id, stats in self.particle_stats.items()
-                if stats["coordinates"]["x"] > 0
-            )
-
-            # Calculate percentages
-            left_percentage = (left_received / total_received) * 100 if total_received > 0 else 0
-            center_percentage = (center_received / total_received) * 100 if total_received > 0 else 0
-            right_percentage = (right_received / total_received) * 100 if total_received > 0 else 0
-
-            # Add statistics to the JSON data
-            stats_summary = {
-                "statistics": {
-                    "total_received": total_received,
-                    "left": {"count": left_received, "percentage": round(left_percentage, 2)},
-                    "center": {"count": center_received, "percentage": round(center_percentage, 2)},
-                    "right": {"count": right_received, "percentage": round(right_percentage, 2)}
-                }
-            }
-
-            # Combine particle stats and statistics summary
-            combined_data = {**self.particle_stats, **stats_summary}
-
-            # Convert all values to native Python types
-            combined_data_native = json.loads(json.dumps(combined_data, default=lambda x: x.item() if hasattr(x, 'item') else x))
+            combined_data_native = self.particle_statistics()
+            summary = combined_data_native["statistics"]
 
             # Save the combined data to JSON
             with open(filename, "w") as file:
@@ -112,14 +193,407 @@ class Simulation:
 
             # Print the statistics
             print("\n--- Particle Reception Statistics ---")
-            print(f"Total particles received: {total_received}")
-            print(f"Left (x < 0): {left_received} ({left_percentage:.2f}%)")
-            print(f"Center (x = 0): {center_received} ({center_percentage:.2f}%)")
-            print(f"Right (x > 0): {right_received} ({right_percentage:.2f}%)")
+            print(f"Total particles received: {summary['total_received']}")
+            print(f"Left (x < 0): {summary['left']['count']} ({summary['left']['percentage']:.2f}%)")
+            print(f"Center (x = 0): {summary['center']['count']} ({summary['center']['percentage']:.2f}%)")
+            print(f"Right (x > 0): {summary['right']['count']} ({summary['right']['percentage']:.2f}%)")
         except Exception as e:
             print(f"Error saving particle stats: {e}")
 
+    def _take_pulse(self):
+        """
+        Número de ordem do próximo pulso e se este shard o emite (sempre, sem shards).
+        """
+        pulse = self.pulse_count
+        self.pulse_count += 1
+        return pulse, self.shard is None or pulse % self.shard[1] == self.shard[0]
+
+    def _emit(self, sensor, t_global, pulse=None):
+        """
+        Emite um novo pulso do sensor no instante t_global e regista o grupo de emissão.
+        """
+        rays = sensor.emit_rays(verbose=self.verbose, context=self.context,
+                                surface=self.surface, receivers=self.sensors)
+        emitter = self.sensor_index[sensor.sensor_id]
+        self.emitted[emitter] += sum(ray.weight for ray in rays)
+
+        # Interseção de todo o pulso de uma só vez (kernel em lote)
+        origins = np.array([ray.sensor_pos for ray in rays], dtype=float).reshape(-1, 2)
+        directions = np.array([ray.direction for ray in rays], dtype=float).reshape(-1, 2)
+        t_hit, seg_index = self.surface.ray_intersection_batch(origins, directions)
+        for ray, t, index in zip(rays, t_hit, seg_index):
+            if index >= 0:
+                ray.apply_collision(ray.sensor_pos + t * ray.direction, self.surface.segments[index])
+        # Raios já marcados como detetados contam para todos os outros receptores (linha do emissor)
+        already_detected = sum(ray.weight for ray in rays if ray.detected_by)
+        if already_detected:
+            others = np.arange(len(self.sensors)) != emitter
+            self.crosstalk[emitter, others] += already_detected
+
+        group = {
+            'sensor_id': sensor.sensor_id,
+            'rays': rays,
+            'markers': [],  # os marcadores são criados apenas quando há visualização
+            'positions': origins.copy(),
+            'emission_time': t_global,
+            'arrays': self._ray_arrays(rays, origins, directions),
+            'emitter': emitter,
+            'detected': np.zeros((len(rays), len(self.sensors)), dtype=bool),  # raio × receptor
+            'emitter_velocity': self.sensor_velocity[emitter].copy(),
+            'pulse': pulse,
+        }
+        self.emission_groups.append(group)
+        return group
+
+    def _ray_arrays(self, rays, origins, directions):
+        """
+        Estado dos raios de um grupo em arrays, para o cálculo das posições em lote.
+        """
+        has_collision = np.array([ray.has_collision for ray in rays], dtype=bool)
+        return {
+            'sensor_pos': origins,
+            'directions': directions,
+            'has_collision': has_collision,
+            'collision_points': np.array([ray.collision_point if ray.has_collision else (0.0, 0.0)
+                                          for ray in rays], dtype=float).reshape(-1, 2),
+            'reflection_directions': np.array([ray.reflection_direction if ray.has_collision else (0.0, 0.0)
+                                               for ray in rays], dtype=float).reshape(-1, 2),
+            't_out': np.array([ray.t_out if ray.has_collision else np.inf for ray in rays], dtype=float),
+            'return_speed': np.array([self.context.speed_of_sound * (1 - ray.loss_percentage) for ray in rays],
+                                     dtype=float),
+            'weight': np.array([ray.weight for ray in rays], dtype=float),
+        }
+
+    def _group_positions(self, group, t_local, frame):
+        """
+        Posições dos raios de um grupo: em lote (kernel) ou, se a gravação de posições estiver ativa,
+        raio a raio com Ray.position_at_time (que regista cada posição no contexto).
+        """
+        if self.context.result_save_frames > 0:
+            for i, ray in enumerate(group['rays']):
+                try:
+                    group['positions'][i] = ray.position_at_time(t_local)
+                except Exception as e:
+                    print(f"Error updating ray {i} from Sensor {group['sensor_id']} at frame {frame}: {e}")
+            return group['positions']
+        arrays = group['arrays']
+        return positions_at_time(arrays['sensor_pos'], arrays['directions'], arrays['collision_points'],
+                                 arrays['reflection_directions'], arrays['t_out'], arrays['has_collision'],
+                                 arrays['return_speed'], self.context.speed_of_sound, t_local,
+                                 out=group['positions'])
+
+    def _set_pose(self, t):
+        """
+        Coloca os sensores móveis e a superfície na pose do instante t (sem recalcular raios).
+        """
+        for sensor in self.sensors:
+            if sensor.motion is not None:
+                sensor.position = sensor.position_at(t)
+        self.surface.update(t)
+        self.motion_time = t
+
+    def _move(self, t_global):
+        """
+        Avança sensores e superfície para t_global: atualiza as velocidades dos sensores e a grelha
+        de receptores e volta a intersetar os raios em voo afetados pelos segmentos que se moveram.
+        """
+        dt = t_global - self.motion_time
+        moved = False
+        for j, sensor in enumerate(self.sensors):
+            if sensor.motion is None:
+                continue
+            position = sensor.position_at(t_global)
+            self.sensor_velocity[j] = (position - sensor.position) / dt if dt > 0 else 0.0
+            moved = moved or bool(np.any(position != sensor.position))
+            sensor.position = position
+        if moved:
+            self.receiver_grid.rebuild([sensor.position for sensor in self.sensors])
+        moved_segments, boxes = self.surface.update(t_global)
+        if len(moved_segments):
+            self._reintersect(t_global, boxes)
+        self.motion_time = t_global
+
+    def _reintersect(self, t_global, boxes):
+        """
+        Volta a intersetar, contra a superfície atual, os raios ainda na fase de ida cujo percurso
+        restante (da posição atual até à colisão prevista, ou sem limite se não colidiam) atravessa
+        a caixa varrida por algum segmento que se moveu. Os restantes raios mantêm a colisão calculada;
+        um raio que volta a colidir mantém o seu desvio de dispersão.
+        """
+        speed = self.context.speed_of_sound
+        selected = []
+        for g, group in enumerate(self.emission_groups):
+            t_local = t_global - group['emission_time']
+            arrays = group['arrays']
+            outgoing = np.nonzero(~arrays['has_collision'] | (t_local <= arrays['t_out']))[0]
+            if len(outgoing):
+                selected.append((g, outgoing, t_local))
+        if not selected:
+            return
+        # Todos os raios de ida de todos os grupos num único teste de caixas e numa única interseção
+        group_of = np.concatenate([np.full(len(rows), g) for g, rows, _ in selected])
+        rows = np.concatenate([rows for _, rows, _ in selected])
+        t_local = np.concatenate([np.full(len(rows), t) for _, rows, t in selected])
+        sensor_pos = np.concatenate([self.emission_groups[g]['arrays']['sensor_pos'][r] for g, r, _ in selected])
+        directions = np.concatenate([self.emission_groups[g]['arrays']['directions'][r] for g, r, _ in selected])
+        had_collision = np.concatenate([self.emission_groups[g]['arrays']['has_collision'][r] for g, r, _ in selected])
+        old_points = np.concatenate([self.emission_groups[g]['arrays']['collision_points'][r] for g, r, _ in selected])
+        t_out = np.concatenate([self.emission_groups[g]['arrays']['t_out'][r] for g, r, _ in selected])
+
+        current = sensor_pos + directions * (speed * t_local)[:, None]
+        remaining = np.where(had_collision, (t_out - t_local) * speed, np.inf)
+        affected = np.nonzero(rays_hit_boxes(current, directions, remaining, boxes))[0]
+        if len(affected) == 0:
+            return
+        t_hit, seg_index = self.surface.ray_intersection_batch(current[affected], directions[affected])
+        hit = seg_index >= 0
+        points = current[affected] + np.where(hit, t_hit, 0.0)[:, None] * directions[affected]
+        moved_hit = np.any(np.abs(points - old_points[affected]) > 1e-9, axis=1)
+        changed = np.where(hit, ~had_collision[affected] | moved_hit, had_collision[affected])
+
+        updated = {}
+        for k in np.nonzero(changed)[0]:
+            n = affected[k]
+            group = self.emission_groups[group_of[n]]
+            ray = group['rays'][rows[n]]
+            if hit[k]:
+                ray.apply_collision(points[k], self.surface.segments[seg_index[k]], ray.dispersion_offset_deg)
+            else:
+                ray.has_collision = False
+                ray.collision_point = ray.reflection_direction = None
+                ray.t_out = ray.t_return = ray.response_time = None
+            updated.setdefault(group_of[n], []).append(rows[n])
+        for g, changed_rows in updated.items():
+            self._update_ray_arrays(self.emission_groups[g], changed_rows)
+            if self.recorder is not None:
+                self.recorder.mark_changed(g, changed_rows)
+
+    def _update_ray_arrays(self, group, rows):
+        """
+        Atualiza, nos arrays do grupo, o estado de colisão dos raios indicados.
+        """
+        arrays = group['arrays']
+        for i in rows:
+            ray = group['rays'][i]
+            arrays['has_collision'][i] = ray.has_collision
+            arrays['collision_points'][i] = ray.collision_point if ray.has_collision else (0.0, 0.0)
+            arrays['reflection_directions'][i] = ray.reflection_direction if ray.has_collision else (0.0, 0.0)
+            arrays['t_out'][i] = ray.t_out if ray.has_collision else np.inf
+
+    def _doppler_arrival(self, group, i, j, t_local):
+        """
+        Tempo de chegada (desde a emissão) e fator Doppler do eco do raio i no receptor j em movimento:
+         - o tempo é o instante de maior aproximação entre a frente de retorno e o receptor,
+           com a velocidade do receptor no último passo (em vez do tempo de ida e volta ao emissor);
+         - o fator é f_recebida / f_emitida devido ao movimento do emissor (na emissão), do ponto de
+           reflexão da superfície (no instante da reflexão) e do receptor:
+             (c - w·d) / (c - v_e·d) · (v - v_r·u) / (v - w·u)
+           com d e u as direções de ida e de retorno, c e v as velocidades de ida e de retorno,
+           v_e, w e v_r as velocidades do emissor, da superfície e do receptor.
+        """
+        arrays = group['arrays']
+        u = arrays['reflection_directions'][i]
+        v = arrays['return_speed'][i]
+        position = arrays['collision_points'][i] + u * v * (t_local - arrays['t_out'][i])
+        offset = position - self.sensors[j].position
+        relative = u * v - self.sensor_velocity[j]
+        norm2 = np.dot(relative, relative)
+        arrival = t_local - np.dot(offset, relative) / norm2 if norm2 > 0 else t_local
+        speed = self.context.speed_of_sound
+        d = arrays['directions'][i]
+        emitter_velocity = group.get('emitter_velocity', np.zeros(2))
+        surface_velocity = self.surface.velocity_at(arrays['collision_points'][i],
+                                                    group['emission_time'] + arrays['t_out'][i])
+        doppler = (speed - np.dot(surface_velocity, d)) / (speed - np.dot(emitter_velocity, d)) * \
+            (v - np.dot(self.sensor_velocity[j], u)) / (v - np.dot(surface_velocity, u))
+        return arrival, doppler
+
+    def step(self, frame):
+        """
+        Avança a simulação até ao frame indicado: emissões, posições dos raios e deteção de ecos.
+        As posições calculadas ficam em group['positions'] para a visualização.
+        """
+        t_global = (frame / (self.frames - 1)) * self.total_time
+        if self.verbose:
+            print(f"Updating frame {frame}/{self.frames - 1}")
+            print(f"Global time: {t_global:.2f}s")
+        if self.has_motion:
+            self._move(t_global)
+
+        # Verifica se algum sensor deve emitir novos raios
+        for sensor in self.sensors:
+            period = 1.0 / sensor.frequency
+            next_time = self.sensor_next_emission_time[sensor.sensor_id]
+            if t_global >= next_time:
+                if self.verbose:
+                    print(f"Sensor {sensor.sensor_id} emitindo novo pulso em t = {t_global:.2f}s")
+                pulse, owned = self._take_pulse()
+                if owned:
+                    self._emit(sensor, t_global, pulse)
+                # Atualiza o tempo da próxima emissão
+                self.sensor_next_emission_time[sensor.sensor_id] = t_global + period
+
+        # Atualiza a posição de todos os raios de cada grupo de emissão
+        for group in self.emission_groups:
+            t_local = t_global - group['emission_time']
+            positions = self._group_positions(group, t_local, frame)
+            arrays = group['arrays']
+            # Detecção de eco (apenas raios em fase de retorno; o receptor não pode ser o emissor),
+            # testando cada posição só contra os receptores das células vizinhas
+            returning = np.nonzero(arrays['has_collision'] & (t_local > arrays['t_out']))[0]
+            if len(returning) == 0:
+                continue
+            try:
+                ray_index, receiver_index = self.receiver_grid.within(positions[returning], self.detection_tolerance)
+                ray_index = returning[ray_index]
+                new = (receiver_index != group['emitter']) & ~group['detected'][ray_index, receiver_index]
+                ray_index, receiver_index = ray_index[new], receiver_index[new]
+                group['detected'][ray_index, receiver_index] = True
+                np.add.at(self.crosstalk[group['emitter']], receiver_index, arrays['weight'][ray_index])
+                for i, j in zip(ray_index, receiver_index):
+                    ray = group['rays'][i]
+                    sensor = self.sensors[j]
+                    detection = {
+                        'sensor_receptor': sensor.sensor_id,
+                        'sensor_emissor': ray.sensor_id,
+                        'emissor_coords': list(ray.sensor_pos),  # Corrigido para usar sensor_pos
+                        'angulo': round(ray.emission_angle_deg, 1),
+                        'tempo_ms': round(ray.response_time * 1000, 2)
+                    }
+                    if self.has_motion:
+                        # tempo_ms mantém o tempo de ida e volta ao emissor (usado por stats.py e inverse.py)
+                        arrival, doppler = self._doppler_arrival(group, i, j, t_local)
+                        detection['tempo_chegada_ms'] = round(float(arrival) * 1000, 2)
+                        detection['doppler'] = round(float(doppler), 6)
+                    self.detections.append(detection)
+                    self.detection_store.append(detection)
+                    if self.shard is not None:
+                        self.detection_keys.append((frame, group['pulse']))
+                    ray.detected_by.append(sensor.sensor_id)
+                    if self.verbose:
+                        print(f"Sensor {sensor.sensor_id} detectou eco do raio de {ray.emission_angle_deg:.1f}° "
+                              f"emitido pelo Sensor {ray.sensor_id} com tempo de resposta {ray.response_time*1000:.2f} ms")
+            except Exception as e:
+                print(f"Error detecting echoes from Sensor {group['sensor_id']} at frame {frame}: {e}")
+        self._record(frame)
+        self._checkpoint(frame)
+        return t_global
+
+    def _checkpoint(self, frame):
+        """
+        Agenda um checkpoint a cada checkpoint_every frames e no último frame (escrita em segundo plano).
+        Falhas (incluindo as da escrita de um checkpoint anterior) são levantadas como CheckpointError.
+        """
+        if not self.checkpoint_dir or self.checkpoint_every <= 0:
+            return
+        if (frame + 1) % self.checkpoint_every != 0 and frame != self.frames - 1:
+            return
+        try:
+            if self.checkpointer is None:
+                self.checkpointer = CheckpointWriter(self.checkpoint_dir, self, resume=self.start_frame > 0)
+            self.checkpointer.submit(frame)
+        except CheckpointError:
+            raise
+        except Exception as e:
+            raise CheckpointError(f"Falha ao agendar o checkpoint do frame {frame}: {e}") from e
+
+    def _record(self, frame):
+        """
+        Acrescenta este frame à gravação da trajetória (se ativa): o estado dos raios novos ou alterados.
+        """
+        if not self.record_dir:
+            return
+        try:
+            if self.recorder is None:
+                self.recorder = TrajectoryRecorder(self.record_dir, self, resume=self.start_frame > 0)
+            self.recorder.record(frame)
+        except Exception as e:
+            print(f"Error recording frame {frame}: {e}")
+
+    def close_recording(self):
+        """
+        Termina a gravação da trajetória (fecha os ficheiros e grava as detecções).
+        """
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    @staticmethod
+    def replay(record_dir=RECORD_DIR, start=None, stop=None, step=1):
+        """
+        Reproduz uma execução gravada com record_dir, avaliando as posições a partir do estado gravado
+        dos raios em vez de recalcular a propagação (a dispersão aleatória é a da execução original).
+        Ver trajectory.replay.
+        """
+        from trajectory import replay
+        return replay(record_dir, start, stop, step)
+
+    def close_checkpoints(self):
+        """
+        Espera pela escrita dos checkpoints pendentes.
+        """
+        if self.checkpointer is not None:
+            checkpointer, self.checkpointer = self.checkpointer, None
+            checkpointer.close()
+
+    def resume(self, checkpoint_dir=None):
+        """
+        Retoma a partir do último checkpoint (por omissão, o de checkpoint_dir): repõe grupos de emissão,
+        detecções, contagens e o estado do RNG, e devolve o frame a partir do qual a simulação continua.
+        """
+        checkpoint_dir = checkpoint_dir or self.checkpoint_dir
+        self.start_frame = restore(self, checkpoint_dir)
+        self.checkpoint_dir = checkpoint_dir
+        if self.has_motion and self.start_frame > 0:
+            self._set_pose(((self.start_frame - 1) / (self.frames - 1)) * self.total_time)
+        if self.verbose:
+            print(f"Simulação retomada de '{checkpoint_dir}' no frame {self.start_frame}")
+        return self.start_frame
+
+    def run(self):
+        """
+        Executa todos os frames sem visualização e devolve as detecções.
+        Uma falha de checkpoint interrompe a execução (CheckpointError), depois de fechar a gravação.
+        """
+        for frame in range(self.start_frame, self.frames):
+            try:
+                self.step(frame)
+            except CheckpointError:
+                self.close_checkpoints()
+                self.close_recording()
+                raise
+            except Exception as e:
+                print(f"Error during step {frame}: {e}")
+        self.close_checkpoints()
+        self.close_recording()
+        self.context.save_simulation_data()
+        return self.detections
+
+    def save_results(self, filename="resultados.json"):
+        """
+        Exporta as detecções para um arquivo JSON (ou binário colunar, se o nome terminar em '.npz').
+        """
+        try:
+            if filename.endswith(".npz"):
+                self.detection_store.save(filename)
+                print(f"\nTotal de {len(self.detection_store)} ecos registados. Resultados guardados em '{filename}'.")
+                return
+            # Converte os dados para tipos nativos do Python
+            results_native = json.loads(json.dumps(self.detections, default=lambda x: x.item() if hasattr(x, 'item') else x))
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(results_native, f, indent=4, ensure_ascii=False)
+            print(f"\nTotal de {len(self.detections)} ecos registados. Resultados guardados em '{filename}'.")
+        except Exception as e:
+            print(f"Error saving results to JSON: {e}")
+
     def animate(self):
+        """
+        Mostra a simulação com o matplotlib. Uma falha de checkpoint pára a animação, fecha os checkpoints
+        e a gravação e é levantada (CheckpointError), como em run.
+        """
+        # Importação tardia: a simulação headless não depende do matplotlib
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
         try:
             fig, ax = plt.subplots(figsize=(10, 6))
             ax.set_title("Simulação de Emissão de Partículas (Onda Sonora)")
@@ -129,12 +603,10 @@ class Simulation:
             ax.set_xlim(PLOT_X_LIMITS)
             ax.set_ylim(PLOT_Y_LIMITS)
 
-            self.surface.draw(ax)
-            for sensor in self.sensors:
-                sensor.draw(ax)
+            surface_line = self.surface.draw(ax)
+            sensor_artists = [sensor.draw(ax) for sensor in self.sensors]
 
-            # Cria os marcadores para os grupos já emitidos
-            for group in self.emission_groups:
+            def create_markers(group):
                 sensor_emissor = next(s for s in self.sensors if s.sensor_id == group['sensor_id'])
                 group_markers = []
                 for ray in group['rays']:
@@ -143,93 +615,67 @@ class Simulation:
                     group_markers.append(marker)
                 group['markers'] = group_markers
 
+            # Cria os marcadores para os grupos já emitidos
+            for group in self.emission_groups:
+                create_markers(group)
+
+            anim = None
+            failures = []
+
             def update(frame):
                 try:
-                    print(f"Updating frame {frame}/{self.frames - 1}")
-                    t_global = (frame / (self.frames - 1)) * self.total_time
-                    print(f"Global time: {t_global:.2f}s")
+                    self.step(frame)
+                except CheckpointError as e:
+                    # O ciclo de eventos do matplotlib só imprime as exceções dos callbacks
+                    if anim is not None:
+                        anim.event_source.stop()
+                    self.close_checkpoints()
+                    self.close_recording()
+                    failures.append(e)
+                    raise
+                except Exception as e:
+                    print(f"Error during step {frame}: {e}")
+                try:
                     updated_artists = []
 
-                    # Verifica se algum sensor deve emitir novos raios
-                    for sensor in self.sensors:
-                        period = 1.0 / sensor.frequency
-                        next_time = self.sensor_next_emission_time[sensor.sensor_id]
-                        if t_global >= next_time:
-                            print(f"Sensor {sensor.sensor_id} emitindo novo pulso em t = {t_global:.2f}s")
-                            new_rays = sensor.emit_rays()
-                            self.particle_stats[sensor.sensor_id]["emitted"] += len(new_rays)
-                            for ray in new_rays:
-                                ray.propagate(self.surface)
-                                for other_sensor in self.sensors:
-                                    if other_sensor.sensor_id != sensor.sensor_id and ray.detected_by:
-                                        self.particle_stats[other_sensor.sensor_id]["received"][sensor.sensor_id] += 1
-                            # Cria marcadores para os novos raios
-                            sensor_emissor = sensor
-                            new_markers = []
-                            for ray in new_rays:
-                                marker, = ax.plot(sensor_emissor.position[0], sensor_emissor.position[1], 'o',
-                                                  color=ray.color, markersize=4, alpha=0.7)
-                                new_markers.append(marker)
-                            # Adiciona o novo grupo de emissão
-                            self.emission_groups.append({
-                                'sensor_id': sensor.sensor_id,
-                                'rays': new_rays,
-                                'markers': new_markers,
-                                'emission_time': t_global
-                            })
-                            # Atualiza o tempo da próxima emissão
-                            self.sensor_next_emission_time[sensor.sensor_id] = t_global + period
+                    # Sensores e superfície móveis
+                    if self.has_motion:
+                        surface_line.set_data(self.surface.points[:, 0], self.surface.points[:, 1])
+                        updated_artists.append(surface_line)
+                        for sensor, (rect, label) in zip(self.sensors, sensor_artists):
+                            rect.set_xy((sensor.position[0] - sensor.width / 2, sensor.position[1] - sensor.height / 2))
+                            label.set_position(sensor.position)
+                            updated_artists.extend([rect, label])
 
                     # Atualiza a posição de todos os marcadores de cada grupo de emissão
                     for group in self.emission_groups:
-                        t_local = t_global - group['emission_time']
-                        for i, ray in enumerate(group['rays']):
-                            try:
-                                pos = ray.position_at_time(t_local)
-                                if not np.allclose(group['markers'][i].get_data(), pos, atol=1e-2):
-                                    group['markers'][i].set_data([pos[0]], [pos[1]])
-                                    updated_artists.append(group['markers'][i])
-                                # Detecção de eco (se o sensor receptor não for o emissor)
-                                if ray.has_collision and t_local > ray.t_out:
-                                    for sensor in self.sensors:
-                                        if sensor.sensor_id == ray.sensor_id:
-                                            continue
-                                        if sensor.sensor_id not in ray.detected_by:
-                                            if np.sum((pos - sensor.position)**2) < self.detection_tolerance**2:
-                                                detection = {
-                                                    'sensor_receptor': sensor.sensor_id,
-                                                    'sensor_emissor': ray.sensor_id,
-                                                    'emissor_coords': list(ray.sensor_pos),  # Corrigido para usar sensor_pos
-                                                    'angulo': round(ray.emission_angle_deg, 1),
-                                                    'tempo_ms': round(ray.response_time * 1000, 2)
-                                                }
-                                                self.detections.append(detection)
-                                                ray.detected_by.append(sensor.sensor_id)
-                                                self.particle_stats[sensor.sensor_id]["received"][ray.sensor_id] += 1
-                                                print(f"Sensor {sensor.sensor_id} detectou eco do raio de {ray.emission_angle_deg:.1f}° "
-                                                      f"emitido pelo Sensor {ray.sensor_id} com tempo de resposta {ray.response_time*1000:.2f} ms")
-                            except Exception as e:
-                                print(f"Error updating ray {i} from Sensor {group['sensor_id']} at frame {frame}: {e}")
+                        if len(group['markers']) != len(group['rays']):
+                            create_markers(group)
+                        for marker, pos in zip(group['markers'], group['positions']):
+                            if not np.allclose(marker.get_data(), pos, atol=1e-2):
+                                marker.set_data([pos[0]], [pos[1]])
+                                updated_artists.append(marker)
 
                     return updated_artists
                 except Exception as e:
                     print(f"Error during update frame {frame}: {e}")
                     return []
 
-            anim = FuncAnimation(fig, update, frames=self.frames, interval=50, blit=True, repeat=False)
+            anim = FuncAnimation(fig, update, frames=range(self.start_frame, self.frames), interval=50,
+                                 blit=True, repeat=False)
             plt.show()
+            if failures:
+                raise failures[0]
+            self.close_checkpoints()
+            self.close_recording()
+            self.context.save_simulation_data()
 
             # Exporta as detecções para um arquivo JSON após a animação
-            try:
-                # Converte os dados para tipos nativos do Python
-                results_native = json.loads(json.dumps(self.detections, default=lambda x: x.item() if hasattr(x, 'item') else x))
-                with open("resultados.json", "w", encoding="utf-8") as f:
-                    json.dump(results_native, f, indent=4, ensure_ascii=False)
-                print(f"\nTotal de {len(self.detections)} ecos registados. Resultados guardados em 'resultados.json'.")
-            except Exception as e:
-                print(f"Error saving results to JSON: {e}")
+            self.save_results()
 
             # Salva as estatísticas de partículas emitidas e recebidas
             self.save_particle_stats()
+        except CheckpointError:
+            raise
         except Exception as e:
             print(f"Error during animation setup: {e}")
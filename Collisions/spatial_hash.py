@@ -0,0 +1,90 @@
+# spatial_hash.py
+"""
+Grelha uniforme (hash espacial) dos receptores, para a deteção de ecos com muitos sensores.
+
+Com células de lado igual à tolerância de deteção, um receptor a menos de `tolerance` de um ponto
+está sempre numa das 3×3 células vizinhas da célula desse ponto; cada posição de raio é testada
+apenas contra esses candidatos em vez de contra todos os sensores. Com uma tolerância maior do que
+a célula, within procura ceil(tolerance / cell_size) anéis de células à volta do ponto.
+"""
+import numpy as np
+
+# Deslocamentos das 3×3 células vizinhas
+NEIGHBOR_OFFSETS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)], dtype=np.int64)
+
+
+def neighbor_offsets(rings=1):
+    """
+    Deslocamentos das (2·rings + 1)² células à volta de uma célula.
+    """
+    if rings == 1:
+        return NEIGHBOR_OFFSETS
+    steps = range(-rings, rings + 1)
+    return np.array([(dx, dy) for dx in steps for dy in steps], dtype=np.int64)
+
+
+def _cell_keys(cells):
+    """
+    Chave inteira única por célula (ix, iy).
+    """
+    return (cells[..., 0] << 32) + (cells[..., 1] & 0xFFFFFFFF)
+
+
+class ReceiverGrid:
+    def __init__(self, positions, cell_size):
+        """
+        Indexa os receptores numa grelha uniforme:
+         - positions: array (S, 2) com as posições dos receptores (índice = posição na lista de sensores).
+         - cell_size: lado da célula (normalmente a tolerância de deteção).
+        """
+        self.cell_size = float(cell_size)
+        self.rebuild(positions)
+
+    def rebuild(self, positions):
+        """
+        Reconstrói o índice (necessário se os receptores se moverem).
+        """
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        keys = _cell_keys(np.floor(self.positions / self.cell_size).astype(np.int64))
+        order = np.argsort(keys, kind="stable")
+        self._sorted_sensors = order
+        self._cell_keys, self._cell_start, counts = np.unique(keys[order], return_index=True, return_counts=True)
+        self._cell_end = self._cell_start + counts
+
+    def candidates(self, points, rings=1):
+        """
+        Pares (índice do ponto, índice do receptor) com o receptor a menos de `rings` células da célula
+        do ponto (por omissão, as 3×3 vizinhas), ordenados por ponto e depois por receptor.
+        """
+        offsets_grid = neighbor_offsets(rings)
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(points) == 0 or len(self._cell_keys) == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        cells = np.floor(points / self.cell_size).astype(np.int64)
+        keys = _cell_keys(cells[:, None, :] + offsets_grid[None, :, :]).ravel()
+        slot = np.searchsorted(self._cell_keys, keys)
+        slot = np.minimum(slot, len(self._cell_keys) - 1)
+        found = self._cell_keys[slot] == keys
+        starts = np.where(found, self._cell_start[slot], 0)
+        counts = np.where(found, self._cell_end[slot] - self._cell_start[slot], 0)
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        point_index = np.repeat(np.arange(len(keys)) // len(offsets_grid), counts)
+        # Índices consecutivos dentro de cada célula: start + (0, 1, ..., count - 1)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        sensor_index = self._sorted_sensors[np.repeat(starts, counts) + offsets]
+        order = np.lexsort((sensor_index, point_index))
+        return point_index[order], sensor_index[order]
+
+    def within(self, points, tolerance):
+        """
+        Pares (índice do ponto, índice do receptor) com distância estritamente inferior a `tolerance`
+        (qualquer tolerância: são procurados os anéis de células necessários).
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        rings = max(int(np.ceil(tolerance / self.cell_size)), 1)
+        point_index, sensor_index = self.candidates(points, rings)
+        d2 = np.sum((points[point_index] - self.positions[sensor_index]) ** 2, axis=1)
+        close = d2 < tolerance ** 2
+        return point_index[close], sensor_index[close]
@@ -1,15 +1,35 @@
 import json
 import numpy as np
-from collections import defaultdict
+from detection_store import DetectionStore, as_detection_store
+from inverse import reconstruct_surface, surface_distance, surface_inclination
+from configs import SPEED_OF_SOUND, LOSS_PERCENTAGE
 
-SPEED_OF_SOUND = 343.0  # m/s
 OUTLIERS_PERCENTAGE = 30
-TEMPO_PERDA_TOTAL = 0.0
-CALIBRAR_PERDAS_LATERAIS = 1.0
-CALIBRAR_PERDAS_ORIGEM = 0.78
+
+
+class StatsContext:
+    def __init__(self, speed_of_sound=SPEED_OF_SOUND, outliers_percentage=OUTLIERS_PERCENTAGE,
+                 loss_percentage=LOSS_PERCENTAGE):
+        """
+        Parâmetros de uma análise, passados explicitamente a cada função (sem variáveis globais).
+        A velocidade do som e a perda na reflexão têm de ser as da simulação que produziu as detecções
+        (por omissão, as de configs.py; ver from_physics).
+        """
+        self.speed_of_sound = speed_of_sound
+        self.outliers_percentage = outliers_percentage
+        self.loss_percentage = loss_percentage
+
+    @classmethod
+    def from_physics(cls, physics, **kwargs):
+        """
+        Contexto com as constantes físicas de um cenário (o dict "physics" de scenario.load_scenario).
+        """
+        return cls(speed_of_sound=physics["speed_of_sound"], loss_percentage=physics["loss_percentage"], **kwargs)
 
 def load_results(filename="resultados.json"):
     try:
+        if filename.endswith(".npz"):
+            return DetectionStore.load(filename)
         with open(filename, "r", encoding="utf-8") as f:
             return json.load(f)
     except Exception as e:
@@ -20,13 +40,14 @@ def load_results(filename="resultados.json"):
 def filtrar_outliers_porcentagem(valores, porcentagem=OUTLIERS_PERCENTAGE):
     if len(valores) == 0:
         return []
+    valores = np.asarray(valores)
     media = np.mean(valores)
-    distancias = [abs(v - media) for v in valores]
+    distancias = np.abs(valores - media)
     indices_ordenados = np.argsort(distancias)
     n_total = len(valores)
     n_remover = int((porcentagem / 100) * n_total)
     indices_filtrados = indices_ordenados[:-n_remover] if n_remover > 0 else indices_ordenados
-    return [valores[i] for i in indices_filtrados]
+    return valores[indices_filtrados]
 
 
 def calcular_cateto_maior(hipotenusa, cateto_menor):
@@ -35,37 +56,32 @@ def calcular_cateto_maior(hipotenusa, cateto_menor):
     return np.sqrt(hipotenusa ** 2 - cateto_menor ** 2)
 
 
-def estatisticas_por_sensor(results, speed_of_sound=SPEED_OF_SOUND):
-    global TEMPO_PERDA_TOTAL  # Declare TEMPO_PERDA_TOTAL as global
-    grupos = defaultdict(list)
-    tempos_origem = []
+def estatisticas_por_sensor(results, contexto=None):
+    if contexto is None:
+        contexto = StatsContext()
+    speed_of_sound = contexto.speed_of_sound
+    store = as_detection_store(results)
+    grupos = store.group_times()
+    tempos_origem = store.times(coords=(0, 0))
 
-    for event in results:
-        receptor = event["sensor_receptor"]
-        emissor = event["sensor_emissor"]
-        coords = tuple(event["emissor_coords"])
-        tempo = event["tempo_ms"]
-        chave = (receptor, emissor, coords)
-        grupos[chave].append(tempo)
-        if coords == (0, 0):
-            tempos_origem.append(tempo)
-
-    tempo_medio_origem = np.mean(filtrar_outliers_porcentagem(tempos_origem))
+    tempo_medio_origem = np.mean(filtrar_outliers_porcentagem(tempos_origem, contexto.outliers_percentage))
     estatisticas = {}
 
     for (receptor, emissor, coords), tempos in grupos.items():
-        tempos_filtrados = filtrar_outliers_porcentagem(tempos)
+        tempos_filtrados = filtrar_outliers_porcentagem(tempos, contexto.outliers_percentage)
         media_filtrada = np.mean(tempos_filtrados)
         distancia_filtrada = (media_filtrada / 1000) * speed_of_sound / 2
 
         cateto_menor = abs(coords[0])
         cateto_maior = calcular_cateto_maior(distancia_filtrada, cateto_menor)
 
-        # Correção pela diferença do tempo do sensor na origem
+        # Correção pela diferença do tempo do sensor na origem (nula para o próprio sensor na origem)
         if coords != (0, 0):
             tempo_diferenca = media_filtrada - tempo_medio_origem
-            TEMPO_PERDA_TOTAL += tempo_diferenca  # Modify the global variable
             distancia_corrigida = distancia_filtrada - ((tempo_diferenca / 1000) * speed_of_sound / 2)
+        else:
+            tempo_diferenca = 0.0
+            distancia_corrigida = distancia_filtrada
 
         estatisticas[f"R{receptor}_E{emissor}_{coords}"] = {
             "tempo_medio_filtrado_ms": media_filtrada,
@@ -80,37 +96,6 @@ def estatisticas_por_sensor(results, speed_of_sound=SPEED_OF_SOUND):
 
     return estatisticas
 
-def estatisticas_finais_sensor(results, speed_of_sound=SPEED_OF_SOUND):
-    grupos = defaultdict(list)
-    tempos_origem = []
-
-    for event in results:
-        receptor = event["sensor_receptor"]
-        emissor = event["sensor_emissor"]
-        coords = tuple(event["emissor_coords"])
-        tempo = event["tempo_ms"]
-        chave = (receptor, emissor, coords)
-        grupos[chave].append(tempo)
-        if coords == (0, 0):
-            tempos_origem.append(tempo)
-            
-    estatisticas = {}
-
-    for (receptor, emissor, coords), tempos in grupos.items():
-        tempos_filtrados = filtrar_outliers_porcentagem(tempos)
-        if coords != (0,0):
-            media_filtrada = np.mean(tempos_filtrados) - TEMPO_PERDA_TOTAL * CALIBRAR_PERDAS_LATERAIS
-        else:
-            media_filtrada = np.mean(tempos_filtrados) - TEMPO_PERDA_TOTAL * CALIBRAR_PERDAS_ORIGEM
-        distancia_filtrada = (media_filtrada / 1000) * speed_of_sound / 20
-
-        estatisticas[f"R{receptor}_E{emissor}_{coords}"] = {
-            "tempo_medio_filtrado_final_ms": media_filtrada,
-            "distancia_m_media_final_m": distancia_filtrada,
-        }
-
-    return estatisticas
-
 def load_statistics_from_json(filename="nrparticulas.json"):
     try:
         with open(filename, "r", encoding="utf-8") as f:
@@ -120,37 +105,52 @@ def load_statistics_from_json(filename="nrparticulas.json"):
         print(f"Erro ao carregar estatísticas do arquivo {filename}: {e}")
         return {}
 
-def calcular_media_ponderada(stats_finais, json_stats):
-    pesos = {
-        "left": 1 - (json_stats.get("left", {}).get("percentage", 0) / 100),
-        "center": 1 - (json_stats.get("center", {}).get("percentage", 0) / 100),
-        "right": 1 - (json_stats.get("right", {}).get("percentage", 0) / 100),
+def load_sensor_positions(filename="nrparticulas.json"):
+    """
+    Lê as coordenadas dos sensores gravadas em 'nrparticulas.json' ({sensor_id: [x, y]}).
+    """
+    try:
+        with open(filename, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {int(k): [v["coordinates"]["x"], v["coordinates"]["y"]]
+                for k, v in data.items() if k != "statistics" and "coordinates" in v}
+    except Exception as e:
+        print(f"Erro ao carregar as coordenadas dos sensores de {filename}: {e}")
+        return None
+
+def estimar_superficie(results, sensor_positions=None, workers=None, contexto=None):
+    """
+    Estima a distância e a inclinação da superfície por reconstrução inversa (inverse.py):
+    ajusta uma polilinha aos tempos de eco observados com o modelo de propagação e reflexão da simulação,
+    com a velocidade do som e a perda do contexto. Dos resíduos por detecção só é devolvido um resumo.
+    """
+    if contexto is None:
+        contexto = StatsContext()
+    ajuste = reconstruct_surface(results, sensor_positions or None, workers=workers,
+                                 speed_of_sound=contexto.speed_of_sound, loss_percentage=contexto.loss_percentage)
+    residuos = np.abs(ajuste["residuals_ms"])  # NaN nas detecções que o modelo ajustado não explica
+    return {
+        "distancia_m": surface_distance(ajuste["vertices"]),
+        "inclinacao_graus": surface_inclination(ajuste["vertices"]),
+        "vertices": ajuste["vertices"].tolist(),
+        "residuo_rms_ms": ajuste["rms_ms"],
+        "residuo_max_ms": float(np.nanmax(residuos)) if np.any(np.isfinite(residuos)) else float("nan"),
     }
-    soma_pesos = 0
-    soma_ponderada = 0
-
-    for chave, stat in stats_finais.items():
-        coords = eval(chave.split("_")[-1])  # Extract coordinates from the key
-        if coords[0] < 0:
-            peso = pesos["left"]
-        elif coords[0] == 0:
-            peso = pesos["center"]
-        else:
-            peso = pesos["right"]
-
-        soma_pesos += peso
-        soma_ponderada += stat["distancia_m_media_final_m"] * peso
 
-    return soma_ponderada / soma_pesos if soma_pesos > 0 else 0
-
-def calcular_inclinacao_superficie(json_stats):
-    left_percentage = json_stats.get("left", {}).get("percentage", 0)
-    center_percentage = json_stats.get("center", {}).get("percentage", 0)
-    right_percentage = json_stats.get("right", {}).get("percentage", 0)
-
-    # Calculate inclination as a weighted difference
-    inclinacao = (right_percentage - left_percentage) + (center_percentage * 0.5)
-    return inclinacao
+def calcular_estatisticas(results, json_stats=None, contexto=None, sensor_positions=None, workers=None):
+    """
+    Executa a análise completa e devolve os resultados num dict (sem imprimir).
+    """
+    if contexto is None:
+        contexto = StatsContext()
+    stats = estatisticas_por_sensor(results, contexto)
+    analise = {
+        "estatisticas_por_sensor": stats,
+    }
+    if json_stats:
+        analise["particulas"] = json_stats
+    analise["superficie"] = estimar_superficie(results, sensor_positions, workers, contexto)
+    return analise
 
 def main():
     results = load_results("resultados.json")
@@ -158,19 +158,14 @@ def main():
         print("Nenhum dado carregado. Verifique o arquivo.")
         return
 
-    stats = estatisticas_por_sensor(results)
+    contexto = StatsContext()
+    stats = estatisticas_por_sensor(results, contexto)
     print("\nEstatísticas por sensor:")
     for chave, stat in stats.items():
         print(f"\n{chave}:")
         for k, v in stat.items():
             print(f"  {k}: {v:.4f}" if isinstance(v, float) else f"  {k}: {v}")
-            
-    stats_finais = estatisticas_finais_sensor(results)
-    print("\nEstatísticas finais por sensor:")
-    for chave, stat in stats_finais.items():
-        print(f"\n{chave}:")
-        for k, v in stat.items():
-            print(f"  {k}: {v:.4f}" if isinstance(v, float) else f"  {k}: {v}")
+
 
     # Load and print statistics from JSON
     json_stats = load_statistics_from_json("nrparticulas.json")
@@ -179,16 +174,14 @@ def main():
         print(f"Left (x < 0): {json_stats.get('left', {}).get('count', 0)} ({json_stats.get('left', {}).get('percentage', 0):.2f}%)")
         print(f"Center (x = 0): {json_stats.get('center', {}).get('count', 0)} ({json_stats.get('center', {}).get('percentage', 0):.2f}%)")
         print(f"Right (x > 0): {json_stats.get('right', {}).get('count', 0)} ({json_stats.get('right', {}).get('percentage', 0):.2f}%)")
-
-        # Calculate and print weighted average
-        media_ponderada = calcular_media_ponderada(stats_finais, json_stats)
-        print(f"\nMédia ponderada da distância final: {media_ponderada:.4f} m")
-
-        # Calculate and print surface inclination
-        inclinacao = calcular_inclinacao_superficie(json_stats)
-        print(f"Inclinação da superfície: {inclinacao:.2f} graus")
     else:
         print("\nNenhuma estatística encontrada no JSON.")
 
+    # Reconstrução inversa da superfície a partir dos tempos de eco
+    superficie = estimar_superficie(results, load_sensor_positions("nrparticulas.json"), contexto=contexto)
+    print(f"\nDistância à superfície (reconstrução inversa): {superficie['distancia_m']:.4f} m")
+    print(f"Inclinação da superfície: {superficie['inclinacao_graus']:.2f} graus")
+    print(f"Resíduo RMS do ajuste: {superficie['residuo_rms_ms']:.2f} ms")
+
 if __name__ == "__main__":
     main()
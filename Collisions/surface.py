@@ -1,34 +1,126 @@
 import numpy as np
+from kernels import intersect_rays_segments
+from motion import as_motion
+
+
+def rays_hit_boxes(origins, directions, lengths, boxes):
+    """
+    Teste de lajes (slab test) em lote: para cada raio (origin + s * direction, 0 <= s <= length),
+    indica se atravessa alguma das caixas [xmin, ymin, xmax, ymax].
+    """
+    if len(origins) == 0 or len(boxes) == 0:
+        return np.zeros(len(origins), dtype=bool)
+    lo = boxes[None, :, :2]
+    hi = boxes[None, :, 2:]
+    o = origins[:, None, :]
+    d = directions[:, None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t1 = (lo - o) / d
+        t2 = (hi - o) / d
+    # Direção paralela a um eixo: o raio está dentro da laje (sempre) ou fora (nunca)
+    parallel = d == 0
+    inside = (o >= lo) & (o <= hi)
+    t_near = np.where(parallel, np.where(inside, -np.inf, np.inf), np.minimum(t1, t2)).max(axis=2)
+    t_far = np.where(parallel, np.where(inside, np.inf, -np.inf), np.maximum(t1, t2)).min(axis=2)
+    hit = (t_far >= np.maximum(t_near, 0.0)) & (t_near <= lengths[:, None])
+    return hit.any(axis=1)
+
 
 class Surface:
-    def __init__(self, points):
+    def __init__(self, points, motion=None):
         """
         Inicializa a superfície a partir de uma lista de pontos [x, y] (vértices).
+         - motion: movimento dos vértices (keyframes [(t, [[x, y], ...]), ...], função t -> pontos ou Motion);
+           None para uma superfície fixa. Ver motion.py.
         """
-        self.points = np.array(points)
+        self.motion = as_motion(motion)
+        self._set_points(np.array(points))
+
+    def _set_points(self, points):
+        self.points = points
         self.segments = [(self.points[i], self.points[i+1]) for i in range(len(self.points)-1)]
+        self.seg_a = np.ascontiguousarray(self.points[:-1], dtype=float)
+        self.seg_b = np.ascontiguousarray(self.points[1:], dtype=float)
+
+    def points_at(self, t):
+        """
+        Vértices da superfície no instante t (segundos) da simulação.
+        """
+        if self.motion is None:
+            return self.points
+        return self.motion.at(t)
+
+    def velocity_at(self, point, t, h=1e-3):
+        """
+        Velocidade (m/s) do ponto da superfície mais próximo de `point` no instante t, interpolada entre as
+        velocidades dos vértices do segmento (diferenças centradas do movimento com passo h).
+        Superfície fixa: velocidade nula.
+        """
+        if self.motion is None:
+            return np.zeros(2)
+        points = self.points_at(t)
+        velocity = (self.points_at(t + h) - self.points_at(t - h)) / (2 * h)
+        seg = points[1:] - points[:-1]
+        s = np.clip(np.sum((np.asarray(point) - points[:-1]) * seg, axis=1) /
+                    np.maximum(np.sum(seg * seg, axis=1), 1e-12), 0, 1)
+        k = np.argmin(np.linalg.norm(points[:-1] + s[:, None] * seg - point, axis=1))
+        return (1 - s[k]) * velocity[k] + s[k] * velocity[k + 1]
+
+    def update(self, t):
+        """
+        Move os vértices para o instante t. Devolve os índices dos segmentos que se moveram e as caixas
+        varridas por cada um ([xmin, ymin, xmax, ymax] que contém o segmento antes e depois do passo).
+        """
+        if self.motion is None:
+            return np.zeros(0, dtype=np.intp), np.zeros((0, 4))
+        new = self.points_at(t)
+        if new.shape != self.points.shape:
+            raise ValueError("O movimento da superfície não pode alterar o número de vértices")
+        moved_vertex = np.any(new != self.points, axis=1)
+        moved = np.nonzero(moved_vertex[:-1] | moved_vertex[1:])[0]
+        corners = np.stack([self.points[moved], self.points[moved + 1], new[moved], new[moved + 1]], axis=1)
+        boxes = np.concatenate([corners.min(axis=1), corners.max(axis=1)], axis=1)
+        if len(moved):
+            self._set_points(new)
+        return moved, boxes
 
     def ray_intersection(self, origin, direction):
         """
         Calcula a interseção do raio (origin + t * direction, t>=0) com cada segmento da superfície.
         Retorna (t, ponto de colisão, segmento) do primeiro encontro ou None.
         """
+        result = self.ray_intersection_index(origin, direction)
+        if result is None:
+            return None
+        min_t, collision_point, index = result
+        return min_t, collision_point, self.segments[index]
+
+    def ray_intersection_index(self, origin, direction):
+        """
+        Igual a ray_intersection, mas retorna o índice do segmento atingido: (t, ponto, índice) ou None.
+        """
         min_t = float('inf')
         collision_point = None
-        hit_segment = None
-        for seg in self.segments:
-            A, B = seg
+        hit_index = None
+        for i, (A, B) in enumerate(self.segments):
             result = self._intersect_ray_segment(origin, direction, A, B)
             if result is not None:
                 t, point = result
                 if t < min_t:
                     min_t = t
                     collision_point = point
-                    hit_segment = seg
+                    hit_index = i
         if collision_point is not None:
-            return min_t, collision_point, hit_segment
+            return min_t, collision_point, hit_index
         return None
 
+    def ray_intersection_batch(self, origins, directions):
+        """
+        Interseção em lote de N raios (kernel compilado se disponível).
+        Retorna (t, índice do segmento); t = inf e índice -1 quando não há colisão.
+        """
+        return intersect_rays_segments(origins, directions, self.seg_a, self.seg_b)
+
     def _intersect_ray_segment(self, origin, direction, A, B):
         """
         Calcula a interseção entre um raio e um segmento.
@@ -49,4 +141,5 @@ class Surface:
         """
         Desenha a superfície.
         """
-        ax.plot(self.points[:,0], self.points[:,1], 'k-', lw=2)
+        line, = ax.plot(self.points[:,0], self.points[:,1], 'k-', lw=2)
+        return line
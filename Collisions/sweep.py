@@ -0,0 +1,86 @@
+# sweep.py
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pipeline import CalibrationPipeline, focus_to_tuple
+from context import SimulationContext
+from cache import ResultCache
+from kernels import init_threads
+from configs import SENSOR_CONFIGS, SURFACE_POINTS, SIMULATION_FRAMES, CACHE_DIR
+
+
+def focal_grid(x_values, y_values):
+    """
+    Gera uma grelha de pontos focais a partir de listas/arrays de coordenadas x e y.
+    """
+    return [(float(x), float(y)) for y in y_values for x in x_values]
+
+
+def score_focus(result):
+    """
+    Calcula as métricas de receção de um ponto focal (as mesmas de Simulation.save_particle_stats)
+    e o tempo médio de eco das detecções.
+    """
+    summary = result["particle_stats"]["statistics"]
+    tempos = [d["tempo_ms"] for d in result["detections"]]
+    return {
+        "focus": result["focus"],
+        "total_received": summary["total_received"],
+        "left": summary["left"]["count"],
+        "center": summary["center"]["count"],
+        "right": summary["right"]["count"],
+        "left_percentage": summary["left"]["percentage"],
+        "center_percentage": summary["center"]["percentage"],
+        "right_percentage": summary["right"]["percentage"],
+        "mean_echo_ms": float(np.mean(tempos)) if tempos else float("nan"),
+    }
+
+
+def _run_focus_worker(args):
+    """
+    Executado em cada worker: corre a simulação headless de um ponto focal e devolve a pontuação.
+    Cada execução tem o seu próprio SimulationContext, pelo que também é seguro em threads.
+    """
+    focus, surface_points, sensor_configs, frames, seed, cache_dir = args
+    pipeline = CalibrationPipeline(surface_points, sensor_configs, frames=frames)
+    cache = ResultCache(cache_dir) if cache_dir else None
+    return score_focus(pipeline.run_focus(focus, context=SimulationContext(seed=seed), cache=cache))
+
+
+def run_sweep(focal_points, surface_points=SURFACE_POINTS, sensor_configs=SENSOR_CONFIGS,
+              frames=SIMULATION_FRAMES, workers=None, seed=None, use_threads=False, cache_dir=None):
+    """
+    Executa a simulação para cada ponto focal num conjunto de processos e devolve a tabela
+    ordenada: mais partículas recebidas primeiro e, em caso de empate, menor tempo médio de eco.
+     - seed: semente da dispersão aleatória, a mesma para todos os pontos focais (números aleatórios
+       comuns: as diferenças na tabela vêm dos focos, não do ruído, e não dependem da ordem da grelha).
+     - use_threads: usa um ThreadPoolExecutor em vez de processos.
+     - cache_dir: diretório da ResultCache (só com seed); pontos já simulados não são repetidos.
+    """
+    jobs = [(focus_to_tuple(focus), surface_points, sensor_configs, frames, seed, cache_dir)
+            for focus in focal_points]
+    rows = []
+    if use_threads:
+        init_threads()
+    executor_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        for focus, future in zip(focal_points, [executor.submit(_run_focus_worker, job) for job in jobs]):
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                print(f"Error in sweep for focus {focus}: {e}")
+    rows.sort(key=lambda row: (-row["total_received"],
+                               row["mean_echo_ms"] if not np.isnan(row["mean_echo_ms"]) else float("inf")))
+    return rows
+
+
+def print_sweep_table(rows):
+    print(f"{'#':>3} {'Foco':>16} {'Total':>6} {'Esq':>5} {'Centro':>7} {'Dir':>5} {'Eco médio (ms)':>15}")
+    for rank, row in enumerate(rows, start=1):
+        fx, fy = row["focus"]
+        print(f"{rank:>3} {f'({fx:.1f}, {fy:.1f})':>16} {row['total_received']:>6} {row['left']:>5} "
+              f"{row['center']:>7} {row['right']:>5} {row['mean_echo_ms']:>15.2f}")
+
+
+if __name__ == "__main__":
+    grid = focal_grid(np.linspace(-6, 6, 5), np.linspace(2, 12, 3))
+    print_sweep_table(run_sweep(grid, seed=0, cache_dir=CACHE_DIR))
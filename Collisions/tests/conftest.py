@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos são scripts com importações diretas: os testes correm com o diretório do pacote no sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,35 @@
+"""
+ResultCache: tamanho mantido entre escritas (sem percorrer a cache a cada put) e limite LRU.
+"""
+import os
+from cache import ResultCache, CODE_MODULES, BASE_DIR
+
+
+def test_code_modules_exist():
+    for kind, names in CODE_MODULES.items():
+        for name in names:
+            assert os.path.exists(os.path.join(BASE_DIR, name)), f"{kind}: {name}"
+
+
+def test_put_keeps_running_size(tmp_path, monkeypatch):
+    store = ResultCache(str(tmp_path), max_mb=1)
+    scans = []
+    entries = ResultCache.entries
+    monkeypatch.setattr(ResultCache, "entries", lambda self: scans.append(1) or entries(self))
+    for i in range(20):
+        store.put(f"{i:040x}", list(range(100)), kind="test")
+    assert len(scans) == 1
+    assert store.size() == sum(entry["bytes"] for entry in entries(store))
+
+
+def test_prune_only_over_limit(tmp_path):
+    store = ResultCache(str(tmp_path), max_mb=0.05)  # ~51 KB
+    value = bytes(10000)
+    for i in range(12):
+        store.put(f"{i:040x}", value, kind="test")
+        assert store.size() <= store.max_bytes
+    remaining = store.entries()
+    assert 0 < len(remaining) < 12
+    assert remaining[-1]["key"] == f"{11:040x}"
+    assert store.size() == sum(entry["bytes"] for entry in remaining)
+    assert ResultCache(str(tmp_path)).get(f"{11:040x}") == value
@@ -0,0 +1,106 @@
+"""
+Checkpoints: flags de deteção gravadas só para os grupos que mudaram e falhas de escrita levantadas no ciclo.
+"""
+import numpy as np
+import pytest
+import checkpoint
+from configs import SENSOR_CONFIGS, SURFACE_POINTS
+from context import SimulationContext
+from sensor import Sensor
+from simulation import Simulation
+
+FRAMES = 200
+
+
+def _simulation(checkpoint_dir=None):
+    sensors = [Sensor(**conf) for conf in SENSOR_CONFIGS]
+    return Simulation(np.array(SURFACE_POINTS, dtype=float), sensors, frames=FRAMES, verbose=False,
+                      context=SimulationContext(seed=3), checkpoint_dir=checkpoint_dir, checkpoint_every=50)
+
+
+def test_resume_restores_detection_flags(tmp_path):
+    full = _simulation()
+    full.run()
+    interrupted = _simulation(str(tmp_path))
+    for frame in range(120):
+        interrupted.step(frame)
+    interrupted.close_checkpoints()
+    resumed = _simulation(str(tmp_path))
+    assert resumed.resume() == 100
+    assert any(group['detected'].any() for group in resumed.emission_groups)
+    resumed.run()
+    assert resumed.detections == full.detections
+    assert resumed.particle_statistics() == full.particle_statistics()
+
+
+def test_checkpoint_saves_only_changed_groups(tmp_path):
+    sim = _simulation(str(tmp_path))
+    sim.run()
+    manifest = checkpoint.read_manifest(str(tmp_path))
+    saved = []
+    for entry in manifest["checkpoints"]:
+        with np.load(tmp_path / entry["chunk"]) as chunk:
+            saved.append(set(chunk["detected_groups"].tolist()))
+    with np.load(tmp_path / manifest["checkpoints"][-1]["state"]) as state:
+        assert "detected" not in state.files
+    detected = {g for g, group in enumerate(sim.emission_groups) if group['detected'].any()}
+    assert set().union(*saved) == detected
+    assert sum(len(groups) for groups in saved) < len(manifest["checkpoints"]) * len(detected)
+
+
+def test_write_failure_is_raised_in_the_step_loop(tmp_path, monkeypatch):
+    def fail(self, *args):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(checkpoint.CheckpointWriter, "_write", fail)
+    sim = _simulation(str(tmp_path))
+    with pytest.raises(checkpoint.CheckpointError, match="disco cheio"):
+        sim.run()
+    assert not (tmp_path / checkpoint.MANIFEST_FILE).exists()
+
+
+def test_write_failure_stops_the_animation(tmp_path, monkeypatch):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.animation
+    import matplotlib.pyplot as plt
+
+    class Timer:
+        running = True
+
+        def stop(self):
+            self.running = False
+
+    class Animation:
+        """
+        Substitui a FuncAnimation: o ciclo de eventos chama update a cada frame e só imprime as exceções.
+        """
+        def __init__(self, fig, func, frames, **kwargs):
+            self.func, self.frames, self.event_source = func, frames, Timer()
+            animations.append(self)
+
+        def run(self):
+            for frame in self.frames:
+                if not self.event_source.running:
+                    break
+                try:
+                    self.func(frame)
+                except Exception:
+                    pass
+                self.calls = frame + 1
+
+    def fail(self, *args):
+        raise OSError("disco cheio")
+
+    animations = []
+    monkeypatch.setattr(matplotlib.animation, "FuncAnimation", Animation)
+    monkeypatch.setattr(plt, "show", lambda: animations[0].run())
+    monkeypatch.setattr(checkpoint.CheckpointWriter, "_write", fail)
+    monkeypatch.chdir(tmp_path)
+    sim = _simulation(str(tmp_path / "checkpoints"))
+    sim.record_dir = str(tmp_path / "recording")
+    with pytest.raises(checkpoint.CheckpointError, match="disco cheio"):
+        sim.animate()
+    assert animations[0].calls < FRAMES
+    assert sim.checkpointer is None and sim.recorder is None
+    assert not (tmp_path / "resultados.json").exists()
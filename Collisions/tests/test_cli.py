@@ -0,0 +1,36 @@
+"""
+CLI: as estatísticas de um job usam a física do cenário simulado.
+"""
+import os
+import json
+import pytest
+import cli
+
+SPEED = 30.0
+
+
+@pytest.fixture(scope="module")
+def job_dir(tmp_path_factory):
+    base = tmp_path_factory.mktemp("cli")
+    scenario = base / "fisica_lenta.json"
+    scenario.write_text(json.dumps({"frames": 120, "total_time": 2.0, "seed": 1, "focal_points": [],
+                                    "physics": {"speed_of_sound": SPEED, "dispersion_deg": 0.0}}))
+    output = base / "runs"
+    assert cli.main(["--no-cache", "simulate", str(scenario), "--output", str(output)]) == 0
+    return output / "fisica_lenta"
+
+
+def test_simulate_saves_physics(job_dir):
+    physics = cli.load_physics(str(job_dir))
+    assert physics["speed_of_sound"] == SPEED
+    assert physics["dispersion_deg"] == 0.0
+
+
+def test_stats_uses_saved_physics(job_dir):
+    assert cli.main(["--no-cache", "stats", str(job_dir)]) == 0
+    with open(os.path.join(job_dir, "estatisticas.json"), encoding="utf-8") as f:
+        analise = json.load(f)
+    assert analise["estatisticas_por_sensor"]
+    for stat in analise["estatisticas_por_sensor"].values():
+        expected = stat["tempo_medio_filtrado_ms"] / 1000 * SPEED / 2
+        assert stat["distancia_m_media_filtrada_m"] == pytest.approx(expected)
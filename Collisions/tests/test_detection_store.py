@@ -0,0 +1,64 @@
+"""
+DetectionStore: filtros de query, ordem de group_times, gravação/leitura e uso direto pela análise.
+"""
+import numpy as np
+from detection_store import DetectionStore
+from inverse import detections_to_arrays
+from stats import calcular_estatisticas, load_results
+
+EVENTS = [
+    {"sensor_receptor": 2, "sensor_emissor": 1, "emissor_coords": [-3, 0], "angulo": 80.0, "tempo_ms": 12.0},
+    {"sensor_receptor": 1, "sensor_emissor": 1, "emissor_coords": [0, 0], "angulo": 90.0, "tempo_ms": 10.0},
+    {"sensor_receptor": 2, "sensor_emissor": 1, "emissor_coords": [-3, 0], "angulo": 85.0, "tempo_ms": 13.0},
+    {"sensor_receptor": 3, "sensor_emissor": 2, "emissor_coords": [0, 0], "angulo": 95.0, "tempo_ms": 11.0},
+    {"sensor_receptor": 1, "sensor_emissor": 1, "emissor_coords": [0, 0], "angulo": 91.0, "tempo_ms": 10.5},
+]
+
+
+def test_query_filters():
+    store = DetectionStore.from_results(EVENTS)
+    assert store.query(receptor=2).tolist() == [0, 2]
+    assert store.query(emissor=1, coords=(0, 0)).tolist() == [1, 4]
+    assert store.query(emissor=2).tolist() == [3]
+    assert store.query(receptor=9).tolist() == []
+    assert store.query(time_range=(10.5, 12.0)).tolist() == [0, 3, 4]
+    assert store.query(receptor=1, angle_range=(90.5, 100)).tolist() == [4]
+    np.testing.assert_array_equal(store.times(coords=(0, 0)), [10.0, 11.0, 10.5])
+
+
+def test_group_times_in_first_occurrence_order():
+    groups = DetectionStore.from_results(EVENTS).group_times()
+    assert list(groups) == [(2, 1, (-3, 0)), (1, 1, (0, 0)), (3, 2, (0, 0))]
+    np.testing.assert_array_equal(groups[(2, 1, (-3, 0))], [12.0, 13.0])
+    np.testing.assert_array_equal(groups[(1, 1, (0, 0))], [10.0, 10.5])
+
+
+def test_save_load_round_trip(tmp_path):
+    events = [dict(event, doppler=1.0 + i / 100, tempo_chegada_ms=event["tempo_ms"] + i)
+              for i, event in enumerate(EVENTS)]
+    store = DetectionStore.from_results(events[:4])
+    store.append({key: value for key, value in events[4].items() if key != "tempo_chegada_ms"})
+    filename = str(tmp_path / "resultados.npz")
+    store.save(filename)
+    loaded = DetectionStore.load(filename)
+    assert loaded.has_doppler
+    assert loaded.to_records() == store.to_records()
+    assert "tempo_chegada_ms" not in loaded.to_records()[4]
+    assert loaded.query(receptor=2, coords=(-3, 0)).tolist() == [0, 2]
+    static = DetectionStore.from_results(EVENTS)
+    static.save(filename)
+    assert not DetectionStore.load(filename).has_doppler
+    assert DetectionStore.load(filename).to_records() == EVENTS
+
+
+def test_analysis_reads_the_store_columns(tmp_path):
+    positions = {1: [0, 0], 2: [-3, 0], 3: [3, 0]}
+    store = DetectionStore.from_results(EVENTS)
+    for from_list, from_store in zip(detections_to_arrays(EVENTS, positions), detections_to_arrays(store, positions)):
+        np.testing.assert_array_equal(from_list, from_store)
+    filename = str(tmp_path / "resultados.npz")
+    store.save(filename)
+    analise = calcular_estatisticas(load_results(filename), sensor_positions=positions, workers=1)
+    assert analise["estatisticas_por_sensor"] == calcular_estatisticas(EVENTS, sensor_positions=positions,
+                                                                      workers=1)["estatisticas_por_sensor"]
+    assert np.isfinite(analise["superficie"]["distancia_m"])
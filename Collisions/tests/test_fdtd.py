@@ -0,0 +1,53 @@
+"""
+FDTDSolver: tempo de chegada em espaço livre (distância / c) e atraso do eco numa parede rígida.
+"""
+from types import SimpleNamespace
+import numpy as np
+from fdtd import FDTDSolver
+
+C = 343.0
+FREQUENCY = 343.0  # comprimento de onda de 1 m: 10 células por comprimento de onda
+
+
+def _receiver(sensor_id, position):
+    return SimpleNamespace(sensor_id=sensor_id, position=position)
+
+
+def _onset(times, pressure, fraction=0.1):
+    """
+    Primeiro instante em que |p| atinge `fraction` do seu máximo.
+    """
+    return times[np.argmax(np.abs(pressure) >= fraction * np.abs(pressure).max())]
+
+
+def test_free_space_arrival_time():
+    solver = FDTDSolver((-5, 5), (-5, 5), c=C)
+    solver.add_source(-2.5, 0, FREQUENCY)
+    solver.add_receiver(_receiver(1, (-1.5, 0)))
+    solver.add_receiver(_receiver(2, (1.5, 0)))
+    result = solver.run(0.02)
+    near = _onset(result["times"], result["pressure"][:, 0])
+    far = _onset(result["times"], result["pressure"][:, 1])
+    assert abs(near - 1.0 / C) < 0.3e-3
+    assert abs(far - 4.0 / C) < 0.3e-3
+    assert abs((far - near) - 3.0 / C) < 2 * solver.dt
+
+
+def test_rigid_wall_echo_delay():
+    def run(wall):
+        solver = FDTDSolver((-5, 5), (-5, 6), c=C)
+        solver.add_source(0, 0, FREQUENCY)
+        if wall:
+            solver.add_surface([[-5, 3], [5, 3]])
+        solver.add_receiver(_receiver(1, (0, 1)))
+        result = solver.run(0.025)
+        return solver, result["times"], result["pressure"][:, 0]
+
+    solver, times, free = run(False)
+    _, _, walled = run(True)
+    assert np.allclose(walled[times < 4.0 / C], free[times < 4.0 / C])
+    # A diferença entre as duas execuções é só o eco; a face refletora fica meia célula antes da parede
+    direct = _onset(times, free)
+    echo = _onset(times, walled - free)
+    expected = 2 * (3 - solver.dx / 2 - 1) / C
+    assert abs((echo - direct) - expected) < 2 * solver.dt
@@ -0,0 +1,22 @@
+"""
+O núcleo físico importa apenas NumPy: nem o matplotlib nem o Numba são carregados ao importar
+a simulação ou os emissores (o Numba só é importado na primeira chamada a um kernel compilado).
+"""
+import os
+import sys
+import subprocess
+import pytest
+
+COLLISIONS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CALIBRATE_DIR = os.path.join(COLLISIONS_DIR, "..", "Calibrate")
+
+
+@pytest.mark.parametrize("modules", [["simulation"], ["Emitter"], ["simulation", "pipeline", "Emitter"]])
+def test_physics_core_imports_without_plotting_or_jit(modules):
+    code = ("import sys\n"
+            + "".join(f"import {name}\n" for name in modules)
+            + "print(sorted(name for name in ('matplotlib', 'numba') if name in sys.modules))")
+    env = {key: value for key, value in os.environ.items() if key != "DISABLE_JIT"}
+    env["PYTHONPATH"] = os.pathsep.join([COLLISIONS_DIR, CALIBRATE_DIR])
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    assert result.stdout.strip() == "[]"
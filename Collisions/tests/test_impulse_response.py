@@ -0,0 +1,28 @@
+"""
+Respostas impulsionais: a distância estimada inverte o modelo de ida (c) e volta (c·(1 - perda)).
+"""
+import pytest
+from impulse_response import ImpulseResponse
+
+SPEED = 34.3
+LOSS = 0.2
+
+
+def _echoes(distance, n=30):
+    time_ms = 1000 * (distance / SPEED + distance / (SPEED * (1 - LOSS)))
+    return [{"sensor_receptor": 1, "sensor_emissor": 0, "emissor_coords": [0, 0], "angulo": 90.0,
+             "tempo_ms": time_ms} for _ in range(n)]
+
+
+@pytest.mark.parametrize("distance", [2.0, 5.0, 9.5])
+def test_range_estimate_inverts_round_trip(distance):
+    response = ImpulseResponse(bin_ms=0.1).accumulate(_echoes(distance), speed_of_sound=SPEED, loss_percentage=LOSS)
+    estimate = response.range_estimates(speed_of_sound=SPEED, loss_percentage=LOSS)[(0, 1)]
+    assert estimate["chegadas"] == 30
+    assert estimate["distancia_m"] == pytest.approx(distance, abs=0.01)
+
+
+def test_lossless_range_is_half_the_path():
+    response = ImpulseResponse(bin_ms=0.1).accumulate(_echoes(4.0))
+    estimate = response.range_estimates(speed_of_sound=SPEED, loss_percentage=0.0)[(0, 1)]
+    assert estimate["distancia_m"] == pytest.approx(estimate["tempo_ms"] / 1000 * SPEED / 2)
@@ -0,0 +1,60 @@
+"""
+Reconstrução inversa: detecções sintéticas de uma polilinha conhecida (forward_model) recuperam
+a distância e a inclinação da superfície; estatísticas do grupo na origem.
+"""
+import numpy as np
+from configs import SPEED_OF_SOUND, LOSS_PERCENTAGE
+from inverse import forward_model, reconstruct_surface, surface_distance, surface_inclination
+from stats import estatisticas_por_sensor
+
+HEIGHT = 8.0
+SLOPE = 0.2
+
+
+def _synthetic_detections():
+    """
+    Detecções de três emissores contra a reta y = HEIGHT + SLOPE·x; cada recetor é colocado onde
+    o raio refletido volta a y = 0 (reflexão especular exata).
+    """
+    vertices = np.array([[-10.0, HEIGHT - 10 * SLOPE], [10.0, HEIGHT + 10 * SLOPE]])
+    normal = np.array([SLOPE, -1.0]) / np.hypot(SLOPE, 1.0)
+    results, positions = [], {}
+    for emitter, x in enumerate((-3.0, 0.0, 3.0)):
+        for angle in np.arange(70.0, 111.0, 5.0):
+            direction = np.array([np.cos(np.deg2rad(angle)), np.sin(np.deg2rad(angle))])
+            origin = np.array([x, 0.0])
+            _, _, hit = forward_model(vertices, origin[None], np.deg2rad([angle]), origin[None])
+            assert hit[0]
+            t = (HEIGHT + SLOPE * x) / (direction[1] - SLOPE * direction[0])
+            point = origin + t * direction
+            reflected = direction - 2 * (direction @ normal) * normal
+            receiver = point - (point[1] / reflected[1]) * reflected
+            receptor = len(positions) + 10
+            positions[receptor] = receiver
+            times, deviation, _ = forward_model(vertices, origin[None], np.deg2rad([angle]), receiver[None])
+            assert deviation[0] < 1e-6
+            results.append({"sensor_receptor": receptor, "sensor_emissor": emitter, "emissor_coords": [x, 0.0],
+                            "angulo": float(angle), "tempo_ms": float(times[0])})
+    return results, positions
+
+
+def test_reconstruct_surface_recovers_distance_and_inclination():
+    results, positions = _synthetic_detections()
+    fit = reconstruct_surface(results, positions, workers=1, speed_of_sound=SPEED_OF_SOUND,
+                              loss_percentage=LOSS_PERCENTAGE)
+    assert abs(surface_distance(fit["vertices"]) - HEIGHT) < 0.01
+    assert abs(surface_inclination(fit["vertices"]) - np.degrees(np.arctan(SLOPE))) < 0.1
+    assert fit["rms_ms"] < 0.01
+
+
+def test_origin_group_has_no_correction():
+    # O grupo na origem vem depois de outro: não pode herdar os valores desse grupo
+    results = [{"sensor_receptor": 2, "sensor_emissor": 2, "emissor_coords": [-3, 0], "angulo": 80.0,
+                "tempo_ms": t} for t in (16.0, 16.4)]
+    results += [{"sensor_receptor": 1, "sensor_emissor": 1, "emissor_coords": [0, 0], "angulo": 90.0, "tempo_ms": t}
+                for t in (10.0, 10.2)]
+    stats = estatisticas_por_sensor(results)
+    origem = stats["R1_E1_(0, 0)"]
+    assert origem["tempo_diferenca_ms"] == 0.0
+    assert origem["distancia_corrigida_m"] == origem["distancia_m_media_filtrada_m"]
+    assert stats["R2_E2_(-3, 0)"]["tempo_diferenca_ms"] > 0
@@ -0,0 +1,94 @@
+"""
+Equivalência dos kernels em lote (kernels.py) com a referência NumPy e com Surface raio a raio.
+"""
+import numpy as np
+import pytest
+import kernels
+from configs import SURFACE_POINTS
+from surface import Surface
+
+N_RAYS = 2000
+SPEED = 34.3
+
+
+@pytest.fixture(scope="module")
+def rays():
+    rng = np.random.default_rng(0)
+    points = np.array(SURFACE_POINTS, dtype=float)
+    origins = rng.uniform(-3, 3, (N_RAYS, 2))
+    angles = rng.uniform(0, 2 * np.pi, N_RAYS)
+    directions = np.column_stack([np.cos(angles), np.sin(angles)])
+    return points, origins, directions
+
+
+@pytest.fixture(scope="module")
+def returning(rays):
+    """
+    Estado de retorno dos raios (colisão, direção refletida, instante de saída) para positions_at_time.
+    """
+    points, origins, directions = rays
+    rng = np.random.default_rng(1)
+    t_hit, index = kernels.intersect_rays_segments_numpy(origins, directions, points[:-1], points[1:])
+    hit = index >= 0
+    collision_points = origins + np.where(hit, t_hit, 0)[:, None] * directions
+    reflections = rng.normal(size=(N_RAYS, 2))
+    reflections /= np.linalg.norm(reflections, axis=1, keepdims=True)
+    t_out = np.where(hit, t_hit, np.inf) / SPEED
+    return_speed = np.full(N_RAYS, SPEED * 0.8)
+    t_local = rng.uniform(0, 2, N_RAYS)
+    return collision_points, reflections, t_out, hit, return_speed, t_local
+
+
+@pytest.fixture(scope="module")
+def jit():
+    pytest.importorskip("numba")
+    return kernels._jit_kernels()
+
+
+def test_intersection_numpy_matches_surface(rays):
+    points, origins, directions = rays
+    t_ref, index_ref = kernels.intersect_rays_segments_numpy(origins, directions, points[:-1], points[1:])
+    surface = Surface(points)
+    for i in range(0, N_RAYS, 7):
+        result = surface.ray_intersection_index(origins[i], directions[i])
+        if result is None:
+            assert index_ref[i] == -1 and np.isinf(t_ref[i])
+        else:
+            assert result[2] == index_ref[i]
+            assert np.isclose(result[0], t_ref[i])
+
+
+def test_intersection_jit_matches_numpy(rays, jit):
+    points, origins, directions = rays
+    t_ref, index_ref = kernels.intersect_rays_segments_numpy(origins, directions, points[:-1], points[1:])
+    t_jit = np.empty(N_RAYS)
+    index_jit = np.empty(N_RAYS, dtype=np.int64)
+    jit.intersect_rays_segments_jit(origins, directions, np.ascontiguousarray(points[:-1]),
+                                    np.ascontiguousarray(points[1:]), t_jit, index_jit)
+    np.testing.assert_array_equal(index_jit, index_ref)
+    np.testing.assert_allclose(t_jit, t_ref)
+
+
+def test_positions_jit_matches_numpy(rays, returning, jit):
+    _, origins, directions = rays
+    collision_points, reflections, t_out, hit, return_speed, t_local = returning
+    ref = kernels.positions_at_time_numpy(origins, directions, collision_points, reflections, t_out, hit,
+                                          return_speed, SPEED, t_local, np.empty((N_RAYS, 2)))
+    out = np.empty((N_RAYS, 2))
+    jit.positions_at_time_jit(origins, directions, collision_points, reflections, t_out, hit,
+                              return_speed, SPEED, t_local, out)
+    np.testing.assert_allclose(out, ref)
+
+
+def test_dispatch_matches_numpy(rays, returning):
+    points, origins, directions = rays
+    collision_points, reflections, t_out, hit, return_speed, t_local = returning
+    t_ref, index_ref = kernels.intersect_rays_segments_numpy(origins, directions, points[:-1], points[1:])
+    t_fast, index_fast = kernels.intersect_rays_segments(origins, directions, points[:-1], points[1:])
+    np.testing.assert_array_equal(index_fast, index_ref)
+    np.testing.assert_allclose(t_fast, t_ref)
+    ref = kernels.positions_at_time_numpy(origins, directions, collision_points, reflections, t_out, hit,
+                                          return_speed, SPEED, t_local, np.empty((N_RAYS, 2)))
+    fast = kernels.positions_at_time(origins, directions, collision_points, reflections, t_out, hit,
+                                     return_speed, SPEED, t_local)
+    np.testing.assert_allclose(fast, ref)
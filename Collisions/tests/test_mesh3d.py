@@ -0,0 +1,104 @@
+"""
+Malhas 3D: a interseção pela BVH (TriangleMesh, RayBundle3D) é a de Möller–Trumbore contra todos
+os triângulos, incluindo raios que falham a malha e raios que acertam em arestas e vértices.
+"""
+import numpy as np
+import pytest
+from context import SimulationContext
+from mesh3d import TriangleMesh, RayBundle3D
+
+
+def _brute_force(vertices, faces, origins, directions):
+    """
+    Möller–Trumbore para todos os pares (raio, triângulo); devolve (t mínimo, matriz t por par).
+    """
+    v0 = vertices[faces[:, 0]][None]
+    e1 = vertices[faces[:, 1]][None] - v0
+    e2 = vertices[faces[:, 2]][None] - v0
+    d = directions[:, None, :]
+    pvec = np.cross(d, e2)
+    det = np.sum(e1 * pvec, axis=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv_det = 1.0 / det
+        tvec = origins[:, None, :] - v0
+        u = np.sum(tvec * pvec, axis=2) * inv_det
+        qvec = np.cross(tvec, e1)
+        v = np.sum(d * qvec, axis=2) * inv_det
+        t = np.sum(e2 * qvec, axis=2) * inv_det
+    hit = (np.abs(det) > 1e-12) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > 1e-9)
+    t = np.where(hit, t, np.inf)
+    return t.min(axis=1), t
+
+
+def _check(mesh, origins, directions):
+    t, points, tri = mesh.ray_intersection(origins, directions)
+    expected, pairs = _brute_force(mesh.vertices, mesh.faces, origins, directions)
+    hit = np.isfinite(expected)
+    np.testing.assert_array_equal(tri >= 0, hit)
+    np.testing.assert_allclose(t[hit], expected[hit], rtol=1e-12)
+    # Empates (arestas partilhadas): o triângulo devolvido tem de estar à distância mínima
+    np.testing.assert_allclose(pairs[np.nonzero(hit)[0], tri[hit]], expected[hit], rtol=1e-12)
+    np.testing.assert_allclose(points[hit], origins[hit] + t[hit, None] * directions[hit])
+    return hit
+
+
+@pytest.mark.parametrize("leaf_size", [1, 3, 8])
+def test_random_mesh_matches_brute_force(leaf_size):
+    rng = np.random.default_rng(leaf_size)
+    centers = rng.uniform(-5, 5, (300, 3))
+    vertices = (centers[:, None, :] + rng.normal(scale=0.6, size=(300, 3, 3))).reshape(-1, 3)
+    mesh = TriangleMesh(vertices, np.arange(900).reshape(-1, 3), leaf_size=leaf_size)
+    origins = rng.uniform(-8, 8, (2000, 3))
+    directions = rng.normal(size=(2000, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    directions[:50] = [0.0, 0.0, 1.0]  # paralelos a um eixo
+    # Raios fora da malha a afastar-se dela: falham todos
+    origins[-100:] = [20.0, 0.0, 0.0]
+    directions[-100:] = [1.0, 0.0, 0.0]
+    hit = _check(mesh, origins, directions)
+    assert hit.any() and not hit[-100:].any()
+
+
+def test_edge_and_vertex_hits():
+    # Grelha 4 × 4 de quadrados em z = 1, cada um dividido em dois triângulos pela diagonal
+    n = 4
+    x, y = np.meshgrid(np.arange(n + 1, dtype=float), np.arange(n + 1, dtype=float))
+    vertices = np.column_stack([x.ravel(), y.ravel(), np.ones(x.size)])
+    k = (np.arange(n)[:, None] * (n + 1) + np.arange(n)[None, :]).ravel()
+    faces = np.vstack([np.column_stack([k, k + 1, k + n + 2]), np.column_stack([k, k + n + 2, k + n + 1])])
+    mesh = TriangleMesh(vertices, faces, leaf_size=2)
+    targets = np.array([[0.5, 0.5], [1.25, 1.25],   # diagonais partilhadas
+                        [1.0, 0.5], [2.5, 3.0],     # arestas entre quadrados
+                        [0.0, 2.5], [4.0, 1.5],     # arestas da fronteira
+                        [2.0, 2.0], [0.0, 0.0], [4.0, 4.0],  # vértices
+                        [4.5, 1.0], [-0.5, 2.0]])   # fora da malha
+    origins = np.column_stack([targets, np.zeros(len(targets))])
+    directions = np.tile([0.0, 0.0, 1.0], (len(targets), 1))
+    hit = _check(mesh, origins, directions)
+    assert hit.tolist() == [True] * 9 + [False] * 2
+    t, _, _ = mesh.ray_intersection(origins, directions)
+    np.testing.assert_allclose(t[:9], 1.0)
+
+
+def test_ray_bundle_collisions_match_brute_force():
+    rng = np.random.default_rng(7)
+    centers = rng.uniform(-4, 4, (100, 3)) + [0.0, 0.0, 6.0]
+    vertices = (centers[:, None, :] + rng.normal(scale=1.0, size=(100, 3, 3))).reshape(-1, 3)
+    mesh = TriangleMesh(vertices, np.arange(300).reshape(-1, 3))
+    directions = rng.normal(size=(500, 3)) + [0.0, 0.0, 1.5]
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    bundle = RayBundle3D([0.0, 0.0, 0.0], directions, np.zeros(500), np.zeros(500),
+                         context=SimulationContext(seed=0, dispersion_deg=0))
+    bundle.propagate(mesh)
+    expected, pairs = _brute_force(mesh.vertices, mesh.faces, np.zeros((500, 3)), directions)
+    hit = np.isfinite(expected)
+    assert hit.any() and not hit.all()
+    np.testing.assert_array_equal(bundle.has_collision, hit)
+    np.testing.assert_allclose(bundle.collision_points[hit], expected[hit, None] * directions[hit])
+    np.testing.assert_allclose(bundle.t_out[hit], expected[hit] / bundle.context.speed_of_sound)
+    # Reflexão especular (sem dispersão): R = D - 2 (D·N) N
+    tri = np.argmin(pairs, axis=1)[hit]
+    normals = mesh.normals[tri]
+    d = directions[hit]
+    reflected = d - 2 * np.sum(d * normals, axis=1, keepdims=True) * normals
+    np.testing.assert_allclose(bundle.reflection_directions[hit], reflected, atol=1e-12)
@@ -0,0 +1,105 @@
+"""
+Superfícies e sensores móveis: caixas varridas, nova interseção dos raios em voo e campos Doppler.
+"""
+import numpy as np
+import simulation
+from configs import SENSOR_CONFIGS, SURFACE_POINTS
+from context import SimulationContext
+from sensor import Sensor
+from simulation import Simulation
+from surface import Surface, rays_hit_boxes
+
+FRAMES = 150
+
+
+def _simulation(surface_motion=None):
+    sensors = [Sensor(**conf) for conf in SENSOR_CONFIGS]
+    return Simulation(np.array(SURFACE_POINTS, dtype=float), sensors, frames=FRAMES, verbose=False,
+                      context=SimulationContext(seed=2), surface_motion=surface_motion)
+
+
+def _translated(velocity):
+    return lambda t: np.array(SURFACE_POINTS, dtype=float) + np.asarray(velocity) * t
+
+
+def _waving(t):
+    points = np.array(SURFACE_POINTS, dtype=float)
+    points[2, 1] += 3 * np.sin(2 * np.pi * t)
+    return points
+
+
+def test_rays_hit_boxes_has_no_false_negatives():
+    rng = np.random.default_rng(0)
+    origins = rng.uniform(-5, 5, (400, 2))
+    angles = rng.uniform(0, 2 * np.pi, 400)
+    directions = np.column_stack([np.cos(angles), np.sin(angles)])
+    directions[:20] = [1.0, 0.0]  # paralelos a um eixo
+    lengths = rng.uniform(0, 8, 400)
+    corners = rng.uniform(-5, 5, (6, 2, 2))
+    boxes = np.concatenate([corners.min(axis=1), corners.max(axis=1)], axis=1)
+    hit = rays_hit_boxes(origins, directions, lengths, boxes)
+    s = np.linspace(0, 1, 2001)
+    points = origins[:, None, :] + (s[None, :, None] * lengths[:, None, None]) * directions[:, None, :]
+    inside = ((points[:, :, None, 0] >= boxes[:, 0]) & (points[:, :, None, 0] <= boxes[:, 2]) &
+              (points[:, :, None, 1] >= boxes[:, 1]) & (points[:, :, None, 1] <= boxes[:, 3])).any(axis=(1, 2))
+    assert np.all(hit[inside])
+    assert not hit.all()
+    # Caixa além do comprimento do raio e raio paralelo fora da laje
+    box = np.array([[2.0, -1.0, 3.0, 1.0]])
+    assert not rays_hit_boxes(np.zeros((1, 2)), np.array([[1.0, 0.0]]), np.array([1.5]), box)[0]
+    assert rays_hit_boxes(np.zeros((1, 2)), np.array([[1.0, 0.0]]), np.array([2.5]), box)[0]
+    assert not rays_hit_boxes(np.array([[0.0, 2.0]]), np.array([[1.0, 0.0]]), np.array([10.0]), box)[0]
+
+
+def test_reintersect_keeps_collisions_of_outgoing_rays_current():
+    sim = _simulation(_waving)
+    speed = sim.context.speed_of_sound
+    checked = 0
+    for frame in range(FRAMES):
+        t_global = sim.step(frame)
+        for group in sim.emission_groups:
+            arrays = group['arrays']
+            t_local = t_global - group['emission_time']
+            outgoing = ~arrays['has_collision'] | (t_local <= arrays['t_out'])
+            current = arrays['sensor_pos'][outgoing] + arrays['directions'][outgoing] * speed * t_local
+            t_hit, index = sim.surface.ray_intersection_batch(current, arrays['directions'][outgoing])
+            np.testing.assert_array_equal(index >= 0, arrays['has_collision'][outgoing])
+            hit = index >= 0
+            expected = current[hit] + t_hit[hit, None] * arrays['directions'][outgoing][hit]
+            np.testing.assert_allclose(arrays['collision_points'][outgoing][hit], expected, atol=1e-9)
+            checked += int(outgoing.sum())
+    assert checked > 0
+
+
+def test_box_culling_matches_reintersecting_every_ray(monkeypatch):
+    culled = _simulation(_waving)
+    culled.run()
+    monkeypatch.setattr(simulation, "rays_hit_boxes", lambda o, d, lengths, boxes: np.ones(len(o), dtype=bool))
+    brute = _simulation(_waving)
+    brute.run()
+    assert len(culled.detections) > 0
+    assert culled.detections == brute.detections
+
+
+def test_static_motion_keeps_round_trip_times():
+    static = _simulation()
+    static.run()
+    keyframes = [[0.0, SURFACE_POINTS], [10.0, SURFACE_POINTS]]
+    still = _simulation(keyframes)
+    still.run()
+    assert still.has_motion
+    assert [d['tempo_ms'] for d in still.detections] == [d['tempo_ms'] for d in static.detections]
+    assert all(d['doppler'] == 1.0 and 'tempo_chegada_ms' in d for d in still.detections)
+
+
+def test_doppler_includes_surface_velocity():
+    surface = Surface(SURFACE_POINTS, motion=_translated([0.0, -1.0]))
+    np.testing.assert_allclose(surface.velocity_at([0.5, 9.0], 0.3), [0.0, -1.0])
+    assert np.all(Surface(SURFACE_POINTS).velocity_at([0.5, 9.0], 0.3) == 0)
+    approaching = _simulation(_translated([0.0, -0.5]))
+    approaching.run()
+    receding = _simulation(_translated([0.0, 0.5]))
+    receding.run()
+    assert approaching.detections and receding.detections
+    assert all(d['doppler'] > 1 for d in approaching.detections)
+    assert all(d['doppler'] < 1 for d in receding.detections)
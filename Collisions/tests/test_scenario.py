@@ -0,0 +1,29 @@
+"""
+Cenários JSON: chaves de sensor em falta completadas com os valores por omissão de Sensor.
+"""
+import json
+import pytest
+from pipeline import create_sensor
+from scenario import load_scenario
+from sensor import Sensor
+
+
+def _write(tmp_path, sensors):
+    path = tmp_path / "cenario.json"
+    path.write_text(json.dumps({"sensors": sensors}), encoding="utf-8")
+    return str(path)
+
+
+def test_minimal_sensor_uses_sensor_defaults(tmp_path):
+    scenario = load_scenario(_write(tmp_path, [{"sensor_id": 1, "position": [0, 0], "rotation_deg": 90}]))
+    sensor = create_sensor(scenario["sensors"][0])
+    default = Sensor(1, [0, 0], 90)
+    assert sensor.emission_step_deg == default.emission_step_deg
+    assert sensor.emission_range_deg == default.emission_range_deg
+    assert sensor.frequency == default.frequency
+    assert list(sensor.emission_angles()) == list(default.emission_angles())
+
+
+def test_missing_required_key_is_reported(tmp_path):
+    with pytest.raises(ValueError, match="rotation_deg"):
+        load_scenario(_write(tmp_path, [{"sensor_id": 1, "position": [0, 0]}]))
@@ -0,0 +1,41 @@
+"""
+Calendário de emissão: emissões quantizadas como na Simulation, física do cenário e ambiguidade medida.
+"""
+import numpy as np
+from configs import SENSOR_CONFIGS, SURFACE_POINTS, SPEED_OF_SOUND
+from context import SimulationContext
+from pipeline import create_sensor
+from simulation import Simulation
+from schedule import arrival_model, detected_ambiguity, emission_times, validate
+
+
+def test_emission_times_match_simulation():
+    configs = [{**conf, 'initial_delay': delay, 'frequency': frequency}
+               for conf, (delay, frequency) in zip(SENSOR_CONFIGS, [(0.0, 6.3), (0.137, 7.1), (0.05, 11.9)])]
+    sim = Simulation(np.array(SURFACE_POINTS, dtype=float), [create_sensor(conf) for conf in configs], frames=120,
+                     total_time=2.0, verbose=False, context=SimulationContext(seed=0))
+    sim.run()
+    for e, conf in enumerate(configs):
+        emitted = [group['emission_time'] for group in sim.emission_groups if group['emitter'] == e]
+        np.testing.assert_array_equal(emission_times(conf['initial_delay'], conf['frequency'], 2.0, 120), emitted)
+
+
+def test_arrival_model_uses_given_physics():
+    default = arrival_model(SENSOR_CONFIGS, SURFACE_POINTS)
+    slower = arrival_model(SENSOR_CONFIGS, SURFACE_POINTS, speed_of_sound=SPEED_OF_SOUND / 2)
+    np.testing.assert_allclose(slower[1][0][0], 2 * default[1][0][0])
+
+
+def test_detected_ambiguity():
+    receivers = [1, 1, 1, 2, 2]
+    emitters = [0, 2, 0, 0, 0]
+    times = [0.100, 0.110, 0.500, 0.100, 0.105]  # só o par (0, 2) no recetor 1 é ambíguo
+    assert detected_ambiguity(receivers, emitters, times, guard_ms=25) == (0.4, 2, 5)
+
+
+def test_validate_reports_measured_ambiguity():
+    stats = validate(SENSOR_CONFIGS, SURFACE_POINTS, frames=60, total_time=1.0,
+                     physics={"speed_of_sound": SPEED_OF_SOUND, "loss_percentage": 0.1, "dispersion_deg": 0})
+    assert stats["total_received"] > 0
+    assert 0 <= stats["ambiguous"] <= stats["total_received"]
+    assert stats["ambiguous_fraction"] == stats["ambiguous"] / stats["total_received"]
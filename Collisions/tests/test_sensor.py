@@ -0,0 +1,58 @@
+"""
+Emissão adaptativa: a subdivisão nunca produz passos menores do que min_emission_step_deg e os raios
+subdivididos contam a fração do passo base que representam.
+"""
+import numpy as np
+import pytest
+from sensor import Sensor
+from surface import Surface
+from pipeline import create_sensor
+from configs import SENSOR_CONFIGS, SURFACE_POINTS
+
+
+@pytest.mark.parametrize("min_step", [0.5, 0.7, 1.0])
+def test_adaptive_steps_respect_minimum(min_step):
+    surface = Surface(np.array(SURFACE_POINTS, dtype=float))
+    receivers = [create_sensor(conf) for conf in SENSOR_CONFIGS]
+    sensor = Sensor(99, [0.0, 0.0], 90, emission_step_deg=5, adaptive_emission=True,
+                    min_emission_step_deg=min_step, refine_reflection_deg=0.1)
+    angles = sensor.adaptive_emission_angles(surface, receivers)
+    steps = np.diff(angles)
+    assert len(angles) > len(sensor.emission_angles())  # houve refinamento
+    assert steps.min() >= min_step - 1e-9
+
+
+def test_adaptive_weights_keep_counts_comparable():
+    surface = Surface(np.array(SURFACE_POINTS, dtype=float))
+    receivers = [create_sensor(conf) for conf in SENSOR_CONFIGS]
+    sensor = Sensor(99, [0.0, 0.0], 90, emission_step_deg=5, adaptive_emission=True,
+                    min_emission_step_deg=0.5, refine_reflection_deg=0.1)
+    np.testing.assert_array_equal(sensor.emission_weights(sensor.emission_angles()), 1.0)
+    angles = sensor.adaptive_emission_angles(surface, receivers)
+    weights = sensor.emission_weights(angles)
+    assert weights.min() < 1
+    # A subdivisão mantém a largura total do leque: o pulso conta como os raios de passo fixo
+    assert np.isclose(weights.sum(), len(sensor.emission_angles()))
+    rays = sensor.emit_rays(verbose=False, surface=surface, receivers=receivers)
+    np.testing.assert_array_equal([ray.weight for ray in rays], weights)
+
+
+def test_adaptive_particle_counts_are_weighted():
+    from context import SimulationContext
+    from simulation import Simulation
+
+    def run(adaptive):
+        sensors = [create_sensor({**conf, 'adaptive_emission': adaptive}) for conf in SENSOR_CONFIGS]
+        sim = Simulation(np.array(SURFACE_POINTS, dtype=float), sensors, frames=120, verbose=False,
+                         context=SimulationContext(seed=4, dispersion_deg=0))
+        sim.run()
+        return sim
+
+    fixed, adaptive = run(False), run(True)
+    assert sum(len(g['rays']) for g in adaptive.emission_groups) > sum(len(g['rays']) for g in fixed.emission_groups)
+    np.testing.assert_allclose(adaptive.emitted, fixed.emitted)
+    # Cada detecção conta o peso do seu raio
+    detected = sum(group['arrays']['weight'] @ group['detected'].sum(axis=1) for group in adaptive.emission_groups)
+    assert np.isclose(adaptive.crosstalk.sum(), detected)
+    stats = fixed.particle_stats
+    assert all(isinstance(stats[s.sensor_id]["emitted"], int) for s in fixed.sensors)
@@ -0,0 +1,72 @@
+"""
+Serviço de ingestão: mensagens inválidas não terminam a ligação do cliente.
+"""
+import json
+import asyncio
+from service import EchoIngestionService
+
+EVENT = {"sensor_receptor": 1, "sensor_emissor": 0, "emissor_coords": [-2, 0], "angulo": 80.0, "tempo_ms": 333.05}
+
+
+async def _send(lines):
+    service = EchoIngestionService(port=0, batch_delay=0.01)
+    await service.start()
+    port = service._server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection(service.host, port)
+    for line in lines:
+        writer.write(line + b"\n")
+    writer.write(b'{"type": "query"}\n')
+    await writer.drain()
+    response = json.loads(await asyncio.wait_for(reader.readline(), 30))
+    writer.close()
+    await service.stop()
+    return service, response
+
+
+def test_non_object_messages_are_invalid():
+    lines = [b"[1, 2]", b"5", b'"texto"', b"null", b"\xff\xfe", json.dumps(EVENT).encode()]
+    service, response = asyncio.run(_send(lines))
+    assert response["invalidos"] == 5
+    assert response["processados"] == 1
+    assert service.invalid == 5
+
+
+def test_line_over_limit_is_invalid():
+    lines = [b"1" * 200000, json.dumps(EVENT).encode()]
+    _, response = asyncio.run(_send(lines))
+    assert response["invalidos"] >= 1
+    assert response["processados"] == 1
+
+
+async def _query_while_flooding():
+    service = EchoIngestionService(port=0, queue_size=64, batch_delay=0.01, window=100)
+    await service.start()
+    port = service._server.sockets[0].getsockname()[1]
+    stop = asyncio.Event()
+
+    async def flood():
+        _, writer = await asyncio.open_connection(service.host, port)
+        line = (json.dumps(EVENT) + "\n").encode()
+        while not stop.is_set():
+            writer.write(line * 50)
+            await writer.drain()
+        writer.close()
+
+    flooder = asyncio.create_task(flood())
+    await asyncio.sleep(0.2)
+    reader, writer = await asyncio.open_connection(service.host, port)
+    writer.write((json.dumps(EVENT) + "\n" + json.dumps({"type": "query"}) + "\n").encode())
+    await writer.drain()
+    try:
+        response = json.loads(await asyncio.wait_for(reader.readline(), 10))
+    finally:
+        stop.set()
+        await flooder
+        writer.close()
+        await service.stop()
+    return response
+
+
+def test_query_answers_while_other_clients_ingest():
+    response = asyncio.run(_query_while_flooding())
+    assert response["processados"] > 0
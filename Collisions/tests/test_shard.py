@@ -0,0 +1,32 @@
+"""
+Execução repartida por shards: sem dispersão, o resultado é o de uma execução num só processo.
+"""
+import numpy as np
+import pytest
+from configs import SENSOR_CONFIGS, SURFACE_POINTS
+from context import SimulationContext
+from sensor import Sensor
+from shard import run_sharded
+from simulation import Simulation
+
+FRAMES = 120
+
+
+def _context():
+    return SimulationContext(seed=5, dispersion_deg=0)
+
+
+def _sensors():
+    return [Sensor(**conf) for conf in SENSOR_CONFIGS]
+
+
+@pytest.mark.parametrize("workers, shards", [(1, 1), (1, 4), (2, 2), (4, 4)])
+def test_sharded_run_matches_single_process(workers, shards):
+    single = Simulation(np.array(SURFACE_POINTS, dtype=float), _sensors(), frames=FRAMES, verbose=False,
+                        context=_context(), checkpoint_dir=None, record_dir=None)
+    single.run()
+    detections, particle_stats = run_sharded(SURFACE_POINTS, _sensors(), frames=FRAMES, context=_context(),
+                                             shards=shards, workers=workers)
+    assert len(single.detections) > 0
+    assert detections == single.detections
+    assert particle_stats == single.particle_statistics()
@@ -0,0 +1,31 @@
+"""
+ReceiverGrid.within: os mesmos pares que o teste de distância a todos os receptores.
+"""
+import numpy as np
+import pytest
+from spatial_hash import ReceiverGrid
+
+
+def _brute_force(points, receivers, tolerance):
+    d2 = np.sum((points[:, None, :] - receivers[None, :, :]) ** 2, axis=2)
+    point_index, sensor_index = np.nonzero(d2 < tolerance ** 2)
+    return point_index, sensor_index
+
+
+@pytest.mark.parametrize("tolerance", [0.3, 1.0, 2.5, 7.0])
+def test_within_matches_brute_force(tolerance):
+    rng = np.random.default_rng(0)
+    receivers = rng.uniform(-6, 6, (40, 2))
+    receivers[:8] = np.round(receivers[:8])  # receptores em fronteiras de células
+    points = np.concatenate([rng.uniform(-8, 8, (500, 2)), np.round(rng.uniform(-8, 8, (100, 2)))])
+    grid = ReceiverGrid(receivers, 1.0)
+    found = grid.within(points, tolerance)
+    expected = _brute_force(points, receivers, tolerance)
+    np.testing.assert_array_equal(found[0], expected[0])
+    np.testing.assert_array_equal(found[1], expected[1])
+
+
+def test_tolerance_larger_than_cell():
+    grid = ReceiverGrid([[0.0, 0.0]], 1.0)
+    point_index, sensor_index = grid.within([[2.2, 0.0], [-2.2, -1.0]], 2.5)
+    assert list(point_index) == [0, 1] and list(sensor_index) == [0, 0]
@@ -0,0 +1,14 @@
+"""
+Varrimento de pontos focais: todos os focos usam a mesma semente (números aleatórios comuns).
+"""
+from sweep import run_sweep
+
+
+def test_results_do_not_depend_on_grid_order():
+    foci = [(0.0, 10.0), (4.0, 6.0)]
+    forward = run_sweep(foci, frames=90, workers=2, seed=3, use_threads=True)
+    backward = run_sweep(foci[::-1], frames=90, workers=2, seed=3, use_threads=True)
+    by_focus = {tuple(row["focus"]): row for row in backward}
+    assert len(forward) == 2
+    for row in forward:
+        assert by_focus[tuple(row["focus"])] == row
@@ -0,0 +1,89 @@
+"""
+Gravação da trajetória: estado dos raios gravado uma vez por grupo, posições avaliadas na leitura
+e leitura limitada à janela de raios ainda dentro dos limites do gráfico.
+"""
+import os
+import numpy as np
+from configs import SENSOR_CONFIGS, SURFACE_POINTS, PLOT_X_LIMITS, PLOT_Y_LIMITS
+from context import SimulationContext
+from sensor import Sensor
+from simulation import Simulation
+from trajectory import Trajectory, RAYS_FILE, INDEX_FILE, RAY_DTYPE
+
+FRAMES = 120
+
+
+def _simulation(record_dir, surface_motion=None, checkpoint_dir=None):
+    sensors = [Sensor(**conf) for conf in SENSOR_CONFIGS]
+    return Simulation(np.array(SURFACE_POINTS, dtype=float), sensors, frames=FRAMES, verbose=False,
+                      context=SimulationContext(seed=1), checkpoint_dir=checkpoint_dir, checkpoint_every=40,
+                      record_dir=str(record_dir), surface_motion=surface_motion)
+
+
+def _record(sim, frames):
+    """
+    Corre os frames indicados e devolve as posições de todos os raios no fim de cada um.
+    """
+    positions = {}
+    for frame in frames:
+        sim.step(frame)
+        groups = [group['positions'] for group in sim.emission_groups]
+        positions[frame] = np.concatenate(groups + [np.zeros((0, 2))])
+    return positions
+
+
+def _in_bounds(positions):
+    return positions[(positions[:, 0] >= PLOT_X_LIMITS[0]) & (positions[:, 0] <= PLOT_X_LIMITS[1]) &
+                     (positions[:, 1] >= PLOT_Y_LIMITS[0]) & (positions[:, 1] <= PLOT_Y_LIMITS[1])]
+
+
+def _moving_surface(t):
+    points = np.array(SURFACE_POINTS, dtype=float)
+    points[-1, 1] += 2 * np.sin(2 * np.pi * t)
+    return points
+
+
+def test_replay_matches_simulated_positions(tmp_path):
+    sim = _simulation(tmp_path)
+    expected = _record(sim, range(FRAMES))
+    sim.close_recording()
+    trajectory = Trajectory(str(tmp_path))
+    assert trajectory.last_frame == FRAMES - 1
+    for frame in range(FRAMES):
+        positions, codes = trajectory.frame(frame)
+        np.testing.assert_allclose(_in_bounds(positions), _in_bounds(expected[frame]))
+        assert len(codes) == len(positions)
+        visible, _ = trajectory.visible(frame, PLOT_X_LIMITS, PLOT_Y_LIMITS)
+        np.testing.assert_allclose(visible, _in_bounds(expected[frame]))
+    # A janela lida avança: os raios que já saíram dos limites não são lidos
+    live_start = trajectory.index[:, 4]
+    assert np.all(np.diff(live_start) >= 0) and live_start[-1] > 0
+    assert len(trajectory.state(FRAMES - 1)) < len(trajectory.rays)
+    # Um registo por raio emitido, independentemente do número de frames
+    emitted = sum(len(group['rays']) for group in sim.emission_groups)
+    assert os.path.getsize(tmp_path / RAYS_FILE) == emitted * RAY_DTYPE.itemsize
+
+
+def test_replay_follows_collisions_of_a_moving_surface(tmp_path):
+    sim = _simulation(tmp_path, surface_motion=_moving_surface)
+    expected = _record(sim, range(FRAMES))
+    sim.close_recording()
+    trajectory = Trajectory(str(tmp_path))
+    assert len(trajectory.rays) > sum(len(group['rays']) for group in sim.emission_groups)
+    for frame in range(FRAMES):
+        np.testing.assert_allclose(_in_bounds(trajectory.frame(frame)[0]), _in_bounds(expected[frame]))
+    assert trajectory.index[-1, 4] > 0
+
+
+def test_resumed_recording_is_identical(tmp_path):
+    full = _simulation(tmp_path / "full")
+    full.run()
+    interrupted = _simulation(tmp_path / "resumed", checkpoint_dir=str(tmp_path / "checkpoints"))
+    _record(interrupted, range(100))  # interrompida depois do checkpoint do frame 79
+    interrupted.close_checkpoints()
+    interrupted.close_recording()
+    resumed = _simulation(tmp_path / "resumed", checkpoint_dir=str(tmp_path / "checkpoints"))
+    assert resumed.resume() == 80
+    resumed.run()
+    for name in (RAYS_FILE, INDEX_FILE):
+        assert (tmp_path / "full" / name).read_bytes() == (tmp_path / "resumed" / name).read_bytes()
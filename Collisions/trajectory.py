@@ -0,0 +1,399 @@
+# trajectory.py
+"""
+Gravação da trajetória de uma Simulation e reprodução (replay) sem recalcular a propagação.
+
+Estrutura do diretório de gravação:
+  header.json        - superfície, sensores, frames, tempo total, velocidade do som e tabela de cores
+  rays.bin           - estado de cada raio (registos RAY_DTYPE, binário, só acréscimo): gravado uma vez,
+                       quando o grupo é emitido, e outra vez apenas se a colisão mudar (superfície móvel)
+  index.i64          - uma linha (frame, fim em rays.bin, grupos gravados, número de detecções,
+                       início da janela viva em rays.bin) por frame
+  detections.npz     - colunas do DetectionStore no fim da execução
+Reprodução: python trajectory.py <diretório> (ou Simulation.replay).
+As posições não são gravadas: ir para um frame é ler uma linha do índice e a janela viva de rays.bin
+nesse frame (np.memmap, sem carregar a gravação em memória) e avaliar as posições desses raios
+nesse instante com o kernel da simulação (kernels.positions_at_time). O tamanho da gravação depende
+do número de raios emitidos e não do número de frames.
+Janela viva: um raio sai dos limites do gráfico ("bounds" no header) ao fim de um tempo de voo limitado
+e não volta a entrar (depois da última reflexão o percurso é uma reta); os registos anteriores ao primeiro
+registo ainda dentro dos limites não são lidos, pelo que o custo de ir para um frame não cresce com
+a duração da gravação.
+"""
+import os
+import json
+from collections import deque
+import numpy as np
+from kernels import positions_at_time
+from configs import PLOT_X_LIMITS, PLOT_Y_LIMITS
+
+HEADER_FILE = "header.json"
+RAYS_FILE = "rays.bin"
+INDEX_FILE = "index.i64"
+DETECTIONS_FILE = "detections.npz"
+INDEX_COLUMNS = 5  # frame, fim em rays.bin, grupos gravados, número de detecções, início da janela viva
+BOUNDS_MARGIN = 1e-6  # folga (m) dos limites na janela viva, para os arredondamentos das posições
+# Estado de um raio (como em Simulation._ray_arrays); sem colisão, t_out é infinito
+RAY_DTYPE = np.dtype([
+    ("ray", np.int64),               # número de ordem do raio na gravação
+    ("emission_time", np.float64),
+    ("origin", np.float64, 2),
+    ("direction", np.float64, 2),
+    ("collision_point", np.float64, 2),
+    ("reflection_direction", np.float64, 2),
+    ("t_out", np.float64),
+    ("return_speed", np.float64),
+    ("color", np.uint8),
+])
+
+
+def _to_native(x):
+    return x.item() if hasattr(x, 'item') else x
+
+
+def _exit_times(points, velocities, bounds):
+    """
+    Instante (a partir de points, velocidade constante) em que cada ponto sai de vez do retângulo
+    bounds = (xlim, ylim); 0 se já está fora e a afastar-se, infinito se nunca sai.
+    """
+    exit_time = np.full(len(points), np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for axis, (low, high) in enumerate(bounds):
+            p, v = points[:, axis], velocities[:, axis]
+            t = np.maximum((low - BOUNDS_MARGIN - p) / v, (high + BOUNDS_MARGIN - p) / v)
+            inside = (p >= low - BOUNDS_MARGIN) & (p <= high + BOUNDS_MARGIN)
+            t = np.where(v == 0, np.where(inside, np.inf, -np.inf), t)
+            exit_time = np.minimum(exit_time, t)
+    return np.maximum(exit_time, 0.0)
+
+
+def leave_times(records, speed_of_sound, bounds):
+    """
+    Instante (tempo da simulação) a partir do qual o raio de cada registo RAY_DTYPE fica fora de bounds:
+    fim do percurso refletido se houver colisão, senão fim do percurso de ida.
+    """
+    t_out = records["t_out"]
+    hit = np.isfinite(t_out)
+    outgoing = _exit_times(records["origin"], records["direction"] * speed_of_sound, bounds)
+    returning = _exit_times(records["collision_point"],
+                            records["reflection_direction"] * records["return_speed"][:, None], bounds)
+    return records["emission_time"] + np.where(hit, t_out + returning, outgoing)
+
+
+class TrajectoryRecorder:
+    def __init__(self, directory, sim, resume=False):
+        """
+        Grava em `directory` o estado dos raios de `sim` (ver RAY_DTYPE) e uma linha de índice por frame.
+        Com resume=True a gravação existente é cortada no frame em que a simulação retoma
+        e continua a partir daí (os frames posteriores ao checkpoint são recalculados).
+        """
+        self.directory = directory
+        self.sim = sim
+        os.makedirs(directory, exist_ok=True)
+        self.colors = []
+        self._color_codes = {}
+        self._offsets = []  # número de ordem do primeiro raio de cada grupo já gravado
+        self._changed = {}  # grupo -> linhas cuja colisão mudou desde o último frame gravado
+        self.bounds = (tuple(PLOT_X_LIMITS), tuple(PLOT_Y_LIMITS))
+        self.live_start = 0        # primeira linha de rays.bin cujo raio ainda pode estar dentro de bounds
+        self._leave_times = deque()  # instante de saída de cada linha a partir de live_start
+        self.n_rays = 0
+        rows = 0
+        if resume and os.path.exists(os.path.join(directory, HEADER_FILE)):
+            with open(os.path.join(directory, HEADER_FILE), "r", encoding="utf-8") as f:
+                self.colors = json.load(f)["colors"]
+            self._color_codes = {color: i for i, color in enumerate(self.colors)}
+            index = _read_index(directory)
+            index = index[index[:, 0] < sim.start_frame]
+            if len(index) and index[-1, 0] != sim.start_frame - 1:
+                raise ValueError(f"A gravação em {directory} não chega ao frame {sim.start_frame - 1}")
+            rows = int(index[-1, 1]) if len(index) else 0
+            for group in sim.emission_groups[:int(index[-1, 2]) if len(index) else 0]:
+                self._offsets.append(self.n_rays)
+                self.n_rays += len(group['rays'])
+            self._truncate(index, rows)
+            if len(index):
+                self.live_start = int(index[-1, 4])
+                records = np.fromfile(os.path.join(directory, RAYS_FILE), dtype=RAY_DTYPE,
+                                      count=rows - self.live_start, offset=self.live_start * RAY_DTYPE.itemsize)
+                self._leave_times.extend(leave_times(records, sim.context.speed_of_sound, self.bounds).tolist())
+        else:
+            for name in (RAYS_FILE, INDEX_FILE):
+                open(os.path.join(directory, name), "wb").close()
+        self.rows = rows
+        self._rays = open(os.path.join(directory, RAYS_FILE), "ab")
+        self._index = open(os.path.join(directory, INDEX_FILE), "ab")
+        self._write_header()
+
+    def _truncate(self, index, rows):
+        with open(os.path.join(self.directory, RAYS_FILE), "r+b") as f:
+            f.truncate(rows * RAY_DTYPE.itemsize)
+        with open(os.path.join(self.directory, INDEX_FILE), "wb") as f:
+            index.astype(np.int64).tofile(f)
+
+    def _write_header(self):
+        sim = self.sim
+        header = {
+            "frames": sim.frames,
+            "total_time": sim.total_time,
+            "speed_of_sound": sim.context.speed_of_sound,
+            "bounds": [list(limits) for limits in self.bounds],
+            "surface_points": np.asarray(sim.surface.points).tolist(),
+            "sensors": [{"sensor_id": sensor.sensor_id, "position": list(sensor.position), "color": sensor.color,
+                         "width": sensor.width, "height": sensor.height} for sensor in sim.sensors],
+            "colors": self.colors,
+        }
+        with open(os.path.join(self.directory, HEADER_FILE), "w", encoding="utf-8") as f:
+            json.dump(header, f, indent=2, default=_to_native)
+
+    def _color_code(self, color):
+        color = str(color)
+        if color not in self._color_codes:
+            if len(self.colors) == 256:
+                raise ValueError("Demasiadas cores diferentes para a gravação (máximo 256)")
+            self._color_codes[color] = len(self.colors)
+            self.colors.append(color)
+            self._write_header()
+        return self._color_codes[color]
+
+    def _ray_records(self, group, first, rows):
+        """
+        Registos RAY_DTYPE com o estado atual das linhas `rows` de um grupo cujo primeiro raio é `first`.
+        """
+        arrays = group['arrays']
+        records = np.zeros(len(rows), dtype=RAY_DTYPE)
+        records["ray"] = first + rows
+        records["emission_time"] = group['emission_time']
+        records["origin"] = arrays['sensor_pos'][rows]
+        records["direction"] = arrays['directions'][rows]
+        records["collision_point"] = arrays['collision_points'][rows]
+        records["reflection_direction"] = arrays['reflection_directions'][rows]
+        records["t_out"] = arrays['t_out'][rows]
+        records["return_speed"] = arrays['return_speed'][rows]
+        records["color"] = [self._color_code(group['rays'][i].color) for i in rows]
+        return records
+
+    def mark_changed(self, group_index, rows):
+        """
+        Indica que a colisão das linhas `rows` do grupo mudou (Simulation._reintersect); o novo estado
+        é gravado no próximo frame. Grupos ainda não gravados são gravados inteiros com o estado atual.
+        """
+        if group_index < len(self._offsets):
+            self._changed.setdefault(group_index, set()).update(int(row) for row in rows)
+
+    def record(self, frame):
+        """
+        Grava o estado dos raios emitidos ou alterados desde o último frame e a linha de índice de `frame`.
+        """
+        groups = self.sim.emission_groups
+        chunks = [self._ray_records(groups[g], self._offsets[g], np.array(sorted(rows), dtype=np.int64))
+                  for g, rows in sorted(self._changed.items())]
+        self._changed = {}
+        while len(self._offsets) < len(groups):
+            group = groups[len(self._offsets)]
+            self._offsets.append(self.n_rays)
+            chunks.append(self._ray_records(group, self.n_rays, np.arange(len(group['rays']))))
+            self.n_rays += len(group['rays'])
+        if chunks:
+            records = np.concatenate(chunks)
+            records.tofile(self._rays)
+            self.rows += len(records)
+            self._leave_times.extend(leave_times(records, self.sim.context.speed_of_sound, self.bounds).tolist())
+        # Os instantes só avançam: uma linha que já saiu de bounds não volta a contar
+        t = (frame / (self.sim.frames - 1)) * self.sim.total_time
+        while self._leave_times and self._leave_times[0] < t:
+            self._leave_times.popleft()
+            self.live_start += 1
+        np.array([frame, self.rows, len(self._offsets), len(self.sim.detection_store), self.live_start],
+                 dtype=np.int64).tofile(self._index)
+
+    def close(self):
+        """
+        Fecha os ficheiros e grava as detecções finais.
+        """
+        for f in (self._rays, self._index):
+            f.close()
+        self.sim.detection_store.save(os.path.join(self.directory, DETECTIONS_FILE))
+
+
+def _read_index(directory):
+    return np.fromfile(os.path.join(directory, INDEX_FILE), dtype=np.int64).reshape(-1, INDEX_COLUMNS)
+
+
+def _memmap(path, dtype):
+    # np.memmap não aceita ficheiros vazios
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+class Trajectory:
+    def __init__(self, directory):
+        """
+        Leitura de uma gravação feita por TrajectoryRecorder (ficheiros binários mapeados em memória).
+        """
+        self.directory = directory
+        with open(os.path.join(directory, HEADER_FILE), "r", encoding="utf-8") as f:
+            self.header = json.load(f)
+        self.index = _memmap(os.path.join(directory, INDEX_FILE), np.int64).reshape(-1, INDEX_COLUMNS)
+        self.rays = _memmap(os.path.join(directory, RAYS_FILE), RAY_DTYPE)
+        self.first_frame = int(self.index[0, 0]) if len(self.index) else 0
+        self._detections = None
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def last_frame(self):
+        return self.first_frame + len(self.index) - 1
+
+    def time(self, frame):
+        return (frame / (self.header["frames"] - 1)) * self.header["total_time"]
+
+    def _row(self, frame):
+        row = frame - self.first_frame
+        if row < 0 or row >= len(self.index):
+            raise IndexError(f"Frame {frame} fora da gravação ({self.first_frame}-{self.last_frame})")
+        return row
+
+    def state(self, frame):
+        """
+        Estado (registos RAY_DTYPE) dos raios da janela viva no frame indicado, pela ordem de emissão:
+        inclui todos os raios que podem estar dentro de header["bounds"] (e alguns que já saíram).
+        De um raio cuja colisão mudou fica o último estado gravado até esse frame.
+        """
+        row = self._row(frame)
+        records = self.rays[int(self.index[row, 4]):int(self.index[row, 1])]
+        if len(records) > 1 and np.any(np.diff(records["ray"]) <= 0):
+            # Estados repetidos: o último registo de cada raio (np.unique devolve a primeira ocorrência)
+            _, last = np.unique(records["ray"][::-1], return_index=True)
+            records = records[len(records) - 1 - last]
+        return records
+
+    def frame(self, frame):
+        """
+        Posições e códigos de cor dos raios da janela viva no frame indicado (posições avaliadas neste instante);
+        os raios que ficam de fora estão fora de header["bounds"].
+        """
+        records = self.state(frame)
+        t_out = np.ascontiguousarray(records["t_out"])
+        positions = positions_at_time(np.ascontiguousarray(records["origin"]),
+                                      np.ascontiguousarray(records["direction"]),
+                                      np.ascontiguousarray(records["collision_point"]),
+                                      np.ascontiguousarray(records["reflection_direction"]), t_out,
+                                      np.isfinite(t_out), np.ascontiguousarray(records["return_speed"]),
+                                      self.header["speed_of_sound"], self.time(frame) - records["emission_time"])
+        return positions, np.asarray(records["color"])
+
+    def visible(self, frame, xlim, ylim):
+        """
+        Posições e códigos de cor apenas dos raios dentro da janela [xlim] × [ylim]
+        (completa se a janela estiver dentro de header["bounds"]).
+        """
+        positions, codes = self.frame(frame)
+        mask = ((positions[:, 0] >= xlim[0]) & (positions[:, 0] <= xlim[1]) &
+                (positions[:, 1] >= ylim[0]) & (positions[:, 1] <= ylim[1]))
+        return positions[mask], codes[mask]
+
+    def detection_count(self, frame):
+        return int(self.index[self._row(frame), 3])
+
+    def detections(self, frame=None):
+        """
+        DetectionStore com as detecções (todas, ou apenas as ocorridas até ao frame indicado, inclusive).
+        """
+        from detection_store import DetectionStore
+        if self._detections is None:
+            self._detections = DetectionStore.load(os.path.join(self.directory, DETECTIONS_FILE))
+        if frame is None:
+            return self._detections
+        return DetectionStore.from_results(self._detections.to_records(0, self.detection_count(frame)))
+
+
+def replay(directory, start=None, stop=None, step=1, interval=50):
+    """
+    Reproduz uma gravação: as posições de cada frame são avaliadas a partir do estado gravado dos raios
+    e apenas os raios dentro da janela visível são desenhados. A barra de frames permite saltar para qualquer frame;
+    a tecla espaço pausa/retoma.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+    from matplotlib.colors import to_rgba_array
+    from matplotlib.widgets import Slider
+    from surface import Surface
+    from sensor import Sensor
+
+    trajectory = Trajectory(directory)
+    if len(trajectory) == 0:
+        print(f"Gravação vazia em {directory}")
+        return None
+    header = trajectory.header
+    start = trajectory.first_frame if start is None else start
+    stop = trajectory.last_frame if stop is None else min(stop, trajectory.last_frame)
+    rgba = to_rgba_array(header["colors"]) if header["colors"] else np.zeros((0, 4))
+    rgba[:, 3] = 0.7
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    fig.subplots_adjust(bottom=0.18)
+    ax.set_title("Replay da Simulação de Emissão de Partículas")
+    ax.set_xlabel("X (m)")
+    ax.set_ylabel("Y (m)")
+    ax.grid(True)
+    ax.set_xlim(PLOT_X_LIMITS)
+    ax.set_ylim(PLOT_Y_LIMITS)
+    Surface(np.array(header["surface_points"])).draw(ax)
+    for conf in header["sensors"]:
+        Sensor(conf["sensor_id"], conf["position"], 90, width=conf["width"], height=conf["height"],
+               color=conf["color"]).draw(ax)
+    scatter = ax.scatter(np.zeros(0), np.zeros(0), s=16)
+    label = ax.text(0.01, 0.99, "", transform=ax.transAxes, va="top")
+    slider = Slider(fig.add_axes([0.15, 0.04, 0.7, 0.03]), "Frame", trajectory.first_frame, trajectory.last_frame,
+                    valinit=start, valstep=1)
+    state = {"frame": start, "playing": True}
+
+    def show(frame):
+        try:
+            positions, codes = trajectory.visible(frame, ax.get_xlim(), ax.get_ylim())
+            scatter.set_offsets(positions)
+            scatter.set_facecolor(rgba[codes])
+            scatter.set_edgecolor(rgba[codes])
+            label.set_text(f"Frame {frame} | t = {trajectory.time(frame):.2f}s | "
+                           f"{trajectory.detection_count(frame)} detecções")
+        except Exception as e:
+            print(f"Error showing frame {frame}: {e}")
+
+    def on_slider(value):
+        state["frame"] = int(value)
+        show(state["frame"])
+        fig.canvas.draw_idle()
+
+    def on_key(event):
+        if event.key == " ":
+            state["playing"] = not state["playing"]
+
+    def update(_):
+        if state["playing"]:
+            frame = state["frame"] + step
+            slider.set_val(start if frame > stop else frame)
+        return [scatter, label]
+
+    slider.on_changed(on_slider)
+    fig.canvas.mpl_connect("key_press_event", on_key)
+    show(start)
+    anim = FuncAnimation(fig, update, interval=interval, cache_frame_data=False)
+    plt.show()
+    return anim
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Replay de uma simulação gravada (ver Simulation(record_dir=...)).")
+    parser.add_argument("directory", help="diretório da gravação")
+    parser.add_argument("--start", type=int, default=None, help="primeiro frame")
+    parser.add_argument("--stop", type=int, default=None, help="último frame")
+    parser.add_argument("--step", type=int, default=1, help="frames avançados por passo da animação")
+    args = parser.parse_args(argv)
+    replay(args.directory, args.start, args.stop, args.step)
+
+
+if __name__ == "__main__":
+    main()